@@ -1,37 +1,13 @@
-import boto3
-import json
-import requests
-import base64
 from datetime import datetime
-from dotenv import load_dotenv
-from botocore.auth import SigV4Auth
-from botocore.awsrequest import AWSRequest
+from blob_store import put_blob
+from fhir_ingest import Transaction, ingest
 from PIL import Image, ImageDraw
 import io
 
-load_dotenv()
-
-REGION = 'us-west-2'
-DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
-
 # Sarah Johnson - cardiac patient with AFib
 PATIENT_ID = "6df562fc-25a7-4e72-8753-9583e3259572"
 PATIENT_NAME = "Sarah Johnson"
 
-def create_resource(resource):
-    endpoint = f"https://healthlake.{REGION}.amazonaws.com/datastore/{DATASTORE_ID}/r4/"
-    session = boto3.Session(region_name=REGION)
-    credentials = session.get_credentials()
-    
-    url = f"{endpoint}{resource['resourceType']}"
-    data = json.dumps(resource)
-    
-    request = AWSRequest(method='POST', url=url, data=data, headers={'Content-Type': 'application/fhir+json'})
-    SigV4Auth(credentials, 'healthlake', REGION).add_auth(request)
-    
-    response = requests.post(url, data=data, headers=dict(request.headers))
-    return response
-
 def create_cardiac_mri_image(patient_name):
     """Generate cardiac MRI image"""
     img = Image.new('L', (512, 512), color=20)
@@ -52,8 +28,10 @@ def create_cardiac_mri_image(patient_name):
 
 print(f"Adding Cardiac MRI for {PATIENT_NAME}...\n")
 
-# Create DiagnosticReport
-print("[1/2] Creating DiagnosticReport...")
+# Report and image are created together in one transaction
+tx = Transaction(label=PATIENT_NAME)
+
+print("[1/2] Preparing DiagnosticReport...")
 diagnostic_report = {
     "resourceType": "DiagnosticReport",
     "status": "final",
@@ -74,17 +52,11 @@ diagnostic_report = {
     "conclusion": "Enlarged left atrium consistent with atrial fibrillation. Normal ventricular function."
 }
 
-response = create_resource(diagnostic_report)
-if response.status_code in [200, 201]:
-    report_id = response.json()['id']
-    print(f"  [OK] DiagnosticReport ID: {report_id}")
-else:
-    print(f"  [ERROR] Status: {response.status_code}")
+report_ref = tx.add(diagnostic_report, key=(PATIENT_ID, 'cardiac-mri-report'))
 
-# Create Media with MRI image
-print("[2/2] Creating Media resource with MRI image...")
+print("[2/2] Uploading MRI image and preparing Media...")
 image_data = create_cardiac_mri_image(PATIENT_NAME)
-image_base64 = base64.b64encode(image_data).decode('utf-8')
+attachment = put_blob(image_data, 'image/png')
 
 media_resource = {
     "resourceType": "Media",
@@ -102,18 +74,19 @@ media_resource = {
     },
     "createdDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
     "content": {
-        "contentType": "image/png",
-        "data": image_base64,
+        **attachment,
         "title": "Cardiac MRI - Atrial Fibrillation"
     }
 }
 
-response = create_resource(media_resource)
-if response.status_code in [200, 201]:
-    media_id = response.json()['id']
-    print(f"  [OK] Media ID: {media_id}")
-else:
-    print(f"  [ERROR] Status: {response.status_code}")
+media_ref = tx.add(media_resource, key=(PATIENT_ID, 'cardiac-mri-image'))
+
+outcome = ingest([tx])
+if outcome['failures']:
+    raise SystemExit(1)
+locations = outcome['results'][tx.label]
+print(f"  [OK] DiagnosticReport: {locations[report_ref]}")
+print(f"  [OK] Media: {locations[media_ref]}")
 
 print(f"\n[OK] Successfully added Cardiac MRI for {PATIENT_NAME}!")
 print(f"\nPatient {PATIENT_NAME} now has:")
@@ -1,35 +1,10 @@
-import boto3
-import json
-import requests
-from botocore.auth import SigV4Auth
-from botocore.awsrequest import AWSRequest
 from datetime import datetime
-from dotenv import load_dotenv
+from fhir_ingest import Transaction, ingest
 
-load_dotenv()
+# Stable key so re-running the script does not duplicate the patient graph
+PATIENT_KEY = ('Smith', 'John', '1965-08-15')
 
-DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
-REGION = 'us-west-2'
-
-def post_to_healthlake(resource):
-    """Post FHIR resource to HealthLake"""
-    endpoint = f"https://healthlake.{REGION}.amazonaws.com/datastore/{DATASTORE_ID}/r4/"
-    
-    session = boto3.Session(region_name=REGION)
-    credentials = session.get_credentials()
-    
-    resource_type = resource['resourceType']
-    url = f"{endpoint}{resource_type}"
-    
-    request = AWSRequest(method='POST', url=url, data=json.dumps(resource), 
-                        headers={'Content-Type': 'application/fhir+json'})
-    SigV4Auth(credentials, 'healthlake', REGION).add_auth(request)
-    
-    response = requests.post(url, data=json.dumps(resource), headers=dict(request.headers))
-    response.raise_for_status()
-    return response.json()
-
-def create_cardiac_patient():
+def create_cardiac_patient(tx):
     """Create a patient with cardiac condition"""
     patient = {
         "resourceType": "Patient",
@@ -49,12 +24,9 @@ def create_cardiac_patient():
         }]
     }
     
-    result = post_to_healthlake(patient)
-    patient_id = result['id']
-    print(f"Created Patient: {patient_id}")
-    return patient_id
+    return tx.add(patient, key=PATIENT_KEY)
 
-def create_cardiac_condition(patient_id):
+def create_cardiac_condition(tx, patient_ref):
     """Create cardiac condition for patient"""
     condition = {
         "resourceType": "Condition",
@@ -79,18 +51,15 @@ def create_cardiac_condition(patient_id):
             "text": "Coronary artery disease"
         },
         "subject": {
-            "reference": f"Patient/{patient_id}"
+            "reference": patient_ref
         },
         "onsetDateTime": "2024-06-15T00:00:00Z",
         "recordedDate": "2024-06-15T00:00:00Z"
     }
     
-    result = post_to_healthlake(condition)
-    condition_id = result['id']
-    print(f"Created Condition: {condition_id}")
-    return condition_id
+    return tx.add(condition, key=(*PATIENT_KEY, '53741008'))
 
-def create_ecg_observation(patient_id):
+def create_ecg_observation(tx, patient_ref):
     """Create ECG observation with measurements"""
     observation = {
         "resourceType": "Observation",
@@ -111,7 +80,7 @@ def create_ecg_observation(patient_id):
             "text": "12-Lead ECG"
         },
         "subject": {
-            "reference": f"Patient/{patient_id}"
+            "reference": patient_ref
         },
         "effectiveDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "issued": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
@@ -187,12 +156,9 @@ def create_ecg_observation(patient_id):
         ]
     }
     
-    result = post_to_healthlake(observation)
-    observation_id = result['id']
-    print(f"Created ECG Observation: {observation_id}")
-    return observation_id
+    return tx.add(observation, key=(*PATIENT_KEY, 'ecg'))
 
-def create_ecg_diagnostic_report(patient_id, observation_id):
+def create_ecg_diagnostic_report(tx, patient_ref, observation_ref):
     """Create diagnostic report for ECG"""
     report = {
         "resourceType": "DiagnosticReport",
@@ -213,20 +179,17 @@ def create_ecg_diagnostic_report(patient_id, observation_id):
             "text": "12-Lead Electrocardiogram"
         },
         "subject": {
-            "reference": f"Patient/{patient_id}"
+            "reference": patient_ref
         },
         "effectiveDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "issued": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "result": [{
-            "reference": f"Observation/{observation_id}"
+            "reference": observation_ref
         }],
         "conclusion": "Normal sinus rhythm with occasional premature ventricular contractions. No acute ST-T wave changes. Recommend follow-up in 6 months."
     }
     
-    result = post_to_healthlake(report)
-    report_id = result['id']
-    print(f"Created Diagnostic Report: {report_id}")
-    return report_id
+    return tx.add(report, key=(*PATIENT_KEY, 'ecg-report'))
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -234,21 +197,23 @@ if __name__ == "__main__":
     print("=" * 60)
     
     try:
-        # Step 1: Create patient
-        print("\n1. Creating cardiac patient...")
-        patient_id = create_cardiac_patient()
-        
-        # Step 2: Create cardiac condition
-        print("\n2. Creating cardiac condition...")
-        condition_id = create_cardiac_condition(patient_id)
+        # Patient, condition, ECG and report go in as one all-or-nothing transaction
+        tx = Transaction(label='John Smith')
+        patient_ref = create_cardiac_patient(tx)
+        condition_ref = create_cardiac_condition(tx, patient_ref)
+        observation_ref = create_ecg_observation(tx, patient_ref)
+        report_ref = create_ecg_diagnostic_report(tx, patient_ref, observation_ref)
         
-        # Step 3: Create ECG observation
-        print("\n3. Creating ECG observation...")
-        observation_id = create_ecg_observation(patient_id)
+        print("\nSubmitting transaction (Patient, Condition, ECG Observation, DiagnosticReport)...")
+        outcome = ingest([tx])
+        if outcome['failures']:
+            raise RuntimeError(outcome['failures'][0]['error'])
         
-        # Step 4: Create diagnostic report
-        print("\n4. Creating ECG diagnostic report...")
-        report_id = create_ecg_diagnostic_report(patient_id, observation_id)
+        locations = outcome['results'][tx.label]
+        patient_id = locations[patient_ref].split('/')[1]
+        condition_id = locations[condition_ref].split('/')[1]
+        observation_id = locations[observation_ref].split('/')[1]
+        report_id = locations[report_ref].split('/')[1]
         
         print("\n" + "=" * 60)
         print("SUCCESS! Cardiac patient with ECG data created")
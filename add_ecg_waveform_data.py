@@ -98,8 +98,9 @@ def generate_ecg_waveform(condition_type, duration_seconds=10, sampling_rate=500
     
     return ecg_signal.tolist()
 
-def create_ecg_waveform_observation(patient_id, patient_name, condition_type):
-    """Create ECG observation with waveform data"""
+def ecg_waveform_observation(patient_id, patient_name, condition_type, effective=None):
+    """Build an ECG observation with Lead II waveform data"""
+    effective = effective or datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
     
     # Generate waveform (10 seconds at 500 Hz = 5000 samples)
     waveform = generate_ecg_waveform(condition_type, duration_seconds=10, sampling_rate=500)
@@ -132,8 +133,8 @@ def create_ecg_waveform_observation(patient_id, patient_name, condition_type):
             "reference": f"Patient/{patient_id}",
             "display": patient_name
         },
-        "effectiveDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "issued": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "effectiveDateTime": effective,
+        "issued": effective,
         "valueSampledData": {
             "origin": {
                 "value": 0,
@@ -150,9 +151,118 @@ def create_ecg_waveform_observation(patient_id, patient_name, condition_type):
         }]
     }
     
-    result = post_to_healthlake(observation)
+    return observation
+
+def create_ecg_waveform_observation(patient_id, patient_name, condition_type):
+    """Create ECG observation with waveform data"""
+    result = post_to_healthlake(ecg_waveform_observation(patient_id, patient_name, condition_type))
+    return result['id']
+
+# MDC reference ids for the standard 12 leads
+TWELVE_LEADS = [
+    ("I", "131329"), ("II", "131330"), ("III", "131389"),
+    ("aVR", "131390"), ("aVL", "131391"), ("aVF", "131392"),
+    ("V1", "131331"), ("V2", "131332"), ("V3", "131333"),
+    ("V4", "131334"), ("V5", "131335"), ("V6", "131336"),
+]
+
+# Relative precordial amplitudes (V1/V2 mostly negative, V4-V5 tallest R)
+PRECORDIAL_GAINS = {"V1": -0.6, "V2": -0.3, "V3": 0.4, "V4": 1.1, "V5": 1.0, "V6": 0.8}
+
+def generate_12_lead_ecg(condition_type, duration_seconds=10, sampling_rate=500):
+    """Derive a synthetic 12-lead set as a (12, samples) array"""
+    lead_ii = np.array(generate_ecg_waveform(condition_type, duration_seconds, sampling_rate))
+    lead_i = 0.6 * lead_ii + np.random.normal(0, 0.02, lead_ii.shape)
+    
+    # Einthoven / Goldberger relationships for the limb leads
+    limb = {
+        "I": lead_i,
+        "II": lead_ii,
+        "III": lead_ii - lead_i,
+        "aVR": -(lead_i + lead_ii) / 2,
+        "aVL": lead_i - lead_ii / 2,
+        "aVF": lead_ii - lead_i / 2,
+    }
+    
+    signals = np.empty((len(TWELVE_LEADS), lead_ii.size))
+    for row, (lead, _) in enumerate(TWELVE_LEADS):
+        if lead in limb:
+            signals[row] = limb[lead]
+        else:
+            signals[row] = PRECORDIAL_GAINS[lead] * lead_ii + np.random.normal(0, 0.03, lead_ii.shape)
+    return signals
+
+def twelve_lead_ecg_observation(patient_id, patient_name, condition_type, effective=None):
+    """Build an ECG observation with one SampledData component per lead"""
+    effective = effective or datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+    
+    # Same 50 Hz effective rate as the single-lead recording
+    signals = generate_12_lead_ecg(condition_type, duration_seconds=10, sampling_rate=500)[:, ::10]
+    
+    components = []
+    for row, (lead, code) in enumerate(TWELVE_LEADS):
+        components.append({
+            "code": {
+                "coding": [{
+                    "system": "urn:oid:2.16.840.1.113883.6.24",
+                    "code": code,
+                    "display": f"MDC_ECG_ELEC_POTL_{lead.upper()}"
+                }],
+                "text": f"Lead {lead}"
+            },
+            "valueSampledData": {
+                "origin": {
+                    "value": 0,
+                    "unit": "mV",
+                    "system": "http://unitsofmeasure.org",
+                    "code": "mV"
+                },
+                "period": 20,
+                "dimensions": 1,
+                "data": " ".join([f"{v:.3f}" for v in signals[row]])
+            }
+        })
+    
+    observation = {
+        "resourceType": "Observation",
+        "status": "final",
+        "category": [{
+            "coding": [{
+                "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                "code": "procedure",
+                "display": "Procedure"
+            }]
+        }],
+        "code": {
+            "coding": [{
+                "system": "http://loinc.org",
+                "code": "131328",
+                "display": "MDC_ECG_ELEC_POTL"
+            }],
+            "text": "12-Lead ECG Waveform"
+        },
+        "subject": {
+            "reference": f"Patient/{patient_id}",
+            "display": patient_name
+        },
+        "effectiveDateTime": effective,
+        "issued": effective,
+        "component": components,
+        "note": [{
+            "text": f"10-second 12-lead ECG recording. Sampling rate: 50 Hz. Samples per lead: {signals.shape[1]}"
+        }]
+    }
+    
+    return observation
+
+def create_12_lead_ecg_observation(patient_id, patient_name, condition_type):
+    """Create ECG observation with one SampledData component per lead"""
+    result = post_to_healthlake(twelve_lead_ecg_observation(patient_id, patient_name, condition_type))
     return result['id']
 
+# Store full 12-lead recordings (component[]) instead of a single Lead II trace
+TWELVE_LEAD = True
+
 # Patient IDs from previous script
 CARDIAC_PATIENTS = [
     {"id": "6df562fc-25a7-4e72-8753-9583e3259572", "name": "Sarah Johnson", "condition": "afib"},
@@ -170,7 +280,8 @@ if __name__ == "__main__":
     for i, patient in enumerate(CARDIAC_PATIENTS, 1):
         print(f"\n{i}. Adding ECG waveform for {patient['name']}...")
         try:
-            obs_id = create_ecg_waveform_observation(
+            create = create_12_lead_ecg_observation if TWELVE_LEAD else create_ecg_waveform_observation
+            obs_id = create(
                 patient['id'], 
                 patient['name'], 
                 patient['condition']
@@ -178,7 +289,8 @@ if __name__ == "__main__":
             print(f"   [OK] Waveform Observation ID: {obs_id}")
             print(f"   - Type: {patient['condition'].upper()}")
             print(f"   - Duration: 10 seconds")
-            print(f"   - Samples: 500 data points")
+            print(f"   - Leads: {'12' if TWELVE_LEAD else 'II only'}")
+            print(f"   - Samples: 500 data points per lead")
         except Exception as e:
             print(f"   [ERROR] {str(e)}")
     
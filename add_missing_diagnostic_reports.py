@@ -1,29 +1,5 @@
-import boto3
-import json
-import requests
 from datetime import datetime
-from dotenv import load_dotenv
-from botocore.auth import SigV4Auth
-from botocore.awsrequest import AWSRequest
-
-load_dotenv()
-
-REGION = 'us-west-2'
-DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
-
-def create_resource(resource):
-    endpoint = f"https://healthlake.{REGION}.amazonaws.com/datastore/{DATASTORE_ID}/r4/"
-    session = boto3.Session(region_name=REGION)
-    credentials = session.get_credentials()
-    
-    url = f"{endpoint}{resource['resourceType']}"
-    data = json.dumps(resource)
-    
-    request = AWSRequest(method='POST', url=url, data=data, headers={'Content-Type': 'application/fhir+json'})
-    SigV4Auth(credentials, 'healthlake', REGION).add_auth(request)
-    
-    response = requests.post(url, data=data, headers=dict(request.headers))
-    return response
+from fhir_ingest import Transaction, ingest
 
 # Existing MRI patients with their IDs
 mri_patients = [
@@ -61,9 +37,9 @@ mri_patients = [
 
 print("Adding missing DiagnosticReport resources...\n")
 
-for idx, patient in enumerate(mri_patients, 1):
-    print(f"[{idx}/5] Creating DiagnosticReport for {patient['name']}")
-    
+transactions = []
+report_refs = []
+for patient in mri_patients:
     diagnostic_report = {
         "resourceType": "DiagnosticReport",
         "status": "final",
@@ -84,12 +60,16 @@ for idx, patient in enumerate(mri_patients, 1):
         "conclusion": patient["findings"]
     }
     
-    response = create_resource(diagnostic_report)
-    
-    if response.status_code in [200, 201]:
-        report_id = response.json()['id']
-        print(f"  [OK] DiagnosticReport ID: {report_id}")
-    else:
-        print(f"  [ERROR] Status: {response.status_code}")
+    # Keyed per patient, so re-running never adds a second report
+    tx = Transaction(label=patient['name'])
+    report_refs.append(tx.add(diagnostic_report, key=(patient['id'], 'mri-report')))
+    transactions.append(tx)
+
+outcome = ingest(transactions)
+for tx, report_ref in zip(transactions, report_refs):
+    location = outcome['results'].get(tx.label, {}).get(report_ref)
+    if location:
+        print(f"  [OK] {tx.label}: {location}")
 
-print("\n[OK] Successfully added all DiagnosticReport resources!")
+if not outcome['failures']:
+    print("\n[OK] Successfully added all DiagnosticReport resources!")
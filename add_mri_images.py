@@ -1,11 +1,11 @@
 import boto3
 import json
 import requests
-import base64
 from datetime import datetime
 from dotenv import load_dotenv
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
+from blob_store import put_blob
 from PIL import Image, ImageDraw, ImageFont
 import io
 
@@ -65,9 +65,9 @@ def main():
         
         # Generate sample MRI image
         image_data = create_sample_mri_image(patient['name'], patient['type'], patient['label'])
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
+        attachment = put_blob(image_data, 'image/png')
         
-        # Create Media resource with embedded image
+        # Create Media resource referencing the stored image
         media_resource = {
             "resourceType": "Media",
             "status": "completed",
@@ -84,8 +84,7 @@ def main():
             },
             "createdDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
             "content": {
-                "contentType": "image/png",
-                "data": image_base64,
+                **attachment,
                 "title": f"{patient['type']} - {patient['label']}"
             }
         }
@@ -102,7 +101,7 @@ def main():
     print("\n[OK] Successfully added MRI images for all patients!")
     print("\nQuery images using:")
     print("  search_healthlake('Media', {'patient': patient_id})")
-    print("  Images are base64 encoded in 'content.data' field")
+    print("  Image bytes are referenced by 'content.url' (served from /api/blobs/<sha256>)")
 
 if __name__ == "__main__":
     main()
@@ -1,29 +1,5 @@
-import boto3
-import json
-import requests
 from datetime import datetime
-from dotenv import load_dotenv
-from botocore.auth import SigV4Auth
-from botocore.awsrequest import AWSRequest
-
-load_dotenv()
-
-REGION = 'us-west-2'
-DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
-
-def create_resource(resource):
-    endpoint = f"https://healthlake.{REGION}.amazonaws.com/datastore/{DATASTORE_ID}/r4/"
-    session = boto3.Session(region_name=REGION)
-    credentials = session.get_credentials()
-    
-    url = f"{endpoint}{resource['resourceType']}"
-    data = json.dumps(resource)
-    
-    request = AWSRequest(method='POST', url=url, data=data, headers={'Content-Type': 'application/fhir+json'})
-    SigV4Auth(credentials, 'healthlake', REGION).add_auth(request)
-    
-    response = requests.post(url, data=data, headers=dict(request.headers))
-    return response
+from fhir_ingest import Transaction, ingest
 
 # MRI Patients Data
 mri_patients = [
@@ -70,8 +46,11 @@ mri_patients = [
 ]
 
 def main():
-    for idx, patient_data in enumerate(mri_patients, 1):
-        print(f"\n[{idx}/5] Creating MRI patient: {patient_data['name']['given'][0]} {patient_data['name']['family']}")
+    transactions = []
+    for patient_data in mri_patients:
+        display = f"{patient_data['name']['given'][0]} {patient_data['name']['family']}"
+        patient_key = (patient_data['name']['family'], patient_data['name']['given'][0], patient_data['birthDate'])
+        tx = Transaction(label=display)
         
         # Create Patient
         patient = {
@@ -81,22 +60,18 @@ def main():
             "birthDate": patient_data["birthDate"]
         }
         
-        patient_response = create_resource(patient)
-        patient_json = patient_response.json()
-        patient_id = patient_json['id']
-        print(f"  Patient ID: {patient_id}")
+        patient_ref = tx.add(patient, key=patient_key)
         
         # Create Condition
         condition = {
             "resourceType": "Condition",
-            "subject": {"reference": f"Patient/{patient_id}", "display": f"{patient_data['name']['given'][0]} {patient_data['name']['family']}"},
+            "subject": {"reference": patient_ref, "display": display},
             "code": {"text": patient_data["condition"]},
             "clinicalStatus": {"coding": [{"system": "http://terminology.hl7.org/CodeSystem/condition-clinical", "code": "active"}]},
             "recordedDate": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
         }
         
-        create_resource(condition)
-        print(f"  Condition: {patient_data['condition']}")
+        tx.add(condition, key=(*patient_key, 'condition'))
         
         # Create DiagnosticReport for MRI
         diagnostic_report = {
@@ -110,7 +85,7 @@ def main():
                 }],
                 "text": patient_data["mri_type"]
             },
-            "subject": {"reference": f"Patient/{patient_id}", "display": f"{patient_data['name']['given'][0]} {patient_data['name']['family']}"},
+            "subject": {"reference": patient_ref, "display": display},
             "effectiveDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
             "issued": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
             "conclusion": patient_data["findings"],
@@ -121,9 +96,13 @@ def main():
             }]
         }
         
-        create_resource(diagnostic_report)
-        print(f"  MRI Report: {patient_data['mri_type']}")
-        print(f"  Findings: {patient_data['findings']}")
+        tx.add(diagnostic_report, key=(*patient_key, 'mri-report'))
+        transactions.append(tx)
+    
+    print(f"Creating {len(transactions)} MRI patients (Patient, Condition, MRI DiagnosticReport each)...")
+    outcome = ingest(transactions)
+    if outcome['failures']:
+        return
     
     print("\n[OK] Successfully created 5 MRI patients with diagnostic reports!")
     print("\nPatient Summary:")
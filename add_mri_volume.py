@@ -0,0 +1,123 @@
+import os
+import json
+import uuid
+import boto3
+import requests
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from dotenv import load_dotenv
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+
+load_dotenv()
+
+REGION = 'us-west-2'
+DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
+VOLUME_STORE_PATH = Path(os.getenv('VOLUME_STORE_PATH', str(Path(__file__).parent / 'volume_store')))
+
+# Brain MRI patient from add_mri_patients.py
+PATIENT_ID = "6f0bc274-9b4e-4cc0-80eb-d49aa2f6da9a"
+PATIENT_NAME = "Michael Anderson"
+
+def create_resource(resource):
+    endpoint = f"https://healthlake.{REGION}.amazonaws.com/datastore/{DATASTORE_ID}/r4/"
+    session = boto3.Session(region_name=REGION)
+    credentials = session.get_credentials()
+
+    url = f"{endpoint}{resource['resourceType']}"
+    data = json.dumps(resource)
+
+    request = AWSRequest(method='POST', url=url, data=data, headers={'Content-Type': 'application/fhir+json'})
+    SigV4Auth(credentials, 'healthlake', REGION).add_auth(request)
+
+    response = requests.post(url, data=data, headers=dict(request.headers))
+    return response
+
+def generate_brain_volume(slices=160, rows=256, columns=256, seed=7):
+    """Synthetic T1-like head phantom as int16 (slices, rows, columns)"""
+    rng = np.random.default_rng(seed)
+    z, y, x = np.ogrid[-1:1:slices * 1j, -1:1:rows * 1j, -1:1:columns * 1j]
+
+    volume = np.zeros((slices, rows, columns), dtype=np.float32)
+    volume[(x / 0.85) ** 2 + (y / 0.95) ** 2 + (z / 0.9) ** 2 <= 1] = 300   # scalp
+    volume[(x / 0.78) ** 2 + (y / 0.88) ** 2 + (z / 0.82) ** 2 <= 1] = 800   # grey matter
+    volume[(x / 0.6) ** 2 + (y / 0.7) ** 2 + (z / 0.65) ** 2 <= 1] = 1100   # white matter
+    volume[((x - 0.1) / 0.12) ** 2 + (y / 0.35) ** 2 + (z / 0.3) ** 2 <= 1] = 150   # ventricle
+    volume[((x - 0.05) / 0.1) ** 2 + ((y - 0.35) / 0.35) ** 2 + (z / 0.3) ** 2 <= 1] = 150
+    volume[((x + 0.35) / 0.16) ** 2 + ((y - 0.3) / 0.16) ** 2 + ((z - 0.2) / 0.16) ** 2 <= 1] = 1600   # lesion
+
+    volume += rng.normal(0, 25, volume.shape).astype(np.float32)
+    return np.clip(volume, 0, None).astype(np.int16)
+
+def write_volume(volume_id, voxels, spacing, window, metadata):
+    """Same on-disk format as backend/app/services/volume_service.py"""
+    VOLUME_STORE_PATH.mkdir(parents=True, exist_ok=True)
+    dtype = voxels.dtype.newbyteorder('<')
+
+    voxels.astype(dtype, copy=False).tofile(VOLUME_STORE_PATH / f"{volume_id}.raw")
+    np.ascontiguousarray(voxels.transpose(1, 0, 2)).astype(dtype, copy=False).tofile(VOLUME_STORE_PATH / f"{volume_id}.coronal.raw")
+    np.ascontiguousarray(voxels.transpose(2, 0, 1)).astype(dtype, copy=False).tofile(VOLUME_STORE_PATH / f"{volume_id}.sagittal.raw")
+
+    header = {
+        'id': volume_id,
+        'shape': list(voxels.shape),
+        'dtype': dtype.str,
+        'spacing': list(spacing),
+        'window': window,
+        'orientations': ['axial', 'coronal', 'sagittal'],
+        **metadata
+    }
+    (VOLUME_STORE_PATH / f"{volume_id}.json").write_text(json.dumps(header, indent=2))
+    return header
+
+if __name__ == "__main__":
+    print(f"Adding multi-slice Brain MRI volume for {PATIENT_NAME}...\n")
+
+    volume_id = uuid.uuid4().hex
+    voxels = generate_brain_volume()
+    header = write_volume(
+        volume_id,
+        voxels,
+        spacing=(1.0, 0.9375, 0.9375),
+        window={'center': 900, 'width': 1400},
+        metadata={'patient_id': PATIENT_ID, 'title': 'Brain MRI - T1 Axial'}
+    )
+    size_mb = voxels.nbytes / (1024 * 1024)
+    print(f"[1/2] Wrote volume {volume_id}: {header['shape']} {header['dtype']} ({size_mb:.1f} MB per orientation)")
+
+    imaging_study = {
+        "resourceType": "ImagingStudy",
+        "status": "available",
+        "subject": {
+            "reference": f"Patient/{PATIENT_ID}",
+            "display": PATIENT_NAME
+        },
+        "started": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "numberOfSeries": 1,
+        "numberOfInstances": voxels.shape[0],
+        "description": "Brain MRI",
+        "series": [{
+            "uid": f"2.25.{uuid.UUID(volume_id).int}",
+            "number": 1,
+            "modality": {
+                "system": "http://dicom.nema.org/resources/ontology/DCM",
+                "code": "MR"
+            },
+            "description": header['title'],
+            "numberOfInstances": voxels.shape[0]
+        }],
+        "identifier": [{
+            "system": "urn:healthlake-ai:mri-volume",
+            "value": volume_id
+        }]
+    }
+
+    print("[2/2] Creating ImagingStudy...")
+    response = create_resource(imaging_study)
+    if response.status_code in [200, 201]:
+        print(f"  [OK] ImagingStudy ID: {response.json()['id']}")
+    else:
+        print(f"  [ERROR] Status: {response.status_code} - {response.text[:200]}")
+
+    print(f"\nView slices via: /api/mri-volume/{volume_id}/slice?axis=axial&index=80")
@@ -1,33 +1,6 @@
-import boto3
-import json
-import requests
 import random
-from botocore.auth import SigV4Auth
-from botocore.awsrequest import AWSRequest
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
-REGION = 'us-west-2'
-
-def post_to_healthlake(resource):
-    """Post FHIR resource to HealthLake"""
-    endpoint = f"https://healthlake.{REGION}.amazonaws.com/datastore/{DATASTORE_ID}/r4/"
-    session = boto3.Session(region_name=REGION)
-    credentials = session.get_credentials()
-    
-    resource_type = resource['resourceType']
-    url = f"{endpoint}{resource_type}"
-    
-    request = AWSRequest(method='POST', url=url, data=json.dumps(resource), 
-                        headers={'Content-Type': 'application/fhir+json'})
-    SigV4Auth(credentials, 'healthlake', REGION).add_auth(request)
-    
-    response = requests.post(url, data=json.dumps(resource), headers=dict(request.headers))
-    response.raise_for_status()
-    return response.json()
+from fhir_ingest import Transaction, ingest
 
 # Patient data templates
 PATIENTS = [
@@ -48,7 +21,9 @@ PATIENTS = [
 ]
 
 def create_patient_with_ecg(patient_data):
-    """Create patient with cardiac condition and ECG"""
+    """Patient, cardiac condition, ECG and report as one transaction; returns (tx, patient ref)"""
+    tx = Transaction(label=f"{patient_data['given'][0]} {patient_data['family']}")
+    patient_key = (patient_data['family'], patient_data['given'][0], patient_data['birthDate'])
     
     # Create Patient
     patient = {
@@ -69,9 +44,7 @@ def create_patient_with_ecg(patient_data):
         }]
     }
     
-    patient_result = post_to_healthlake(patient)
-    patient_id = patient_result['id']
-    print(f"  Created Patient: {patient_data['given'][0]} {patient_data['family']} ({patient_id})")
+    patient_ref = tx.add(patient, key=patient_key)
     
     # Create Condition
     condition = {
@@ -96,13 +69,12 @@ def create_patient_with_ecg(patient_data):
             }],
             "text": patient_data["condition"]
         },
-        "subject": {"reference": f"Patient/{patient_id}"},
+        "subject": {"reference": patient_ref},
         "onsetDateTime": (datetime.now() - timedelta(days=random.randint(30, 365))).strftime("%Y-%m-%dT%H:%M:%SZ"),
         "recordedDate": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
     }
     
-    condition_result = post_to_healthlake(condition)
-    print(f"    - Condition: {patient_data['condition']}")
+    tx.add(condition, key=(*patient_key, patient_data["snomed"]))
     
     # Create ECG Observation
     components = [
@@ -147,16 +119,14 @@ def create_patient_with_ecg(patient_data):
             }],
             "text": "12-Lead ECG"
         },
-        "subject": {"reference": f"Patient/{patient_id}"},
+        "subject": {"reference": patient_ref},
         "effectiveDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "issued": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "valueString": f"ECG findings consistent with {patient_data['condition']}",
         "component": components
     }
     
-    observation_result = post_to_healthlake(observation)
-    observation_id = observation_result['id']
-    print(f"    - ECG: HR={patient_data['hr']}, QRS={patient_data['qrs']}, QT={patient_data['qt']}")
+    observation_ref = tx.add(observation, key=(*patient_key, 'ecg'))
     
     # Create Diagnostic Report
     report = {
@@ -177,36 +147,40 @@ def create_patient_with_ecg(patient_data):
             }],
             "text": "12-Lead Electrocardiogram"
         },
-        "subject": {"reference": f"Patient/{patient_id}"},
+        "subject": {"reference": patient_ref},
         "effectiveDateTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "issued": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "result": [{"reference": f"Observation/{observation_id}"}],
+        "result": [{"reference": observation_ref}],
         "conclusion": f"ECG consistent with {patient_data['condition']}. Recommend cardiology follow-up."
     }
     
-    report_result = post_to_healthlake(report)
-    print(f"    - Report: {report_result['id']}\n")
-    
-    return patient_id
+    tx.add(report, key=(*patient_key, 'ecg-report'))
+    return tx, patient_ref
 
 if __name__ == "__main__":
     print("=" * 70)
     print("ADDING MULTIPLE CARDIAC PATIENTS WITH ECG DATA")
     print("=" * 70)
     
-    created_patients = []
+    transactions = []
+    patient_refs = []
+    for patient_data in PATIENTS:
+        tx, patient_ref = create_patient_with_ecg(patient_data)
+        transactions.append(tx)
+        patient_refs.append(patient_ref)
+    
+    print(f"\nSubmitting {len(transactions)} patients (Patient, Condition, ECG, DiagnosticReport each)...")
+    outcome = ingest(transactions)
     
-    for i, patient_data in enumerate(PATIENTS, 1):
-        print(f"\n{i}. Creating patient {patient_data['given'][0]} {patient_data['family']}...")
-        try:
-            patient_id = create_patient_with_ecg(patient_data)
+    created_patients = []
+    for tx, patient_ref, patient_data in zip(transactions, patient_refs, PATIENTS):
+        location = outcome['results'].get(tx.label, {}).get(patient_ref)
+        if location:
             created_patients.append({
-                "name": f"{patient_data['given'][0]} {patient_data['family']}",
-                "id": patient_id,
+                "name": tx.label,
+                "id": location.split('/')[1],
                 "condition": patient_data['condition']
             })
-        except Exception as e:
-            print(f"   ERROR: {str(e)}\n")
     
     print("=" * 70)
     print(f"SUCCESS! Created {len(created_patients)} cardiac patients with ECG data")
@@ -3,18 +3,19 @@ import boto3
 import uuid
 import requests
 import json
-import matplotlib.pyplot as plt
 import numpy as np
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 from dotenv import load_dotenv
-import io
 import re
+import base64
 from multi_agent_ui_functions import generate_comprehensive_report
 from report_cache_manager import cache_comprehensive_report, has_cached_reports, clear_cache
 from qa_query_processor import process_user_query, add_to_history
 from qa_ui_components import render_dynamic_response
 from qa_templates import get_quick_questions
+from ecg_plot_service import ecg_plot_service
+from blob_store import get_blob, get_blob_thumbnail
 
 load_dotenv()
 
@@ -97,6 +98,36 @@ def search_healthlake(resource_type, params=None):
     response = requests.get(url, headers=dict(request.headers))
     return response.json()
 
+@st.cache_resource
+def _read_cache():
+    """(resource_type, id) -> (ETag, resource); survives reruns, shared by all sessions"""
+    return {}
+
+def read_healthlake(resource_type, resource_id):
+    """Read one resource by id, revalidating the cached version with If-None-Match"""
+    url = f"https://healthlake.{REGION}.amazonaws.com/datastore/{DATASTORE_ID}/r4/{resource_type}/{resource_id}"
+    session = boto3.Session(region_name=REGION)
+    credentials = session.get_credentials()
+
+    cache = _read_cache()
+    cached = cache.get((resource_type, resource_id))
+    request = AWSRequest(method='GET', url=url, headers={'If-None-Match': cached[0]} if cached else {})
+    SigV4Auth(credentials, 'healthlake', REGION).add_auth(request)
+
+    response = requests.get(url, headers=dict(request.headers))
+    if response.status_code == 304 and cached:
+        return cached[1]
+    if response.status_code != 200:
+        cache.pop((resource_type, resource_id), None)
+        return None
+
+    resource = response.json()
+    version = resource.get('meta', {}).get('versionId')
+    etag = response.headers.get('ETag') or (f'W/"{version}"' if version else None)
+    if etag:
+        cache[(resource_type, resource_id)] = (etag, resource)
+    return resource
+
 def extract_patient_id(text):
     """Extract patient ID from agent response"""
     pattern = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
@@ -109,8 +140,13 @@ def get_patient_ecg_waveform(patient_id):
 
     if waveform_obs.get('entry'):
         obs = waveform_obs['entry'][0]['resource']
-        if 'valueSampledData' in obs:
-            sampled_data = obs['valueSampledData']
+        sampled_data = obs.get('valueSampledData')
+        if sampled_data is None:
+            # 12-lead recordings carry one SampledData per component; show Lead II
+            for comp in obs.get('component', []):
+                if comp.get('code', {}).get('text') == 'Lead II' and 'valueSampledData' in comp:
+                    sampled_data = comp['valueSampledData']
+        if sampled_data:
             data_string = sampled_data['data']
             period_ms = sampled_data['period']
 
@@ -118,10 +154,17 @@ def get_patient_ecg_waveform(patient_id):
             time = np.arange(len(waveform)) * period_ms / 1000
 
             patient_name = obs.get('subject', {}).get('display', 'Unknown')
-            return {'time': time, 'amplitude': waveform, 'patient': patient_name}
+            return {
+                'id': obs.get('id'),
+                'version': obs.get('meta', {}).get('versionId'),
+                'time': time,
+                'amplitude': waveform,
+                'patient': patient_name
+            }
 
     return None
 
+@st.cache_data(ttl=300)
 def get_all_patients():
     """Fetch all patients from HealthLake"""
     result = search_healthlake('Patient', {'_count': '100'})
@@ -167,32 +210,38 @@ def get_patient_mri_reports(patient_id):
     return mri_reports
 
 def get_patient_mri_images(patient_id):
-    """Get MRI images for patient"""
+    """Get MRI image metadata for patient (pixel data is loaded on display)"""
     media = search_healthlake('Media', {'patient': patient_id, '_count': '10'})
     images = []
 
     if media.get('entry'):
         for entry in media['entry']:
             m = entry['resource']
-            if 'content' in m and 'data' in m['content']:
-                import base64
-                image_data = base64.b64decode(m['content']['data'])
+            content = m.get('content', {})
+            if content.get('url') or content.get('data'):
                 images.append({
-                    'data': image_data,
-                    'title': m['content'].get('title', 'MRI Image'),
-                    'type': m['content'].get('contentType', 'image/png')
+                    'url': content.get('url'),
+                    'inline': content.get('data'),
+                    'title': content.get('title', 'MRI Image'),
+                    'type': content.get('contentType', 'image/png')
                 })
 
     return images
 
+def load_mri_image(image, size=None):
+    """Fetch image bytes (or a `size` preset thumbnail) from the blob store, or decode legacy inline data"""
+    if image.get('url'):
+        return get_blob_thumbnail(image['url'], size) if size else get_blob(image['url'])
+    return base64.b64decode(image['inline'])
+
+@st.cache_data(ttl=120)
 def get_patient_summary(patient_id):
     """Get comprehensive patient summary"""
     summary = {}
 
     # Get patient demographics
-    patient_data = search_healthlake('Patient', {'_id': patient_id})
-    if patient_data.get('entry'):
-        p = patient_data['entry'][0]['resource']
+    p = read_healthlake('Patient', patient_id)
+    if p:
         summary['name'] = 'Unknown'
         if 'name' in p and p['name']:
             name_obj = p['name'][0]
@@ -242,24 +291,8 @@ def get_patient_summary(patient_id):
     return summary
 
 def plot_ecg_waveform(waveform_data):
-    """Generate ECG plot"""
-    fig, ax = plt.subplots(figsize=(12, 4))
-
-    ax.plot(waveform_data['time'], waveform_data['amplitude'], 'b-', linewidth=1)
-    ax.set_title(f"ECG Lead II - {waveform_data['patient']}", fontsize=14, fontweight='bold')
-    ax.set_xlabel('Time (seconds)', fontsize=11)
-    ax.set_ylabel('Amplitude (mV)', fontsize=11)
-    ax.grid(True, alpha=0.3, linestyle='--')
-    ax.axhline(y=0, color='r', linestyle='-', linewidth=0.5, alpha=0.5)
-
-    plt.tight_layout()
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-    buf.seek(0)
-    plt.close()
-
-    return buf
+    """Generate ECG plot (PNG bytes, cached per observation version)"""
+    return ecg_plot_service.render(waveform_data)
 
 # Page config
 st.set_page_config(
@@ -754,7 +787,8 @@ with col2:
 
                     for idx, img in enumerate(mri_images):
                         st.success(f"{img['title']}")
-                        st.image(img['data'], use_container_width=True)
+                        full_res = st.checkbox("Full resolution", key=f"mri_full_{idx}")
+                        st.image(load_mri_image(img, None if full_res else 'small'), use_container_width=full_res)
                         if idx < len(mri_images) - 1:
                             st.divider()
             else:
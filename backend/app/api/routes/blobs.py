@@ -0,0 +1,103 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from typing import Optional
+from app.services.blob_service import blob_store
+from app.services.image_derivative_service import image_derivative_service, SIZE_PRESETS
+
+router = APIRouter()
+
+# Blobs are content-addressed, so a given URL never changes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def parse_range(range_header: str, size: int):
+    """Parse a single `bytes=start-end` range; returns (start, end) or None"""
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    start, _, end = range_header[len('bytes='):].partition('-')
+    if start:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    elif end:
+        # Suffix range: last N bytes
+        start = max(size - int(end), 0)
+        end = size - 1
+    else:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={'Content-Range': f"bytes */{size}"})
+    return start, end
+
+def derivative_response(request: Request, etag: str, data: Optional[bytes], media_type: str):
+    """Cacheable response for a derived rendition (thumbnail or tile)"""
+    if data is None:
+        raise HTTPException(status_code=404, detail="Derivative not found")
+    headers = {'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL}
+    if request.headers.get('if-none-match') in (etag, '*'):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, headers=headers, media_type=media_type)
+
+@router.api_route("/blobs/{blob_id}", methods=["GET", "HEAD"])
+def get_blob(blob_id: str, request: Request, size: Optional[str] = None):
+    """Serve blob bytes with ETag, Range and long-lived caching.
+
+    `size=thumb|small|medium` returns a downscaled PNG rendition instead.
+    """
+    info = blob_store.head(blob_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    if size and size != 'full':
+        if size not in SIZE_PRESETS:
+            raise HTTPException(status_code=400, detail=f"size must be one of: full, {', '.join(SIZE_PRESETS)}")
+        if not info['content_type'].startswith('image/'):
+            raise HTTPException(status_code=400, detail="Blob is not an image")
+        data = image_derivative_service.thumbnail(blob_id, size)
+        return derivative_response(request, f'"{blob_id}-{size}"', data, 'image/png')
+
+    etag = f'"{blob_id}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes'
+    }
+
+    if request.headers.get('if-none-match') in (etag, '*'):
+        return Response(status_code=304, headers=headers)
+
+    total = info['size']
+    try:
+        byte_range = parse_range(request.headers.get('range'), total)
+    except ValueError:
+        byte_range = None
+
+    if byte_range and request.headers.get('if-range', etag) == etag:
+        start, end = byte_range
+        headers['Content-Range'] = f"bytes {start}-{end}/{total}"
+        status_code = 206
+    else:
+        start, end = 0, total - 1
+        status_code = 200
+
+    if request.method == 'HEAD':
+        headers['Content-Length'] = str(end - start + 1)
+        return Response(status_code=status_code, headers=headers, media_type=info['content_type'])
+
+    body = blob_store.get(blob_id, start, end) if total else b''
+    return Response(content=body, status_code=status_code, headers=headers, media_type=info['content_type'])
+
+@router.get("/blobs/{blob_id}/tiles")
+def get_tile_pyramid(blob_id: str):
+    """Describe the tile pyramid for an image blob"""
+    info = blob_store.head(blob_id)
+    if info is None or not info['content_type'].startswith('image/'):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image_derivative_service.pyramid(blob_id)
+
+@router.get("/blobs/{blob_id}/tiles/{level}/{x}_{y}.png")
+def get_tile(blob_id: str, level: int, x: int, y: int, request: Request):
+    """Serve one 256px tile of the image pyramid"""
+    info = blob_store.head(blob_id)
+    if info is None or not info['content_type'].startswith('image/'):
+        raise HTTPException(status_code=404, detail="Image not found")
+    data = image_derivative_service.tile(blob_id, level, x, y)
+    return derivative_response(request, f'"{blob_id}-{level}-{x}-{y}"', data, 'image/png')
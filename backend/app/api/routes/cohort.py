@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException
+from app.models.cohort import CohortQuery, CohortQueryResult
+from app.services.cohort_service import cohort_service
+
+router = APIRouter()
+
+@router.post("/cohort/query", response_model=CohortQueryResult)
+def query_cohort(query: CohortQuery):
+    """Filter / group-by / aggregate over the columnar Observation, Condition and MedicationRequest store"""
+    try:
+        return cohort_service.query(query.model_dump(exclude_none=True))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cohort/status")
+def cohort_status():
+    """Row and file counts per table"""
+    try:
+        return {'path': str(cohort_service.root), 'tables': cohort_service.status()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,4 +1,8 @@
 from fastapi import APIRouter
+from app.services.replica_service import replica
+from app.services.fhir_cache_service import fhir_cache
+from app.services.healthlake_service import healthlake_service
+from app.services.change_feed_service import change_feed
 
 router = APIRouter()
 
@@ -10,3 +14,25 @@ async def health_check():
         "service": "HealthLake AI API",
         "version": "1.0.0"
     }
+
+@router.get("/health/replica")
+async def replica_status():
+    """Row counts, watermarks and staleness of the local FHIR replica"""
+    if replica is None:
+        return {"enabled": False}
+    return {"enabled": True, "types": replica.status()}
+
+@router.get("/health/cache")
+async def cache_status():
+    """FHIR response cache hit/miss/revalidation and request coalescing counters"""
+    single_flight = healthlake_service.flights.stats()
+    if fhir_cache is None:
+        return {"enabled": False, "single_flight": single_flight}
+    return {"enabled": True, **fhir_cache.stats(), "single_flight": single_flight}
+
+@router.get("/health/change-feed")
+async def change_feed_status():
+    """Watermarks, consumers and event counters of the change feed"""
+    if change_feed is None:
+        return {"enabled": False}
+    return {"enabled": True, **change_feed.status()}
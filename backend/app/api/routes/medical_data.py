@@ -1,33 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Optional
 from app.services.healthlake_service import healthlake_service
+from app.services.ecg_service import parse_ecg_observation, ECG_WAVEFORM_CODE, DEFAULT_LEAD
+from app.services.volume_service import volume_service, AXES
+from app.services.vitals_service import vitals_service
+from app.services.vitals_analytics_service import vitals_analytics_service
 
 router = APIRouter()
 
 @router.get("/ecg/{patient_id}")
-async def get_ecg_data(patient_id: str):
-    """Get ECG waveform data for patient"""
+def get_ecg_data(patient_id: str, leads: Optional[str] = None):
+    """Get ECG waveform data for patient: Lead II by default, `leads=I,II,V1` or `leads=all`"""
     try:
         waveform_obs = healthlake_service.search('Observation', {
             'patient': patient_id, 
-            'code': '131328', 
+            'code': ECG_WAVEFORM_CODE, 
             '_count': '1'
         })
         
         if waveform_obs.get('entry'):
             obs = waveform_obs['entry'][0]['resource']
-            if 'valueSampledData' in obs:
-                sampled_data = obs['valueSampledData']
-                data_string = sampled_data['data']
-                period_ms = sampled_data['period']
-                
-                waveform = [float(x) for x in data_string.split()]
-                time = [i * period_ms / 1000 for i in range(len(waveform))]
-                
-                return {
-                    'time': time,
-                    'amplitude': waveform,
-                    'patient': obs.get('subject', {}).get('display', 'Unknown')
-                }
+            if not leads:
+                # Decode only the lead single-lead clients plot
+                recording = parse_ecg_observation(obs, [DEFAULT_LEAD], fallback_to_first=True)
+            elif leads.strip().lower() == 'all':
+                recording = parse_ecg_observation(obs)
+            else:
+                recording = parse_ecg_observation(obs, [lead.strip() for lead in leads.split(',') if lead.strip()])
+            
+            if recording:
+                return recording.to_dict()
         
         raise HTTPException(status_code=404, detail="No ECG data found")
         
@@ -37,7 +39,7 @@ async def get_ecg_data(patient_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/mri/{patient_id}")
-async def get_mri_reports(patient_id: str):
+def get_mri_reports(patient_id: str):
     """Get MRI diagnostic reports for patient"""
     try:
         reports = healthlake_service.search('DiagnosticReport', {
@@ -62,7 +64,7 @@ async def get_mri_reports(patient_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/mri-images/{patient_id}")
-async def get_mri_images(patient_id: str):
+def get_mri_images(patient_id: str):
     """Get MRI images for patient"""
     try:
         media = healthlake_service.search('Media', {
@@ -74,70 +76,85 @@ async def get_mri_images(patient_id: str):
         if media.get('entry'):
             for entry in media['entry']:
                 m = entry['resource']
-                if 'content' in m and 'data' in m['content']:
-                    images.append({
-                        'data': m['content']['data'],
-                        'title': m['content'].get('title', 'MRI Image'),
-                        'contentType': m['content'].get('contentType', 'image/png')
+                content = m.get('content', {})
+                image = {
+                    'id': m.get('id'),
+                    'title': content.get('title', 'MRI Image'),
+                    'contentType': content.get('contentType', 'image/png')
+                }
+                if content.get('url'):
+                    # Pixel data lives in the blob store; clients fetch it separately
+                    image.update({
+                        'url': content['url'],
+                        'thumbnailUrl': f"{content['url']}?size=small",
+                        'size': content.get('size'),
+                        'hash': content.get('hash')
                     })
+                elif 'data' in content:
+                    # Legacy inline Media not yet migrated to the blob store
+                    image['data'] = content['data']
+                else:
+                    continue
+                images.append(image)
         
         return {'images': images}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/mri-volume/{volume_id}")
+async def get_mri_volume(volume_id: str):
+    """Get MRI volume header (shape, spacing, default window)"""
+    header = volume_service.header(volume_id)
+    if header is None:
+        raise HTTPException(status_code=404, detail="Volume not found")
+    return header
+
+@router.get("/mri-volume/{volume_id}/slice")
+def get_mri_volume_slice(volume_id: str, axis: str = 'axial', index: Optional[int] = None,
+                         window: Optional[float] = None, level: Optional[float] = None):
+    """Render one slice of an MRI volume as PNG with window/level applied"""
+    if axis not in AXES:
+        raise HTTPException(status_code=400, detail=f"axis must be one of: {', '.join(AXES)}")
+    header = volume_service.header(volume_id)
+    if header is None:
+        raise HTTPException(status_code=404, detail="Volume not found")
+
+    if index is None:
+        # Default to the middle slice along the requested axis
+        index = header['shape'][AXES.index(axis)] // 2
+
+    png = volume_service.render_slice(volume_id, axis, index, center=level, width=window)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Slice index out of range")
+
+    return Response(content=png, media_type='image/png', headers={'Cache-Control': 'public, max-age=86400'})
+
 @router.get("/vital-signs/{patient_id}")
-async def get_vital_signs(patient_id: str):
-    """Get vital signs trends for patient"""
+def get_vital_signs(patient_id: str, bucket: Optional[str] = None, agg: str = 'mean',
+                    date_from: Optional[str] = Query(None, alias='from'),
+                    date_to: Optional[str] = Query(None, alias='to')):
+    """Get vital signs trends for patient.
+
+    With `bucket` (e.g. 1d) the full history is aggregated per bucket using
+    the comma-separated `agg` functions (min, max, mean, sum, count, first, last).
+    """
     try:
-        vital_codes = {
-            '85354-9': 'Blood Pressure',
-            '8867-4': 'Heart Rate',
-            '8310-5': 'Body Temperature',
-            '9279-1': 'Respiratory Rate',
-            '2708-6': 'Oxygen Saturation'
-        }
+        if bucket:
+            aggs = [a.strip() for a in agg.split(',') if a.strip()]
+            return vitals_service.aggregate_vitals(patient_id, bucket, aggs, date_from, date_to)
+        return vitals_service.get_vital_signs(patient_id)
         
-        vitals = {}
-        
-        for code, name in vital_codes.items():
-            obs = healthlake_service.search('Observation', {
-                'patient': patient_id,
-                'code': code,
-                '_count': '20',
-                '_sort': '-date'
-            })
-            
-            data_points = []
-            if obs.get('entry'):
-                for entry in obs['entry']:
-                    r = entry['resource']
-                    date = r.get('effectiveDateTime', r.get('issued', ''))
-                    
-                    if 'valueQuantity' in r:
-                        val = r['valueQuantity']
-                        data_points.append({
-                            'date': date,
-                            'value': val.get('value'),
-                            'unit': val.get('unit', '')
-                        })
-                    elif 'component' in r and name == 'Blood Pressure':
-                        bp_data = {'date': date}
-                        for comp in r['component']:
-                            comp_name = comp.get('code', {}).get('text', '')
-                            if 'valueQuantity' in comp:
-                                if 'Systolic' in comp_name:
-                                    bp_data['systolic'] = comp['valueQuantity'].get('value')
-                                elif 'Diastolic' in comp_name:
-                                    bp_data['diastolic'] = comp['valueQuantity'].get('value')
-                                bp_data['unit'] = comp['valueQuantity'].get('unit', 'mm[Hg]')
-                        if 'systolic' in bp_data or 'diastolic' in bp_data:
-                            data_points.append(bp_data)
-            
-            if data_points:
-                vitals[name] = data_points
-        
-        return vitals
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/vital-signs/{patient_id}/digest")
+def get_vital_signs_digest(patient_id: str):
+    """Get precomputed vitals signals (trends, threshold breaches, outliers, shifts)"""
+    try:
+        return vitals_analytics_service.digest(patient_id)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
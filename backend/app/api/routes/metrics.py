@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from app.services import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text exposition of request, upstream and cache metrics"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
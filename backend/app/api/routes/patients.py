@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models.patient import Patient, PatientSummary
-from app.services.healthlake_service import healthlake_service
+import json
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.models.patient import Patient, PatientSummary, PatientSummariesRequest
+from app.services.healthlake_service import healthlake_service, parse_summary_fields
+from app.services.timeline_service import timeline_service
+from app.services.digest_service import digest_store, digest_view, build_digests, fetch_patient_resources
 
 router = APIRouter()
 
@@ -9,17 +13,57 @@ router = APIRouter()
 async def get_patients():
     """Get all patients from HealthLake"""
     try:
-        patients = healthlake_service.get_all_patients()
+        # Waiters hold no threadpool worker; a burst of identical requests shares one upstream search
+        patients = await healthlake_service.get_all_patients_async()
         return patients
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+MAX_SUMMARY_IDS = 500
+
+def summaries_response(ids: List[str], fields, stream: bool):
+    try:
+        fields = parse_summary_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    ids = [i for i in ids if i]
+    if not ids:
+        raise HTTPException(status_code=400, detail="No patient ids given")
+    if len(ids) > MAX_SUMMARY_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SUMMARY_IDS} ids per request")
+    
+    summaries = healthlake_service.iter_patient_summaries(ids, fields)
+    if stream:
+        # One summary per line, flushed batch by batch as they complete
+        return StreamingResponse((json.dumps(s) + "\n" for s in summaries), media_type="application/x-ndjson")
+    return list(summaries)
+
+@router.get("/patients/summaries", response_model=List[PatientSummary], response_model_exclude_unset=True)
+def get_patient_summaries(ids: str = Query(..., description="Comma-separated patient ids"),
+                          fields: Optional[str] = None, stream: bool = False):
+    """Summaries for many patients with one search per section instead of one per patient"""
+    try:
+        return summaries_response(ids.split(','), fields, stream)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/patients/summaries", response_model=List[PatientSummary], response_model_exclude_unset=True)
+def post_patient_summaries(request: PatientSummariesRequest):
+    """Batch summaries for id lists too long for a query string"""
+    try:
+        return summaries_response(request.ids, request.fields, request.stream)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/patients/{patient_id}", response_model=Patient)
-async def get_patient(patient_id: str):
+def get_patient(patient_id: str):
     """Get patient by ID"""
     try:
-        patients = healthlake_service.get_all_patients()
-        patient = next((p for p in patients if p['id'] == patient_id), None)
+        patient = healthlake_service.get_patient(patient_id)
         
         if not patient:
             raise HTTPException(status_code=404, detail="Patient not found")
@@ -30,11 +74,42 @@ async def get_patient(patient_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/patients/{patient_id}/summary", response_model=PatientSummary)
-async def get_patient_summary(patient_id: str):
-    """Get comprehensive patient summary"""
+@router.get("/patients/{patient_id}/summary", response_model=PatientSummary, response_model_exclude_unset=True)
+def get_patient_summary(patient_id: str, fields: Optional[str] = None):
+    """Get comprehensive patient summary (`fields=name,has_ecg` fetches only what those need)"""
     try:
-        summary = healthlake_service.get_patient_summary(patient_id)
+        summary = healthlake_service.get_patient_summary(patient_id, fields)
         return summary
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/patients/{patient_id}/digest")
+def get_patient_digest(patient_id: str):
+    """Active conditions, current meds, allergies, latest vitals, ECG features and imaging findings"""
+    try:
+        if digest_store is not None:
+            digest = digest_store.get_or_build([patient_id]).get(patient_id)
+        else:
+            resources, _ = fetch_patient_resources([patient_id])
+            digest = build_digests([patient_id], resources)[patient_id]
+        
+        if digest is None or digest['patient_updated'] is None:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        
+        return digest_view(digest)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/patients/{patient_id}/timeline")
+def get_patient_timeline(patient_id: str, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
+    """Conditions, observations, reports, procedures, medications and encounters, newest first"""
+    try:
+        return timeline_service.get_timeline(patient_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,34 @@
+import hmac
+from fastapi import APIRouter, HTTPException, Header, Response
+from typing import Optional
+from app.services.profiler import profiler
+from app.core.config import settings
+
+router = APIRouter()
+
+def require_admin(token: Optional[str]):
+    """Profiling must be enabled and `X-Admin-Token` must match PROFILING_ADMIN_TOKEN"""
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    expected = settings.PROFILING_ADMIN_TOKEN
+    if not expected:
+        # Profiles expose stacks and routes; never serve them without a token
+        raise HTTPException(status_code=403, detail="PROFILING_ADMIN_TOKEN is not set")
+    if not hmac.compare_digest(token or '', expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/admin/profiles")
+def list_profiles(route: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """Captured request profiles, newest first (`route` filters by template, e.g. /api/patients/{patient_id})"""
+    require_admin(x_admin_token)
+    return {'status': profiler.status(), 'profiles': profiler.list_profiles(route)}
+
+@router.get("/admin/profiles/{profile_id}")
+def download_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Collapsed stacks (`frame;frame;frame count`) for flamegraph.pl or speedscope"""
+    require_admin(x_admin_token)
+    profile = profiler.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=profile['collapsed'] + '\n', media_type='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename="profile-{profile_id}.folded"'})
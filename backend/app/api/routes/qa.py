@@ -12,7 +12,7 @@ router = APIRouter()
 qa_history = {}
 
 @router.post("/qa/ask", response_model=QAResponse)
-async def ask_question(request: QARequest):
+def ask_question(request: QARequest):
     """Ask question about cached reports"""
     try:
         response = qa_service.ask_question(request.question, request.cached_reports)
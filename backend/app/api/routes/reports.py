@@ -1,17 +1,27 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from typing import List
 import uuid
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from app.models.report import ReportGenerateRequest, ReportStatus, Report
 from app.services.healthlake_service import healthlake_service
 from app.services.bedrock_service import bedrock_service
 from app.services.storage_service import storage_service
+from app.services.vitals_analytics_service import vitals_analytics_service
+from app.services.change_feed_service import change_feed
+from app.services import metrics, tracing
+from app.core.config import settings
 
 router = APIRouter()
 
 def generate_report_task(job_id: str, patient_id: str, patient_summary: dict):
     """Background task to generate report"""
+    with tracing.span('report.generate', **{'report.job_id': job_id, 'patient.id': patient_id}):
+        _generate_report(job_id, patient_id, patient_summary)
+
+def _generate_report(job_id: str, patient_id: str, patient_summary: dict):
     try:
         # Update status
         storage_service.set_status(job_id, 'processing', 'Starting report generation...')
@@ -20,10 +30,17 @@ def generate_report_task(job_id: str, patient_id: str, patient_summary: dict):
         def update_progress(message: str):
             storage_service.set_status(job_id, 'processing', message)
         
+        # Numeric vitals signals go to the specialists instead of raw series
+        try:
+            vitals_digest = vitals_analytics_service.digest(patient_id)
+        except Exception:
+            vitals_digest = {}
+        
         report_data = bedrock_service.generate_comprehensive_report(
             patient_id,
             patient_summary,
-            progress_callback=update_progress
+            progress_callback=update_progress,
+            vitals_digest=vitals_digest
         )
         
         # Save report
@@ -44,8 +61,48 @@ def generate_report_task(job_id: str, patient_id: str, patient_summary: dict):
     except Exception as e:
         storage_service.set_status(job_id, 'failed', f'Error: {str(e)}')
 
+# Reports regenerated after data changes run one at a time, off the request path
+refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-refresh')
+pending_refresh = set()
+refresh_lock = threading.Lock()
+
+def regenerate_report(patient_id: str):
+    """Build a fresh report for a patient whose data changed"""
+    with refresh_lock:
+        pending_refresh.discard(patient_id)
+    job_id = str(uuid.uuid4())
+    storage_service.set_status(job_id, 'pending', 'Regenerating after patient data changed')
+    try:
+        patient_summary = healthlake_service.get_patient_summary(patient_id)
+    except Exception as e:
+        storage_service.set_status(job_id, 'failed', f'Error: {str(e)}')
+        return
+    generate_report_task(job_id, patient_id, patient_summary)
+
+def refresh_reports_on_change(event: dict):
+    """Change-feed consumer: flag affected reports stale and optionally queue regeneration"""
+    flagged = storage_service.mark_stale(event['patient_ids'])
+    if not settings.CHANGE_FEED_REGENERATE_REPORTS:
+        return
+    for patient_id in {report['patient_id'] for report in flagged}:
+        with refresh_lock:
+            if patient_id in pending_refresh:
+                continue
+            pending_refresh.add(patient_id)
+        refresh_executor.submit(regenerate_report, patient_id)
+
+if change_feed is not None:
+    change_feed.subscribe('reports', refresh_reports_on_change)
+
+def _refresh_queue_metrics():
+    with refresh_lock:
+        pending = len(pending_refresh)
+    return [('report_refresh_pending', 'gauge', 'Reports queued for regeneration after data changes', (), {(): pending})]
+
+metrics.register_collector('report_refresh', _refresh_queue_metrics)
+
 @router.post("/reports/generate", response_model=ReportStatus)
-async def generate_report(request: ReportGenerateRequest, background_tasks: BackgroundTasks):
+def generate_report(request: ReportGenerateRequest, background_tasks: BackgroundTasks):
     """Start report generation (async)"""
     try:
         # Get patient summary
@@ -58,7 +115,7 @@ async def generate_report(request: ReportGenerateRequest, background_tasks: Back
         storage_service.set_status(job_id, 'pending', 'Report generation queued')
         
         # Start background task
-        background_tasks.add_task(generate_report_task, job_id, request.patient_id, patient_summary)
+        background_tasks.add_task(tracing.wrap(generate_report_task), job_id, request.patient_id, patient_summary)
         
         return {
             'job_id': job_id,
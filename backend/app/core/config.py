@@ -14,6 +14,59 @@ class Settings(BaseSettings):
     AWS_SESSION_TOKEN: Optional[str] = None
     HEALTHLAKE_DATASTORE_ID: str = "b1f04342d94dcc96c47f9528f039f5a8"
     
+    # Blob storage for imaging pixel data ("local" or "s3")
+    BLOB_STORE_BACKEND: str = "local"
+    BLOB_STORE_PATH: str = str(ROOT_DIR / "blob_store")
+    BLOB_STORE_BUCKET: Optional[str] = None
+    BLOB_STORE_ENDPOINT_URL: Optional[str] = None
+    
+    # Memory-mapped multi-slice MRI volumes (raw array + JSON header per series)
+    VOLUME_STORE_PATH: str = str(ROOT_DIR / "volume_store")
+    
+    # FHIR search response cache (in-process LRU, optional shared disk tier)
+    FHIR_CACHE_ENABLED: bool = True
+    FHIR_CACHE_MAX_ENTRIES: int = 1024
+    FHIR_CACHE_DISK_PATH: Optional[str] = None
+    
+    # Local SQLite read replica of the FHIR datastore
+    REPLICA_ENABLED: bool = False
+    REPLICA_PATH: str = str(ROOT_DIR / "replica" / "fhir.sqlite3")
+    REPLICA_MAX_STALENESS_SECONDS: int = 300
+    REPLICA_SYNC_INTERVAL_SECONDS: int = 60
+    
+    # Change feed: polls `_lastUpdated` deltas and pushes invalidations to caches
+    CHANGE_FEED_ENABLED: bool = False
+    CHANGE_FEED_STATE_PATH: str = str(ROOT_DIR / "replica" / "change_feed.json")
+    CHANGE_FEED_INTERVAL_SECONDS: int = 30
+    CHANGE_FEED_LOOKBACK_SECONDS: int = 60
+    CHANGE_FEED_TTL_SCALE: int = 10
+    CHANGE_FEED_REGENERATE_REPORTS: bool = False
+    
+    # Materialized per-patient digests (SQLite), kept current by the change feed
+    DIGEST_ENABLED: bool = False
+    DIGEST_PATH: str = str(ROOT_DIR / "replica" / "digests.sqlite3")
+    
+    # Columnar cohort store (Parquet, partitioned by table and month)
+    COHORT_STORE_PATH: str = str(ROOT_DIR / "replica" / "cohort")
+    
+    # Prometheus metrics (GET /metrics)
+    METRICS_ENABLED: bool = True
+    
+    # Tracing: OTLP/JSON spans to a local NDJSON file and/or an OTLP/HTTP collector
+    TRACING_ENABLED: bool = False
+    TRACING_SERVICE_NAME: str = "healthlake-ai-backend"
+    TRACING_EXPORT_PATH: Optional[str] = str(ROOT_DIR / "traces" / "spans.ndjson")
+    TRACING_OTLP_ENDPOINT: Optional[str] = None  # e.g. http://localhost:4318/v1/traces
+    TRACING_SAMPLE_RATE: float = 1.0
+    
+    # Request profiling: sampled and slow requests keep collapsed-stack profiles per route
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.01
+    PROFILING_SLOW_REQUEST_MS: float = 2000
+    PROFILING_INTERVAL_MS: float = 10
+    PROFILING_PROFILES_PER_ROUTE: int = 20
+    PROFILING_ADMIN_TOKEN: Optional[str] = None
+    
     class Config:
         env_file = str(ENV_FILE)
         case_sensitive = True
@@ -1,6 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import health, patients, reports, qa, medical_data
+from app.api.routes import health, patients, reports, qa, medical_data, blobs, cohort, metrics, profiles
+from app.services.replica_service import replica
+from app.services.change_feed_service import change_feed
+from app.services.fhir_cache_service import fhir_cache
+from app.services.metrics import MetricsMiddleware
+from app.services.tracing import TracingMiddleware, flush as flush_spans
+from app.services.profiler import profiler, ProfilingMiddleware
+from app.core.config import settings
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -23,12 +30,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms and status counts, scraped at GET /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Server span per request (continues an incoming `traceparent`); no-op unless TRACING_ENABLED
+app.add_middleware(TracingMiddleware)
+
+# Statistical profiles of sampled and slow requests, listed at /api/admin/profiles
+if profiler is not None:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
 # Include routers
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(patients.router, prefix="/api", tags=["patients"])
 app.include_router(reports.router, prefix="/api", tags=["reports"])
 app.include_router(qa.router, prefix="/api", tags=["qa"])
 app.include_router(medical_data.router, prefix="/api", tags=["medical_data"])
+app.include_router(blobs.router, prefix="/api", tags=["blobs"])
+app.include_router(cohort.router, prefix="/api", tags=["cohort"])
+app.include_router(metrics.router, tags=["metrics"])
+app.include_router(profiles.router, prefix="/api", tags=["admin"])
+
+@app.on_event("startup")
+async def start_replica_sync():
+    if replica is not None:
+        replica.start_sync(settings.REPLICA_SYNC_INTERVAL_SECONDS)
+
+@app.on_event("shutdown")
+async def stop_replica_sync():
+    if replica is not None:
+        replica.stop_sync()
+
+@app.on_event("startup")
+async def start_change_feed():
+    if change_feed is not None:
+        # Freshness now comes from invalidation events; TTL expiry is only a backstop
+        if fhir_cache is not None:
+            fhir_cache.ttl_scale = settings.CHANGE_FEED_TTL_SCALE
+        change_feed.start(settings.CHANGE_FEED_INTERVAL_SECONDS)
+
+@app.on_event("shutdown")
+async def stop_change_feed():
+    if change_feed is not None:
+        change_feed.stop()
+
+@app.on_event("shutdown")
+async def flush_tracing():
+    flush_spans()
+
+@app.on_event("startup")
+async def start_profiler():
+    if profiler is not None:
+        profiler.start()
+
+@app.on_event("shutdown")
+async def stop_profiler():
+    if profiler is not None:
+        profiler.stop()
 
 @app.get("/")
 async def root():
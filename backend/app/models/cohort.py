@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+
+class CohortFilter(BaseModel):
+    field: str
+    op: str = 'eq'
+    value: Any
+
+class CohortSubquery(BaseModel):
+    table: str = 'conditions'
+    filters: List[CohortFilter] = []
+    fields: Optional[List[str]] = None
+
+class CohortAggregate(BaseModel):
+    fn: str
+    field: Optional[str] = None
+
+class CohortQuery(BaseModel):
+    table: str = 'observations'
+    filters: List[CohortFilter] = []
+    cohort: Optional[CohortSubquery] = None
+    join: Optional[CohortSubquery] = None
+    group_by: List[str] = []
+    aggregates: List[CohortAggregate] = []
+    select: Optional[List[str]] = None
+    distinct: bool = False
+    sort: Optional[str] = None
+    limit: int = 100
+
+class CohortQueryResult(BaseModel):
+    table: str
+    matched_rows: int
+    rows: List[Dict[str, Any]]
+    truncated: bool
@@ -9,7 +9,7 @@ class Patient(BaseModel):
 
 class PatientSummary(BaseModel):
     id: str
-    name: str
+    name: str = 'Unknown'
     gender: Optional[str] = None
     birthDate: Optional[str] = None
     conditions: List[str] = []
@@ -17,3 +17,8 @@ class PatientSummary(BaseModel):
     allergies: List[str] = []
     has_ecg: bool = False
     mri_reports_count: int = 0
+
+class PatientSummariesRequest(BaseModel):
+    ids: List[str]
+    fields: Optional[List[str]] = None
+    stream: bool = False
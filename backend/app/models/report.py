@@ -21,3 +21,5 @@ class Report(BaseModel):
     comprehensive: str
     created_at: str
     status: str = "completed"
+    stale: bool = False  # patient data changed after the report was generated
+    stale_since: Optional[str] = None
@@ -1,9 +1,12 @@
+import time
 import boto3
 import json
 import uuid
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from app.core.config import settings
+from app.services import metrics, tracing
+from app.services.vitals_analytics_service import vitals_analytics_service, CARDIAC_MEASURES, METABOLIC_MEASURES
 
 class BedrockService:
     def __init__(self):
@@ -24,19 +27,38 @@ class BedrockService:
         agent_id = self.config[f'{agent_type}_agent']['agent_id']
         alias_id = self.config[f'{agent_type}_agent']['alias_id']
         
-        response = self.runtime.invoke_agent(
-            agentId=agent_id,
-            agentAliasId=alias_id,
-            sessionId=str(uuid.uuid4()),
-            inputText=input_text
-        )
+        session_id = str(uuid.uuid4())
         
-        completion = ""
-        for event in response.get('completion', []):
-            if 'chunk' in event:
-                chunk = event['chunk']
-                if 'bytes' in chunk:
-                    completion += chunk['bytes'].decode('utf-8')
+        # Latency covers the whole streamed completion, not just the initial response
+        start = time.perf_counter()
+        status = 'error'
+        with tracing.span('bedrock.invoke_agent', kind='client', **{
+            'agent.type': agent_type, 'agent.id': agent_id, 'agent.session_id': session_id,
+            'agent.input_chars': len(input_text)
+        }) as span:
+            try:
+                response = self.runtime.invoke_agent(
+                    agentId=agent_id,
+                    agentAliasId=alias_id,
+                    sessionId=session_id,
+                    inputText=input_text
+                )
+                retries = response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+                metrics.agent_retries.inc(agent_type, agent_id, amount=retries)
+                span.set('agent.retries', retries)
+                
+                completion = ""
+                for event in response.get('completion', []):
+                    if 'chunk' in event:
+                        chunk = event['chunk']
+                        if 'bytes' in chunk:
+                            metrics.agent_bytes.inc(agent_type, agent_id, amount=len(chunk['bytes']))
+                            completion += chunk['bytes'].decode('utf-8')
+                span.set('agent.output_chars', len(completion))
+                status = 'ok'
+            finally:
+                metrics.agent_latency.observe(time.perf_counter() - start, agent_type, agent_id)
+                metrics.agent_invocations.inc(agent_type, agent_id, status)
         
         # Remove apology lines
         lines = completion.split('\n')
@@ -45,8 +67,10 @@ class BedrockService:
         
         return completion
     
-    def generate_comprehensive_report(self, patient_id: str, patient_summary: dict, progress_callback=None) -> dict:
+    def generate_comprehensive_report(self, patient_id: str, patient_summary: dict, progress_callback=None,
+                                      vitals_digest: dict = None) -> dict:
         """Generate comprehensive report using all specialist agents"""
+        vitals_digest = vitals_digest or {}
         
         # Prepare data for each specialist
         cardiac_data = f"""
@@ -57,6 +81,9 @@ CARDIAC DATA:
 - Conditions: {', '.join(patient_summary.get('conditions', ['None']))}
 - Has ECG: {'Yes' if patient_summary.get('has_ecg') else 'No'}
 
+VITAL SIGNS (precomputed trends, thresholds and outliers):
+{vitals_analytics_service.format_digest(vitals_digest, CARDIAC_MEASURES)}
+
 Provide a detailed cardiac health analysis in clear, structured paragraphs. Do NOT use JSON format. Write in plain text with proper headings and bullet points.
 """
         
@@ -78,6 +105,9 @@ METABOLIC DATA:
 - Medications: {', '.join(patient_summary.get('medications', ['None']))}
 - Allergies: {', '.join(patient_summary.get('allergies', ['None']))}
 
+VITAL SIGNS (precomputed trends, thresholds and outliers):
+{vitals_analytics_service.format_digest(vitals_digest, METABOLIC_MEASURES)}
+
 Provide a detailed metabolic health analysis in clear, structured paragraphs. Do NOT use JSON format. Write in plain text with proper headings and bullet points.
 """
         
@@ -85,16 +115,18 @@ Provide a detailed metabolic health analysis in clear, structured paragraphs. Do
         if progress_callback:
             progress_callback("Step 1/4: Consulting Cardiologist...")
         
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            cardio_future = executor.submit(self.invoke_agent, 'cardiologist', cardiac_data)
+        with tracing.span('report.specialists', **{'patient.id': patient_id}), \
+                ThreadPoolExecutor(max_workers=3) as executor:
+            invoke_agent = tracing.wrap(self.invoke_agent)
+            cardio_future = executor.submit(invoke_agent, 'cardiologist', cardiac_data)
             
             if progress_callback:
                 progress_callback("Step 2/4: Consulting Radiologist...")
-            radio_future = executor.submit(self.invoke_agent, 'radiologist', imaging_data)
+            radio_future = executor.submit(invoke_agent, 'radiologist', imaging_data)
             
             if progress_callback:
                 progress_callback("Step 3/4: Consulting Endocrinologist...")
-            endo_future = executor.submit(self.invoke_agent, 'endocrinologist', metabolic_data)
+            endo_future = executor.submit(invoke_agent, 'endocrinologist', metabolic_data)
             
             cardio_report = cardio_future.result()
             radio_report = radio_future.result()
@@ -119,7 +151,8 @@ ENDOCRINOLOGY SUMMARY:
 Generate a comprehensive integrated medical report in clear, structured paragraphs. Do NOT use JSON format. Write in plain text with proper headings, sections, and bullet points for easy reading.
 """
         
-        final_report = self.invoke_agent('orchestrator', orchestrator_input)
+        with tracing.span('report.orchestrator', **{'patient.id': patient_id}):
+            final_report = self.invoke_agent('orchestrator', orchestrator_input)
         
         return {
             'cardiology': cardio_report,
@@ -0,0 +1,86 @@
+import io
+import os
+import re
+import base64
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+# Blob key, URL and storage layout shared by the backend store
+# (blob_service.py) and the root-level ingest/viewer helper (blob_store.py).
+# Kept free of settings and AWS imports so the root scripts can load it directly.
+#
+#   local:  <root>/<key[:2]>/<key>            bytes
+#           <root>/<key[:2]>/<key>.json       {"content_type": ...}
+#           <root>/derived/<key>/<variant>    renditions
+#   s3:     <prefix><key>, <prefix>derived/<key>/<variant>
+
+BLOB_URL_PREFIX = "/api/blobs/"
+S3_PREFIX = "blobs/"
+VARIANT_PATTERN = re.compile(r'^[a-z0-9_.-]+$')
+
+# Longest-edge sizes for the `size=` presets
+SIZE_PRESETS = {
+    'thumb': 128,
+    'small': 256,
+    'medium': 512
+}
+
+def is_valid_key(key: str) -> bool:
+    return len(key) == 64 and all(c in '0123456789abcdef' for c in key)
+
+def blob_info(data: bytes, content_type: str) -> dict:
+    """Content address and FHIR Attachment fields for a payload"""
+    key = hashlib.sha256(data).hexdigest()
+    return {
+        'key': key,
+        'size': len(data),
+        'content_type': content_type,
+        # FHIR R4 Attachment.hash is the base64 SHA-1 of the data
+        'hash': base64.b64encode(hashlib.sha1(data).digest()).decode('ascii'),
+        'url': f"{BLOB_URL_PREFIX}{key}"
+    }
+
+def key_from_url(url: str) -> Optional[str]:
+    """Extract the blob key from a Media `content.url`"""
+    if url and url.startswith(BLOB_URL_PREFIX):
+        key = url[len(BLOB_URL_PREFIX):]
+        if is_valid_key(key):
+            return key
+    return None
+
+def local_path(root, key: str) -> Path:
+    if not is_valid_key(key):
+        raise KeyError(key)
+    return Path(root) / key[:2] / key
+
+def local_derivative_path(root, key: str, variant: str) -> Path:
+    if not VARIANT_PATTERN.match(variant):
+        raise KeyError(variant)
+    return Path(root) / 'derived' / local_path(root, key).name / variant
+
+def s3_derivative_key(prefix: str, key: str, variant: str) -> str:
+    if not VARIANT_PATTERN.match(variant):
+        raise KeyError(variant)
+    return f"{prefix}derived/{key}/{variant}"
+
+def write_atomic(path: Path, data: bytes):
+    """Write-then-rename so readers never observe a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def render_thumbnail(data: bytes, size: str) -> bytes:
+    """PNG scaled so its longest edge fits a size preset"""
+    from PIL import Image
+
+    if size not in SIZE_PRESETS:
+        raise ValueError(f"Unknown size '{size}', expected one of {', '.join(SIZE_PRESETS)}")
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((SIZE_PRESETS[size], SIZE_PRESETS[size]), Image.LANCZOS)
+    buf = io.BytesIO()
+    image.save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
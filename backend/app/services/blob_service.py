@@ -0,0 +1,131 @@
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import boto3
+from app.core.config import settings
+from app.services.blob_layout import (
+    BLOB_URL_PREFIX, S3_PREFIX, blob_info, key_from_url, local_path,
+    local_derivative_path, s3_derivative_key, write_atomic
+)
+
+class BlobStore(ABC):
+    """Content-addressed, immutable blob storage (S3-style put/get/head/range)"""
+
+    @abstractmethod
+    def put(self, data: bytes, content_type: str = 'application/octet-stream') -> dict:
+        pass
+
+    @abstractmethod
+    def head(self, key: str) -> Optional[dict]:
+        """Return {'size', 'content_type'} or None if the blob does not exist"""
+
+    @abstractmethod
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """Read bytes [start, end] inclusive, like an HTTP Range"""
+
+    @abstractmethod
+    def put_derivative(self, key: str, variant: str, data: bytes):
+        """Store a derived rendition (thumbnail, tile, ...) of blob `key`"""
+
+    @abstractmethod
+    def get_derivative(self, key: str, variant: str) -> Optional[bytes]:
+        pass
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return local_path(self.root, key)
+
+    def put(self, data: bytes, content_type: str = 'application/octet-stream') -> dict:
+        info = blob_info(data, content_type)
+        path = self._path(info['key'])
+        if not path.exists():
+            write_atomic(path, data)
+            path.with_suffix('.json').write_text(json.dumps({'content_type': content_type}))
+        return info
+
+    def head(self, key: str) -> Optional[dict]:
+        try:
+            path = self._path(key)
+        except KeyError:
+            return None
+        if not path.exists():
+            return None
+        meta_path = path.with_suffix('.json')
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        return {
+            'size': path.stat().st_size,
+            'content_type': meta.get('content_type', 'application/octet-stream')
+        }
+
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            f.seek(start)
+            return f.read() if end is None else f.read(end - start + 1)
+
+    def put_derivative(self, key: str, variant: str, data: bytes):
+        write_atomic(local_derivative_path(self.root, key, variant), data)
+
+    def get_derivative(self, key: str, variant: str) -> Optional[bytes]:
+        path = local_derivative_path(self.root, key, variant)
+        return path.read_bytes() if path.exists() else None
+
+class S3BlobStore(BlobStore):
+    def __init__(self, bucket: str, prefix: str = S3_PREFIX, endpoint_url: Optional[str] = None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.s3 = boto3.client(
+            's3',
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            aws_session_token=settings.AWS_SESSION_TOKEN,
+            region_name=settings.AWS_REGION,
+            endpoint_url=endpoint_url
+        )
+
+    def put(self, data: bytes, content_type: str = 'application/octet-stream') -> dict:
+        info = blob_info(data, content_type)
+        if self.head(info['key']) is None:
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self.prefix + info['key'],
+                Body=data,
+                ContentType=content_type
+            )
+        return info
+
+    def head(self, key: str) -> Optional[dict]:
+        try:
+            response = self.s3.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self.s3.exceptions.ClientError:
+            return None
+        return {
+            'size': response['ContentLength'],
+            'content_type': response.get('ContentType', 'application/octet-stream')
+        }
+
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        byte_range = f"bytes={start}-" if end is None else f"bytes={start}-{end}"
+        response = self.s3.get_object(Bucket=self.bucket, Key=self.prefix + key, Range=byte_range)
+        return response['Body'].read()
+
+    def put_derivative(self, key: str, variant: str, data: bytes):
+        self.s3.put_object(Bucket=self.bucket, Key=s3_derivative_key(self.prefix, key, variant), Body=data)
+
+    def get_derivative(self, key: str, variant: str) -> Optional[bytes]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=s3_derivative_key(self.prefix, key, variant))
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return response['Body'].read()
+
+def create_blob_store() -> BlobStore:
+    if settings.BLOB_STORE_BACKEND == 's3':
+        return S3BlobStore(settings.BLOB_STORE_BUCKET, endpoint_url=settings.BLOB_STORE_ENDPOINT_URL)
+    return LocalBlobStore(settings.BLOB_STORE_PATH)
+
+blob_store = create_blob_store()
@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+from app.core.config import settings
+from app.services import metrics
+
+# Polls `_lastUpdated=ge<watermark - lookback>` per resource type and publishes
+# one event per result page to every subscribed consumer:
+#
+#   {'resource_type': 'Observation', 'ids': [...], 'patient_ids': [...],
+#    'resources': [...], 'watermark': '2025-01-08T19:22:01.123Z'}
+#
+# The lookback re-reads recent changes so that writes sharing the watermark's
+# timestamp, or becoming visible after a later one was polled, are not missed;
+# versions already published are skipped by (id, versionId). Watermarks are
+# persisted after each page, so delivery is at-least-once across restarts;
+# consumers must be idempotent (invalidations are).
+
+CHANGE_FEED_TYPES = (
+    'Patient', 'Observation', 'Condition', 'MedicationRequest', 'DiagnosticReport',
+    'AllergyIntolerance', 'Media', 'ImagingStudy', 'DocumentReference'
+)
+PAGE_SIZE = 100
+MAX_PAGES_PER_POLL = 20
+# Watermark for a type with no resources yet: its first changes are all new
+EMPTY_WATERMARK = '0001-01-01T00:00:00.000Z'
+
+def _shift_instant(instant: str, seconds: float) -> str:
+    """FHIR instant moved by `seconds`, as a UTC `...Z` instant"""
+    parsed = datetime.fromisoformat(instant.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    shifted = max(parsed + timedelta(seconds=seconds), datetime.min.replace(tzinfo=timezone.utc))
+    return shifted.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+def _version(resource: dict) -> tuple:
+    return resource.get('id'), resource.get('meta', {}).get('versionId')
+
+def change_event(resource_type: str, resources: list, watermark: str) -> dict:
+    from app.services.healthlake_service import subject_id
+
+    patient_ids = {r['id'] for r in resources if resource_type == 'Patient'}
+    patient_ids.update(pid for pid in (subject_id(r) for r in resources) if pid)
+    return {
+        'resource_type': resource_type,
+        'ids': [r['id'] for r in resources],
+        'patient_ids': sorted(patient_ids),
+        'resources': resources,
+        'watermark': watermark
+    }
+
+class ChangeFeed:
+    """Delta poller over HealthLake with a persisted watermark per resource type"""
+
+    def __init__(self, state_path: str, resource_types=CHANGE_FEED_TYPES,
+                 lookback_seconds: float = settings.CHANGE_FEED_LOOKBACK_SECONDS):
+        self.state_path = Path(state_path)
+        self.resource_types = tuple(resource_types)
+        self.lookback_seconds = lookback_seconds
+        # Per type: (id, versionId) -> lastUpdated of versions published within the lookback
+        self.published = {}
+        # Types whose last poll ran out of pages; the next one resumes without lookback
+        self.backlogged = set()
+        self.consumers = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.poll_thread = None
+        self.last_poll = None
+        self.counters = {'polls': 0, 'events': 0, 'changes': 0, 'consumer_errors': 0, 'poll_errors': 0}
+        self.watermarks = self._load_state()
+
+    def _load_state(self) -> dict:
+        try:
+            return json.loads(self.state_path.read_text()).get('watermarks', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            state = {'watermarks': dict(self.watermarks)}
+        fd, tmp = tempfile.mkstemp(dir=self.state_path.parent)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def subscribe(self, name: str, consumer: Callable[[dict], None]):
+        """Register `consumer(event)`; a consumer raising never blocks the others"""
+        with self.lock:
+            self.consumers = [(n, c) for n, c in self.consumers if n != name] + [(name, consumer)]
+
+    def publish(self, event: dict):
+        with self.lock:
+            consumers = list(self.consumers)
+            self.counters['events'] += 1
+            self.counters['changes'] += len(event['ids'])
+        for name, consumer in consumers:
+            try:
+                consumer(event)
+            except Exception as e:
+                with self.lock:
+                    self.counters['consumer_errors'] += 1
+                print(f"Change feed consumer '{name}' failed: {e}")
+
+    def _server_watermark(self, resource_type: str) -> str:
+        """lastUpdated of the type's newest resource, read from the server rather than the local clock"""
+        from app.services.healthlake_service import healthlake_service
+
+        latest = healthlake_service.search(resource_type, {'_sort': '-_lastUpdated', '_count': '1', '_elements': 'id,meta'},
+                                           use_replica=False, use_cache=False)
+        if latest.get('resourceType') == 'OperationOutcome':
+            raise RuntimeError(f"Change feed seed of {resource_type} failed: {json.dumps(latest)[:200]}")
+        entries = latest.get('entry') or [{}]
+        return entries[0].get('resource', {}).get('meta', {}).get('lastUpdated') or EMPTY_WATERMARK
+
+    def poll_type(self, resource_type: str, max_pages: int = MAX_PAGES_PER_POLL) -> int:
+        """Publish everything updated since the type's watermark; returns resources published"""
+        from app.services.healthlake_service import healthlake_service
+
+        watermark = self.watermarks.get(resource_type)
+        if watermark is None:
+            # First run: nothing is cached yet, so start from the newest change instead of replaying history
+            with self.lock:
+                self.watermarks[resource_type] = self._server_watermark(resource_type)
+            self._save_state()
+            return 0
+
+        published = self.published.setdefault(resource_type, {})
+        since = watermark if resource_type in self.backlogged else _shift_instant(watermark, -self.lookback_seconds)
+        params = {'_count': str(PAGE_SIZE), '_sort': '_lastUpdated', '_lastUpdated': f"ge{since}"}
+        seen = 0
+        backlogged = False
+        for bundle in healthlake_service.search_pages(resource_type, params, max_pages=max_pages,
+                                                      use_replica=False, use_cache=False):
+            if bundle.get('resourceType') == 'OperationOutcome':
+                raise RuntimeError(f"Change poll of {resource_type} failed: {json.dumps(bundle)[:200]}")
+            resources = [entry['resource'] for entry in bundle.get('entry', []) if 'resource' in entry]
+            if not resources:
+                break
+            backlogged = any(link.get('relation') == 'next' for link in bundle.get('link', []))
+            latest = max((r.get('meta', {}).get('lastUpdated', '') for r in resources), default='')
+            watermark = max(watermark, latest)
+            changed = [r for r in resources if _version(r) not in published]
+            if changed:
+                self.publish(change_event(resource_type, changed, watermark))
+                published.update((_version(r), r.get('meta', {}).get('lastUpdated', '')) for r in changed)
+                seen += len(changed)
+            with self.lock:
+                self.watermarks[resource_type] = watermark
+            self._save_state()
+
+        # The page budget ran out: continue from the watermark next time, or a
+        # lookback window holding more than a poll's worth would never advance
+        if backlogged:
+            self.backlogged.add(resource_type)
+        else:
+            self.backlogged.discard(resource_type)
+        horizon = _shift_instant(watermark, -self.lookback_seconds)
+        for key in [key for key, updated in published.items() if updated < horizon]:
+            del published[key]
+        return seen
+
+    def poll(self) -> dict:
+        """One pass over every watched type"""
+        seen = {}
+        for resource_type in self.resource_types:
+            try:
+                seen[resource_type] = self.poll_type(resource_type)
+            except Exception as e:
+                with self.lock:
+                    self.counters['poll_errors'] += 1
+                print(f"Change feed poll of {resource_type} failed: {e}")
+        with self.lock:
+            self.counters['polls'] += 1
+            self.last_poll = time.time()
+        return seen
+
+    def start(self, interval_seconds: int):
+        """Poll in a daemon thread"""
+        if self.poll_thread and self.poll_thread.is_alive():
+            return
+
+        def loop():
+            while not self.stop_event.is_set():
+                self.poll()
+                self.stop_event.wait(interval_seconds)
+
+        self.stop_event.clear()
+        self.poll_thread = threading.Thread(target=loop, name='fhir-change-feed', daemon=True)
+        self.poll_thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                **self.counters,
+                'consumers': [name for name, _ in self.consumers],
+                'watermarks': dict(self.watermarks),
+                'seconds_since_poll': round(time.time() - self.last_poll, 1) if self.last_poll else None
+            }
+
+# Built-in consumers
+
+def invalidate_fhir_cache(event: dict):
+    """Drop cached reads of the changed resources and the searches they could appear in"""
+    from app.services.fhir_cache_service import fhir_cache, read_key
+
+    if fhir_cache is None:
+        return
+    for resource_id in event['ids']:
+        fhir_cache.discard(read_key(event['resource_type'], resource_id))
+    fhir_cache.invalidate_patients(event['resource_type'], event['patient_ids'], event['ids'])
+
+def invalidate_vitals(event: dict):
+    from app.services.vitals_service import vitals_service
+
+    if event['resource_type'] in ('Observation', 'Patient'):
+        for patient_id in event['patient_ids']:
+            vitals_service.invalidate(patient_id)
+
+def update_replica(event: dict):
+    """Apply the changed resources to the local replica ahead of its own sync"""
+    from app.services.replica_service import replica
+
+    if replica is not None:
+        replica.upsert(event['resources'])
+
+def register_default_consumers(feed: 'ChangeFeed'):
+    feed.subscribe('fhir_cache', invalidate_fhir_cache)
+    feed.subscribe('vitals', invalidate_vitals)
+    feed.subscribe('replica', update_replica)
+
+change_feed: Optional[ChangeFeed] = None
+if settings.CHANGE_FEED_ENABLED:
+    change_feed = ChangeFeed(settings.CHANGE_FEED_STATE_PATH)
+    register_default_consumers(change_feed)
+    metrics.register_collector('change_feed', lambda: metrics.stats_families(
+        'change_feed', change_feed.status(), ('polls', 'events', 'changes', 'consumer_errors', 'poll_errors'),
+        ('seconds_since_poll',), 'FHIR change feed'))
@@ -0,0 +1,370 @@
+import re
+import json
+import shutil
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from app.core.config import settings
+
+# Columnar cohort store: Observations, Conditions and MedicationRequests from a
+# local export flattened into Parquet, hive-partitioned by table and month:
+#
+#   <COHORT_STORE_PATH>/observations/month=2024-07/part-00000.parquet
+#
+# Queries compile to dataset expressions (partition pruning + row-group
+# statistics) and run with Arrow's vectorized group-by kernels.
+
+TABLES = {
+    'observations': {
+        'resource_type': 'Observation',
+        'date': 'effective',
+        'schema': pa.schema([
+            ('patient_id', pa.string()), ('resource_id', pa.string()), ('code', pa.string()),
+            ('display', pa.string()), ('panel_code', pa.string()), ('value', pa.float64()),
+            ('unit', pa.string()), ('effective', pa.timestamp('s'))
+        ])
+    },
+    'conditions': {
+        'resource_type': 'Condition',
+        'date': 'onset',
+        'schema': pa.schema([
+            ('patient_id', pa.string()), ('resource_id', pa.string()), ('code', pa.string()),
+            ('display', pa.string()), ('status', pa.string()), ('onset', pa.timestamp('s'))
+        ])
+    },
+    'medications': {
+        'resource_type': 'MedicationRequest',
+        'date': 'authored',
+        'schema': pa.schema([
+            ('patient_id', pa.string()), ('resource_id', pa.string()), ('code', pa.string()),
+            ('display', pa.string()), ('status', pa.string()), ('authored', pa.timestamp('s'))
+        ])
+    }
+}
+TABLE_OF_TYPE = {spec['resource_type']: name for name, spec in TABLES.items()}
+ROWS_PER_FILE = 250_000
+MAX_RESULT_ROWS = 10_000
+UNDATED_PARTITION = 'none'
+
+FILTER_OPS = ('eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'in', 'contains')
+AGGREGATES = {
+    'count': 'count',
+    'count_distinct': 'count_distinct',
+    'sum': 'sum',
+    'mean': 'mean',
+    'min': 'min',
+    'max': 'max',
+    'stddev': 'stddev',
+    'median': 'approximate_median'
+}
+RELATIVE_DATE = re.compile(r'^-(\d+)([hdw])$')
+DATE_ONLY = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+RELATIVE_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    """FHIR date/dateTime -> naive UTC datetime (None when absent or unparseable)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+def _coding(concept: dict) -> tuple:
+    coding = next(iter((concept or {}).get('coding', [])), {})
+    return coding.get('code'), (concept or {}).get('text') or coding.get('display')
+
+def _patient_id(resource: dict) -> Optional[str]:
+    for field in ('subject', 'patient'):
+        reference = resource.get(field, {}).get('reference', '')
+        if reference.startswith('Patient/'):
+            return reference.split('/', 1)[1]
+    return None
+
+def observation_rows(resource: dict) -> list:
+    """One row per numeric value; panel components (e.g. BP) become rows with their own code"""
+    patient_id = _patient_id(resource)
+    effective = _timestamp(resource.get('effectiveDateTime') or resource.get('issued'))
+    code, display = _coding(resource.get('code'))
+    base = {'patient_id': patient_id, 'resource_id': resource.get('id'), 'effective': effective}
+
+    rows = []
+    if 'valueQuantity' in resource:
+        quantity = resource['valueQuantity']
+        rows.append({**base, 'code': code, 'display': display, 'panel_code': None,
+                     'value': quantity.get('value'), 'unit': quantity.get('unit')})
+    for component in resource.get('component', []):
+        if 'valueQuantity' in component:
+            component_code, component_display = _coding(component.get('code'))
+            quantity = component['valueQuantity']
+            rows.append({**base, 'code': component_code, 'display': component_display, 'panel_code': code,
+                         'value': quantity.get('value'), 'unit': quantity.get('unit')})
+    if not rows:
+        rows.append({**base, 'code': code, 'display': display, 'panel_code': None, 'value': None, 'unit': None})
+    return rows
+
+def condition_rows(resource: dict) -> list:
+    code, display = _coding(resource.get('code'))
+    status, _ = _coding(resource.get('clinicalStatus'))
+    return [{'patient_id': _patient_id(resource), 'resource_id': resource.get('id'), 'code': code,
+             'display': display, 'status': status, 'onset': _timestamp(resource.get('onsetDateTime') or resource.get('recordedDate'))}]
+
+def medication_rows(resource: dict) -> list:
+    code, display = _coding(resource.get('medicationCodeableConcept'))
+    return [{'patient_id': _patient_id(resource), 'resource_id': resource.get('id'), 'code': code,
+             'display': display, 'status': resource.get('status'), 'authored': _timestamp(resource.get('authoredOn'))}]
+
+ROW_BUILDERS = {'observations': observation_rows, 'conditions': condition_rows, 'medications': medication_rows}
+
+class CohortWriter:
+    """Buffers flattened rows per (table, month) and writes Parquet parts of ROWS_PER_FILE rows"""
+
+    def __init__(self, root: Path, rows_per_file: int = ROWS_PER_FILE):
+        self.root = root
+        self.rows_per_file = rows_per_file
+        self.buffers = {}
+        self.parts = {}
+        self.counts = {table: 0 for table in TABLES}
+
+    def add(self, resource: dict):
+        table = TABLE_OF_TYPE.get(resource.get('resourceType'))
+        if table is None:
+            return
+        date_column = TABLES[table]['date']
+        for row in ROW_BUILDERS[table](resource):
+            month = row[date_column].strftime('%Y-%m') if row[date_column] else UNDATED_PARTITION
+            buffer = self.buffers.setdefault((table, month), [])
+            buffer.append(row)
+            self.counts[table] += 1
+            if len(buffer) >= self.rows_per_file:
+                self._flush(table, month)
+
+    def _flush(self, table: str, month: str):
+        rows = self.buffers.pop((table, month), [])
+        if not rows:
+            return
+        part = self.parts.get((table, month), 0)
+        self.parts[(table, month)] = part + 1
+        directory = self.root / table / f"month={month}"
+        directory.mkdir(parents=True, exist_ok=True)
+        pq.write_table(pa.Table.from_pylist(rows, schema=TABLES[table]['schema']),
+                       directory / f"part-{part:05d}.parquet", compression='zstd')
+
+    def close(self) -> dict:
+        for table, month in list(self.buffers):
+            self._flush(table, month)
+        return self.counts
+
+def _parse_date(value) -> datetime:
+    match = RELATIVE_DATE.match(str(value))
+    if match:
+        return datetime.utcnow() - timedelta(**{RELATIVE_UNITS[match.group(2)]: int(match.group(1))})
+    parsed = _timestamp(str(value))
+    if parsed is None:
+        raise ValueError(f"Invalid date '{value}', expected ISO date/dateTime or relative like -30d")
+    return parsed
+
+class CohortService:
+    """Builds the columnar store from NDJSON and answers filter / group-by / aggregate queries"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.lock = threading.Lock()
+        self.datasets = {}
+
+    # Building
+
+    def build_from_ndjson(self, paths: Iterable[str]) -> dict:
+        """Rebuild every table from NDJSON files; swaps the new store in when complete"""
+        staging = self.root.with_name(self.root.name + '.building')
+        shutil.rmtree(staging, ignore_errors=True)
+        writer = CohortWriter(staging)
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        writer.add(json.loads(line))
+        counts = writer.close()
+
+        with self.lock:
+            previous = self.root.with_name(self.root.name + '.previous')
+            shutil.rmtree(previous, ignore_errors=True)
+            if self.root.exists():
+                self.root.rename(previous)
+            staging.rename(self.root)
+            shutil.rmtree(previous, ignore_errors=True)
+            self.datasets = {}
+        return counts
+
+    def _dataset(self, table: str) -> Optional[ds.Dataset]:
+        with self.lock:
+            if table not in self.datasets:
+                directory = self.root / table
+                self.datasets[table] = ds.dataset(
+                    str(directory), format='parquet', schema=TABLES[table]['schema'].append(pa.field('month', pa.string())),
+                    partitioning=ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+                ) if directory.exists() else None
+            return self.datasets[table]
+
+    def status(self) -> dict:
+        result = {}
+        for table in TABLES:
+            dataset = self._dataset(table)
+            result[table] = {'rows': dataset.count_rows() if dataset else 0,
+                             'files': len(dataset.files) if dataset else 0}
+        return result
+
+    # Querying
+
+    def _expression(self, table: str, filters: list) -> Optional[ds.Expression]:
+        """Filters -> dataset expression, plus month-partition bounds derived from date filters"""
+        schema = TABLES[table]['schema']
+        date_column = TABLES[table]['date']
+        expression = None
+        for spec in filters or []:
+            field, op, value = spec.get('field'), spec.get('op', 'eq'), spec.get('value')
+            if field not in schema.names:
+                raise ValueError(f"Unknown field '{field}' for {table}. Valid: {', '.join(schema.names)}")
+            if op not in FILTER_OPS:
+                raise ValueError(f"Unknown operator '{op}'. Valid: {', '.join(FILTER_OPS)}")
+
+            column = ds.field(field)
+            if field == date_column:
+                values = [_parse_date(v) for v in value] if op == 'in' else _parse_date(value)
+            elif pa.types.is_floating(schema.field(field).type) and op != 'in':
+                values = float(value)
+            else:
+                values = value
+
+            if field == date_column and op != 'in' and DATE_ONLY.match(str(value)):
+                # A bare date means the whole day: lte 2024-02-15 includes readings taken that afternoon
+                next_day = values + timedelta(days=1)
+                condition = {
+                    'eq': (column >= values) & (column < next_day), 'ne': (column < values) | (column >= next_day),
+                    'gt': column >= next_day, 'gte': column >= values, 'lt': column < values, 'lte': column < next_day
+                }[op]
+            elif op == 'in':
+                condition = column.isin(values if isinstance(values, list) else [values])
+            elif op == 'contains':
+                condition = pc.match_substring(column, str(values), ignore_case=True)
+            else:
+                condition = {
+                    'eq': column == values, 'ne': column != values, 'gt': column > values,
+                    'gte': column >= values, 'lt': column < values, 'lte': column <= values
+                }[op]
+            expression = condition if expression is None else expression & condition
+
+            # Prune month partitions before any file is opened
+            if field == date_column and op in ('gt', 'gte'):
+                expression &= ds.field('month') >= values.strftime('%Y-%m')
+            elif field == date_column and op in ('lt', 'lte'):
+                expression &= (ds.field('month') <= values.strftime('%Y-%m')) & (ds.field('month') != UNDATED_PARTITION)
+        return expression
+
+    def _scan(self, table: str, filters: list, columns: list) -> pa.Table:
+        if table not in TABLES:
+            raise ValueError(f"Unknown table '{table}'. Valid: {', '.join(TABLES)}")
+        dataset = self._dataset(table)
+        if dataset is None:
+            return TABLES[table]['schema'].empty_table().select(columns)
+        return dataset.to_table(columns=columns, filter=self._expression(table, filters))
+
+    @staticmethod
+    def _sort(result: pa.Table, sort: Optional[str]) -> pa.Table:
+        """Order by a result column; `-field` is descending, as in FHIR `_sort=-date`"""
+        if not sort:
+            return result
+        column = sort.lstrip('-')
+        if column not in result.column_names:
+            raise ValueError(f"Unknown sort field '{column}'. Valid: {', '.join(result.column_names)}")
+        return result.sort_by([(column, 'descending' if sort.startswith('-') else 'ascending')])
+
+    def query(self, spec: dict) -> dict:
+        """Run a cohort query:
+
+        {"table": "observations",
+         "filters": [{"field": "code", "op": "eq", "value": "8480-6"}],
+         "cohort": {"table": "conditions", "filters": [...]},          patients must match
+         "join": {"table": "conditions", "filters": [...], "fields": ["display"]},
+         "group_by": ["conditions.display"],
+         "aggregates": [{"fn": "median", "field": "value"}],
+         "select": ["patient_id"], "distinct": true, "sort": "-median_value", "limit": 100}
+
+        `sort` names a result column, `-` prefixed for descending. Grouped
+        results default to the first aggregate, descending.
+        """
+        table = spec.get('table', 'observations')
+        schema = TABLES.get(table, {}).get('schema')
+        if schema is None:
+            raise ValueError(f"Unknown table '{table}'. Valid: {', '.join(TABLES)}")
+        group_by = spec.get('group_by') or []
+        aggregates = spec.get('aggregates') or []
+        limit = min(int(spec.get('limit') or 100), MAX_RESULT_ROWS)
+        join = spec.get('join')
+
+        own = [c for c in dict.fromkeys(['patient_id'] + list(spec.get('select') or []) + group_by +
+                                        [a['field'] for a in aggregates if a.get('field')]) if c in schema.names]
+        result = self._scan(table, spec.get('filters'), own if (aggregates or spec.get('select')) else schema.names)
+
+        cohort = spec.get('cohort')
+        if cohort:
+            members = self._scan(cohort.get('table', 'conditions'), cohort.get('filters'), ['patient_id'])
+            result = result.filter(pc.is_in(result['patient_id'], value_set=pc.unique(members['patient_id'])))
+
+        if join:
+            join_table = join.get('table', 'conditions')
+            fields = join.get('fields') or ['display']
+            other = self._scan(join_table, join.get('filters'), ['patient_id'] + fields)
+            other = other.group_by(['patient_id'] + fields).aggregate([])   # one row per patient/value
+            other = other.rename_columns(['patient_id'] + [f"{join_table}.{f}" for f in fields])
+            result = result.join(other, 'patient_id', join_type='inner')
+
+        started_rows = result.num_rows
+        if aggregates:
+            unknown = [a.get('fn') for a in aggregates if a.get('fn') not in AGGREGATES]
+            if unknown:
+                raise ValueError(f"Unknown aggregate(s): {', '.join(map(str, unknown))}. Valid: {', '.join(AGGREGATES)}")
+            missing = [c for c in group_by if c not in result.column_names]
+            if missing:
+                raise ValueError(f"Unknown group_by field(s): {', '.join(missing)}")
+
+            specs = [(a.get('field') or 'patient_id', AGGREGATES[a['fn']]) for a in aggregates]
+            names = [f"{a['fn']}_{a.get('field') or 'rows'}" for a in aggregates]
+            if len(set(names)) != len(names):
+                raise ValueError("Duplicate aggregates")
+            if group_by:
+                grouped = result.group_by(group_by).aggregate(specs)
+                # Kernel output is named '<field>_<kernel>'; select by name so key/aggregate order never matters
+                grouped = pa.table([grouped[c] for c in group_by] + [grouped[f"{field}_{fn}"] for field, fn in specs],
+                                   names=group_by + names)
+            else:
+                grouped = pa.table({name: [getattr(pc, fn)(result[field]).as_py()]
+                                    for name, (field, fn) in zip(names, specs)})
+            grouped = self._sort(grouped, spec.get('sort') or (f"-{names[0]}" if group_by else None))
+            total = grouped.num_rows
+            rows = grouped.slice(0, limit).to_pylist()
+        else:
+            select = [c for c in (spec.get('select') or result.column_names) if c in result.column_names]
+            result = result.select(select)
+            if spec.get('distinct'):
+                result = result.group_by(select).aggregate([])
+            result = self._sort(result, spec.get('sort'))
+            total = result.num_rows
+            rows = result.slice(0, limit).to_pylist()
+            for row in rows:
+                for key, value in row.items():
+                    if isinstance(value, datetime):
+                        row[key] = value.isoformat() + 'Z'
+
+        return {'table': table, 'matched_rows': started_rows, 'rows': rows, 'truncated': total > limit}
+
+cohort_service = CohortService(settings.COHORT_STORE_PATH)
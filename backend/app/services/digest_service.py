@@ -0,0 +1,384 @@
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+from app.core.config import settings
+from app.services.change_feed_service import change_feed
+from app.services import metrics, tracing
+
+# One materialized document per patient, folded from individual resources so
+# it can be maintained incrementally (change-feed events, NDJSON loads) and
+# read back with a single key lookup. Sections are keyed by resource id and
+# remember each entry's meta.lastUpdated, so re-applying a resource, or an
+# older copy of it, is harmless.
+
+DIGEST_TYPES = ('Patient', 'Condition', 'MedicationRequest', 'AllergyIntolerance', 'Observation', 'DiagnosticReport')
+INACTIVE_CONDITION_STATUSES = {'inactive', 'resolved', 'remission'}
+CURRENT_MEDICATION_STATUSES = {'active', 'on-hold', 'draft', None}
+ECG_INTERVALS = {'8867-4': 'heart_rate', '8625-6': 'pr_interval', '8633-0': 'qrs_duration', '8634-8': 'qt_interval'}
+ECG_STUDY_CODE = '11524-6'
+ECG_WAVEFORM_CODE = '131328'
+IMAGING_CODES = {'24627-2'}
+BUILD_BATCH_SIZE = 50
+# Safety bound only: backfill searches page until exhausted
+BUILD_MAX_PAGES = 1000
+
+def _codes(concept: dict) -> set:
+    return {c.get('code') for c in (concept or {}).get('coding', [])}
+
+def _text(concept: dict) -> Optional[str]:
+    concept = concept or {}
+    return concept.get('text') or next((c.get('display') for c in concept.get('coding', []) if c.get('display')), None)
+
+def _status(concept: dict) -> Optional[str]:
+    return next((c.get('code') for c in (concept or {}).get('coding', [])), None)
+
+def _newer(entry: Optional[dict], last_updated: str) -> bool:
+    """True if `entry` already reflects a later version than `last_updated`"""
+    return bool(entry and entry.get('lastUpdated') and last_updated and entry['lastUpdated'] > last_updated)
+
+def _newest(entries: Iterable[dict], key: str) -> list:
+    return sorted(entries, key=lambda e: e.get(key) or '', reverse=True)
+
+def new_digest(patient_id: str) -> dict:
+    return {
+        'id': patient_id,
+        'name': 'Unknown',
+        'gender': 'Unknown',
+        'birthDate': 'Unknown',
+        'conditions': {},
+        'medications': {},
+        'allergies': {},
+        'vitals': {},
+        'ecg': {'latest': None, 'waveforms': {}},
+        'reports': {},
+        'patient_updated': None,   # meta.lastUpdated of the Patient resource folded in, if any
+        'updated_at': None
+    }
+
+def apply_resource(digest: dict, resource: dict):
+    """Fold one resource into the patient's digest (in place)"""
+    from app.services.healthlake_service import patient_record
+
+    resource_type, resource_id = resource.get('resourceType'), resource.get('id')
+    last_updated = resource.get('meta', {}).get('lastUpdated', '')
+
+    if resource_type == 'Patient':
+        if (digest['patient_updated'] or '') > last_updated:
+            return
+        digest.update({k: v for k, v in patient_record(resource).items() if k != 'id'})
+        digest['patient_updated'] = last_updated
+
+    elif resource_type == 'Condition':
+        if not _newer(digest['conditions'].get(resource_id), last_updated):
+            digest['conditions'][resource_id] = {
+                'text': _text(resource.get('code')),
+                'status': _status(resource.get('clinicalStatus')),
+                'onset': resource.get('onsetDateTime'),
+                'lastUpdated': last_updated
+            }
+
+    elif resource_type == 'MedicationRequest':
+        if not _newer(digest['medications'].get(resource_id), last_updated):
+            digest['medications'][resource_id] = {
+                'text': _text(resource.get('medicationCodeableConcept')),
+                'status': resource.get('status'),
+                'authoredOn': resource.get('authoredOn'),
+                'lastUpdated': last_updated
+            }
+
+    elif resource_type == 'AllergyIntolerance':
+        if not _newer(digest['allergies'].get(resource_id), last_updated):
+            digest['allergies'][resource_id] = {
+                'text': _text(resource.get('code')),
+                'criticality': resource.get('criticality'),
+                'status': _status(resource.get('clinicalStatus')),
+                'lastUpdated': last_updated
+            }
+
+    elif resource_type == 'Observation':
+        _apply_observation(digest, resource, resource_id)
+
+    elif resource_type == 'DiagnosticReport':
+        if not _newer(digest['reports'].get(resource_id), last_updated):
+            digest['reports'][resource_id] = {
+                'title': _text(resource.get('code')),
+                'date': resource.get('effectiveDateTime', resource.get('issued')),
+                'conclusion': resource.get('conclusion'),
+                'imaging': bool(_codes(resource.get('code')) & IMAGING_CODES),
+                'lastUpdated': last_updated
+            }
+
+def _apply_observation(digest: dict, resource: dict, resource_id: str):
+    from app.services.vitals_service import VITAL_CODES, parse_vital_point
+
+    codes = _codes(resource.get('code'))
+    date = resource.get('effectiveDateTime', resource.get('issued', ''))
+
+    if ECG_WAVEFORM_CODE in codes:
+        digest['ecg']['waveforms'][resource_id] = date
+        return
+
+    if ECG_STUDY_CODE in codes:
+        latest = digest['ecg']['latest']
+        if latest is None or latest['id'] == resource_id or (date or '') >= (latest.get('date') or ''):
+            features = {'id': resource_id, 'date': date, 'finding': resource.get('valueString')}
+            for component in resource.get('component', []):
+                name = next((ECG_INTERVALS[c] for c in _codes(component.get('code')) if c in ECG_INTERVALS), None)
+                if name:
+                    features[name] = component.get('valueQuantity', {}).get('value')
+            digest['ecg']['latest'] = features
+        return
+
+    code = next((c for c in codes if c in VITAL_CODES), None)
+    if code:
+        point = parse_vital_point(resource, VITAL_CODES[code])
+        current = digest['vitals'].get(VITAL_CODES[code])
+        if point and (current is None or current.get('id') == resource_id or point['date'] >= current['date']):
+            digest['vitals'][VITAL_CODES[code]] = {'id': resource_id, **point}
+
+def digest_view(digest: dict) -> dict:
+    """Public shape: active conditions, current meds, allergies, latest vitals, ECG and imaging"""
+    conditions = [c for c in digest['conditions'].values() if c['status'] not in INACTIVE_CONDITION_STATUSES]
+    medications = [m for m in digest['medications'].values() if m['status'] in CURRENT_MEDICATION_STATUSES]
+    strip = lambda entry: {k: v for k, v in entry.items() if k != 'lastUpdated'}
+    return {
+        'id': digest['id'],
+        'name': digest['name'],
+        'gender': digest['gender'],
+        'birthDate': digest['birthDate'],
+        'active_conditions': [strip(c) for c in _newest(conditions, 'onset')],
+        'current_medications': [strip(m) for m in _newest(medications, 'authoredOn')],
+        'allergies': [strip(a) for a in digest['allergies'].values()],
+        'latest_vitals': {name: {k: v for k, v in point.items() if k != 'id'} for name, point in digest['vitals'].items()},
+        'ecg': {
+            **(digest['ecg']['latest'] or {}),
+            'waveform_count': len(digest['ecg']['waveforms']),
+            'latest_waveform': max(digest['ecg']['waveforms'].values(), default=None)
+        },
+        'imaging_findings': [strip(r) for r in _newest(digest['reports'].values(), 'date') if r['imaging']],
+        'updated_at': digest['updated_at']
+    }
+
+def digest_summary(digest: dict, fields: tuple) -> dict:
+    """The patient summary (same shape as HealthLakeService summaries) served from a digest.
+
+    Like the search path it lists every condition and medication; only the
+    digest view narrows them to active and current ones.
+    """
+    from app.services.healthlake_service import SUMMARY_LIMIT
+
+    view = digest_view(digest)
+    texts = lambda entries: [e['text'] for e in entries if e.get('text')][:SUMMARY_LIMIT]
+    values = {
+        'name': view['name'],
+        'gender': view['gender'],
+        'birthDate': view['birthDate'],
+        'conditions': texts(_newest(digest['conditions'].values(), 'onset')),
+        'medications': texts(_newest(digest['medications'].values(), 'authoredOn')),
+        'allergies': texts(view['allergies']),
+        'has_ecg': bool(digest['ecg']['waveforms']),
+        'mri_reports_count': min(len(digest['reports']), SUMMARY_LIMIT)
+    }
+    return {'id': digest['id'], **{f: values[f] for f in fields}}
+
+def fetch_patient_resources(patient_ids: list) -> tuple:
+    """Every digest-relevant resource of the patients, straight from HealthLake.
+
+    Returns (resources, truncated): `truncated` holds patients whose resources
+    still ran past BUILD_MAX_PAGES when searched on their own.
+    """
+    from app.services.healthlake_service import healthlake_service
+
+    def section(resource_type, chunk):
+        params = {'patient': ','.join(chunk), '_count': '100'}
+        resources = []
+        exhausted = False
+        for bundle in healthlake_service.search_pages(resource_type, params, max_pages=BUILD_MAX_PAGES):
+            if bundle.get('resourceType') == 'OperationOutcome':
+                raise RuntimeError(f"{resource_type} search failed: {json.dumps(bundle)[:200]}")
+            resources.extend(entry['resource'] for entry in bundle.get('entry', []))
+            exhausted = not any(link.get('relation') == 'next' for link in bundle.get('link', []))
+        if exhausted:
+            return resources, set()
+        if len(chunk) == 1:
+            return resources, set(chunk)
+        # The chunk as a whole is too large: search its patients one at a time
+        resources, truncated = [], set()
+        for patient_id in chunk:
+            patient_resources, patient_truncated = section(resource_type, [patient_id])
+            resources.extend(patient_resources)
+            truncated |= patient_truncated
+        return resources, truncated
+
+    chunks = [patient_ids[i:i + BUILD_BATCH_SIZE] for i in range(0, len(patient_ids), BUILD_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=len(DIGEST_TYPES)) as executor:
+        patients = executor.submit(tracing.wrap(healthlake_service.read_many), 'Patient', patient_ids)
+        futures = [executor.submit(tracing.wrap(section), resource_type, chunk)
+                   for resource_type in DIGEST_TYPES[1:] for chunk in chunks]
+        resources = list(patients.result().values())
+        truncated = set()
+        for future in futures:
+            section_resources, section_truncated = future.result()
+            resources.extend(section_resources)
+            truncated |= section_truncated
+    return resources, truncated
+
+def build_digests(patient_ids: list, resources: Iterable[dict]) -> dict:
+    """Fold resources into fresh digests for the given patients (no storage)"""
+    from app.services.healthlake_service import subject_id
+
+    digests = {patient_id: new_digest(patient_id) for patient_id in patient_ids}
+    for resource in resources:
+        patient_id = resource['id'] if resource.get('resourceType') == 'Patient' else subject_id(resource)
+        if patient_id in digests:
+            apply_resource(digests[patient_id], resource)
+    return digests
+
+class DigestStore:
+    """Patient digests in SQLite: patient_id -> JSON document"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        self.counters = {'hits': 0, 'builds': 0, 'updates': 0}
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS digests (
+            patient_id TEXT PRIMARY KEY,
+            document TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )""")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(str(self.path), timeout=30)
+        return conn
+
+    def get_many(self, patient_ids: list) -> dict:
+        """patient_id -> digest for the ids that have one"""
+        found = {}
+        ids = list(dict.fromkeys(patient_ids))
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = self._connection().execute(
+                f"SELECT patient_id, document FROM digests WHERE patient_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((patient_id, json.loads(document)) for patient_id, document in rows)
+        with self.write_lock:
+            self.counters['hits'] += len(found)
+        return found
+
+    def get(self, patient_id: str) -> Optional[dict]:
+        return self.get_many([patient_id]).get(patient_id)
+
+    def apply(self, resources: Iterable[dict], ensure: Iterable[str] = (), create: bool = True) -> int:
+        """Fold resources into their patients' stored digests; returns digests written.
+
+        `ensure` creates digests even for patients without resources. With
+        `create=False` only existing digests are touched: a patient first seen
+        through a single change would otherwise get a digest missing its history.
+        """
+        from app.services.healthlake_service import subject_id
+
+        ensure = list(ensure)
+        by_patient = {patient_id: [] for patient_id in ensure}
+        for resource in resources:
+            if resource.get('resourceType') not in DIGEST_TYPES:
+                continue
+            patient_id = resource.get('id') if resource['resourceType'] == 'Patient' else subject_id(resource)
+            if patient_id:
+                by_patient.setdefault(patient_id, []).append(resource)
+        if not by_patient:
+            return 0
+
+        with self.write_lock:
+            conn = self._connection()
+            with conn:
+                existing = {}
+                ids = list(by_patient)
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    existing.update((pid, json.loads(doc)) for pid, doc in conn.execute(
+                        f"SELECT patient_id, document FROM digests WHERE patient_id IN ({','.join('?' * len(chunk))})", chunk))
+                now = time.time()
+                rows = []
+                ensure = set(ensure)
+                for patient_id, patient_resources in by_patient.items():
+                    if not create and patient_id not in existing and patient_id not in ensure:
+                        continue
+                    digest = existing.get(patient_id) or new_digest(patient_id)
+                    for resource in patient_resources:
+                        apply_resource(digest, resource)
+                    digest['updated_at'] = now
+                    rows.append((patient_id, json.dumps(digest), now))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO digests (patient_id, document, updated_at) VALUES (?, ?, ?)", rows
+                )
+            self.counters['updates'] += len(rows)
+        return len(rows)
+
+    def build(self, patient_ids: list) -> dict:
+        """Backfill digests for patients that have none yet (one set of searches per patient, ever).
+
+        Only patients that exist get a digest. One whose resources could not all
+        be fetched gets a digest for this call only; storing it would freeze the gap.
+        So does an existing patient with no resources at all, which is more often a
+        search that silently matched nothing than a genuinely empty record.
+        """
+        from app.services.healthlake_service import subject_id
+
+        if not patient_ids:
+            return {}
+        resources, truncated = fetch_patient_resources(patient_ids)
+        owner = lambda r: r.get('id') if r.get('resourceType') == 'Patient' else subject_id(r)
+        found = {r['id'] for r in resources if r.get('resourceType') == 'Patient'}
+        populated = {owner(r) for r in resources if r.get('resourceType') != 'Patient'}
+        complete = [patient_id for patient_id in patient_ids
+                    if patient_id in found and patient_id in populated and patient_id not in truncated]
+        keep = set(complete)
+        empty = [patient_id for patient_id in patient_ids if patient_id in found and patient_id not in populated]
+        partial = [patient_id for patient_id in patient_ids if patient_id in found and patient_id not in keep]
+
+        self.apply((r for r in resources if owner(r) in keep), ensure=complete)
+        with self.write_lock:
+            self.counters['builds'] += len(complete)
+
+        digests = self.get_many(complete)
+        if partial:
+            if truncated:
+                print(f"Not storing digests with truncated sections: {', '.join(sorted(truncated & found))}")
+            if empty:
+                print(f"Not storing digests for patients with no resources: {', '.join(empty)}")
+            digests.update(build_digests(partial, resources))
+        return digests
+
+    def get_or_build(self, patient_ids: list) -> dict:
+        """patient_id -> digest; unknown patients are left out"""
+        digests = self.get_many(patient_ids)
+        missing = [patient_id for patient_id in dict.fromkeys(patient_ids) if patient_id not in digests]
+        if missing:
+            digests.update(self.build(missing))
+        return digests
+
+    def stats(self) -> dict:
+        count = self._connection().execute("SELECT COUNT(*) FROM digests").fetchone()[0]
+        with self.write_lock:
+            return {**self.counters, 'digests': count}
+
+digest_store: Optional[DigestStore] = None
+if settings.DIGEST_ENABLED:
+    digest_store = DigestStore(settings.DIGEST_PATH)
+    metrics.register_collector('digests', lambda: metrics.stats_families(
+        'digest_store', digest_store.stats(), ('hits', 'builds', 'updates'), ('digests',), 'Patient digests'))
+    if change_feed is not None:
+        change_feed.subscribe('digests', lambda event: digest_store.apply(event['resources'], create=False))
+    else:
+        print("DIGEST_ENABLED without CHANGE_FEED_ENABLED: digests are only updated by build_digests.py")
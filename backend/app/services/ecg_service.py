@@ -0,0 +1,125 @@
+import numpy as np
+from typing import List, Optional
+
+# Standard 12-lead order with MDC reference ids used as component codes
+LEAD_CODES = {
+    'I': '131329',
+    'II': '131330',
+    'III': '131389',
+    'aVR': '131390',
+    'aVL': '131391',
+    'aVF': '131392',
+    'V1': '131331',
+    'V2': '131332',
+    'V3': '131333',
+    'V4': '131334',
+    'V5': '131335',
+    'V6': '131336'
+}
+CODE_TO_LEAD = {code: lead for lead, code in LEAD_CODES.items()}
+ECG_WAVEFORM_CODE = '131328'
+# Single-lead clients (the dashboard chart) plot Lead II
+DEFAULT_LEAD = 'II'
+
+class ECGRecording:
+    """Multi-lead ECG held as one contiguous (leads, samples) float32 array"""
+
+    def __init__(self, lead_names: List[str], signals: np.ndarray, period_ms: float, patient: str = 'Unknown'):
+        self.lead_names = lead_names
+        self.signals = signals
+        self.period_ms = period_ms
+        self.patient = patient
+
+    @property
+    def num_samples(self) -> int:
+        return self.signals.shape[1]
+
+    @property
+    def time(self) -> np.ndarray:
+        return np.arange(self.num_samples) * (self.period_ms / 1000)
+
+    def to_dict(self) -> dict:
+        """JSON payload; `amplitude` is Lead II (or the first lead without one) for single-lead clients"""
+        signals = self.signals.astype(np.float64).round(3)
+        primary = self.lead_names.index(DEFAULT_LEAD) if DEFAULT_LEAD in self.lead_names else 0
+        return {
+            'time': self.time.round(3).tolist(),
+            'amplitude': signals[primary].tolist(),
+            'leads': self.lead_names,
+            'signals': signals.tolist(),
+            'features': self.features(),
+            'patient': self.patient
+        }
+
+    def features(self) -> dict:
+        """Per-lead amplitude stats and R-peak heart rate in one vectorized pass"""
+        x = self.signals
+        mean = x.mean(axis=1)
+        centered = x - mean[:, None]
+        peak = np.abs(centered).max(axis=1)
+
+        # Local maxima above 60% of each lead's peak count as R waves
+        mid = centered[:, 1:-1]
+        is_peak = (mid > centered[:, :-2]) & (mid >= centered[:, 2:]) & (mid > 0.6 * peak[:, None])
+        duration_s = self.num_samples * self.period_ms / 1000
+        heart_rate = is_peak.sum(axis=1) * 60.0 / duration_s if duration_s else np.zeros(len(x))
+
+        return {
+            lead: {
+                'mean': round(float(mean[i]), 4),
+                'std': round(float(centered[i].std()), 4),
+                'min': round(float(x[i].min()), 4),
+                'max': round(float(x[i].max()), 4),
+                'peak_to_peak': round(float(np.ptp(x[i])), 4),
+                'heart_rate': round(float(heart_rate[i]), 1)
+            }
+            for i, lead in enumerate(self.lead_names)
+        }
+
+def _lead_name(component: dict) -> Optional[str]:
+    for coding in component.get('code', {}).get('coding', []):
+        lead = CODE_TO_LEAD.get(coding.get('code'))
+        if lead:
+            return lead
+    text = component.get('code', {}).get('text', '')
+    return text.replace('Lead', '').strip() or None
+
+def parse_ecg_observation(obs: dict, leads: Optional[List[str]] = None,
+                          fallback_to_first: bool = False) -> Optional[ECGRecording]:
+    """Parse an ECG Observation, decoding only the requested leads (all when `leads` is None).
+
+    Multi-lead recordings carry one SampledData per `component`; legacy
+    single-lead recordings keep Lead II in `valueSampledData`. With
+    `fallback_to_first`, a recording lacking every requested lead yields its first lead.
+    """
+    sources = []
+    if obs.get('component'):
+        for comp in obs['component']:
+            if 'valueSampledData' in comp:
+                lead = _lead_name(comp)
+                if lead:
+                    sources.append((lead, comp['valueSampledData']))
+    elif 'valueSampledData' in obs:
+        sources.append(('II', obs['valueSampledData']))
+
+    if leads:
+        wanted = {lead.lower() for lead in leads}
+        matched = [s for s in sources if s[0].lower() in wanted]
+        sources = matched or (sources[:1] if fallback_to_first else [])
+    if not sources:
+        return None
+
+    period_ms = float(sources[0][1]['period'])
+    rows = [np.fromstring(sd['data'], dtype=np.float32, sep=' ') for _, sd in sources]
+    num_samples = min(len(r) for r in rows)
+
+    signals = np.empty((len(rows), num_samples), dtype=np.float32)
+    for i, row in enumerate(rows):
+        signals[i] = row[:num_samples]
+
+    return ECGRecording(
+        [lead for lead, _ in sources],
+        signals,
+        period_ms,
+        obs.get('subject', {}).get('display', 'Unknown')
+    )
@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+from app.core.config import settings
+
+# Seconds a cached search stays fresh before it is revalidated upstream
+DEFAULT_TTL = 60
+TTLS = {
+    'Patient': 300,
+    'AllergyIntolerance': 300,
+    'Condition': 120,
+    'MedicationRequest': 120,
+    'DiagnosticReport': 120,
+    'Media': 300,
+    'ImagingStudy': 300,
+    'Observation': 60
+}
+
+# Searches constrained to particular patients (or resources); anything else may list any patient
+PATIENT_SCOPED_PARAMS = ('patient', 'subject', '_id')
+
+def cache_key(resource_type: str, params: Optional[dict]) -> str:
+    """Normalized `Type?a=1&b=2` key: parameters (and repeated values) sorted"""
+    items = []
+    for key, value in (params or {}).items():
+        for item in sorted(value) if isinstance(value, list) else [value]:
+            items.append((key, str(item)))
+    return f"{resource_type}?{urlencode(sorted(items))}"
+
+def read_key(resource_type: str, resource_id: str) -> str:
+    return f"{resource_type}/{resource_id}"
+
+def _resource_type_of(key: str) -> str:
+    return re.split(r'[?/]', key, 1)[0]
+
+def _newer_version(current: Optional[dict], version: Optional[str]) -> bool:
+    """True if the cached entry already holds a later versionId than `version`"""
+    held = (current or {}).get('version')
+    if not held or not version or not (held.isdigit() and version.isdigit()):
+        return False
+    return int(held) > int(version)
+
+class FHIRResponseCache:
+    """In-process LRU of search Bundles with an optional shared on-disk tier.
+
+    Entries carry the response's ETag / Last-Modified so an expired entry can
+    be revalidated with a conditional request instead of refetched. Cached
+    Bundles are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_path = Path(disk_path) if disk_path else None
+        if self.disk_path:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Raised while a change feed pushes invalidations, so expiry is only a backstop
+        self.ttl_scale = 1
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'revalidations': 0, 'refreshes': 0}
+
+    def ttl(self, resource_type: str) -> int:
+        return TTLS.get(resource_type, DEFAULT_TTL) * self.ttl_scale
+
+    def _count(self, counter: str):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def _disk_file(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.disk_path / _resource_type_of(key) / f"{digest}.json"
+
+    def _remember(self, key: str, entry: dict):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Cached entry (fresh or expired) or None; fresh hits are counted here"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+        if entry is None and self.disk_path:
+            path = self._disk_file(key)
+            try:
+                entry = json.loads(path.read_text())
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                if entry['expires_at'] > time.time():
+                    self._count('disk_hits')
+
+        if entry is None:
+            self._count('misses')
+        elif entry['expires_at'] > time.time():
+            self._count('hits')
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        return entry['expires_at'] > time.time()
+
+    def conditional_headers(self, entry: Optional[dict]) -> dict:
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, key: str, resource_type: str, body: dict, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, revalidating: bool = False, version: Optional[str] = None):
+        """Store a response; instance reads pass `version` so an older copy never replaces a newer one"""
+        with self.lock:
+            if _newer_version(self.entries.get(key), version):
+                return
+        entry = {
+            'key': key,
+            'resource_type': resource_type,
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'version': version,
+            'expires_at': time.time() + self.ttl(resource_type)
+        }
+        if revalidating:
+            self._count('refreshes')
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def revalidated(self, key: str, entry: dict) -> dict:
+        """Upstream answered 304: extend the entry's lifetime and reuse its body"""
+        self._count('revalidations')
+        entry = {**entry, 'expires_at': time.time() + self.ttl(entry['resource_type'])}
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+        return entry
+
+    def _write_disk(self, key: str, entry: dict):
+        if not self.disk_path:
+            return
+        path = self._disk_file(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def discard(self, key: str):
+        """Drop a single entry (e.g. one resource read) from both tiers"""
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.disk_path:
+            self._disk_file(key).unlink(missing_ok=True)
+
+    def invalidate(self, resource_type: Optional[str] = None):
+        """Drop entries for one resource type (or all) from both tiers"""
+        with self.lock:
+            for key in [k for k in self.entries if resource_type is None or _resource_type_of(k) == resource_type]:
+                del self.entries[key]
+        if self.disk_path:
+            for path in self.disk_path.glob(f"{resource_type or '*'}/*.json"):
+                path.unlink(missing_ok=True)
+
+    def invalidate_patients(self, resource_type: str, patient_ids, resource_ids=()):
+        """Drop searches of a type scoped to one of the patients (or changed ids), or not patient-scoped"""
+        changed = set(patient_ids) | set(resource_ids)
+
+        def affected(key):
+            if '?' not in key:
+                return False   # instance reads are discarded by id
+            scoped = set()
+            for name, value in parse_qsl(key.split('?', 1)[1]):
+                if name.split(':')[0] in PATIENT_SCOPED_PARAMS:
+                    scoped.update(v.split('/')[-1] for v in value.split(','))
+            return not scoped or bool(scoped & changed)
+
+        with self.lock:
+            for key in [k for k in self.entries if _resource_type_of(k) == resource_type and affected(k)]:
+                del self.entries[key]
+        if self.disk_path:
+            for path in self.disk_path.glob(f"{resource_type}/*.json"):
+                try:
+                    key = json.loads(path.read_text()).get('key')
+                except (OSError, ValueError):
+                    key = None
+                if key is None or affected(key):
+                    path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'entries': len(self.entries),
+                'ttl_scale': self.ttl_scale,
+                'hit_rate': round(self.counters['hits'] / lookups, 3) if lookups else None
+            }
+
+fhir_cache = FHIRResponseCache(
+    max_entries=settings.FHIR_CACHE_MAX_ENTRIES,
+    disk_path=settings.FHIR_CACHE_DISK_PATH
+) if settings.FHIR_CACHE_ENABLED else None
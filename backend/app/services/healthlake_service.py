@@ -1,8 +1,98 @@
+import time
 import boto3
+import asyncio
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 from app.core.config import settings
+from app.services.replica_service import replica, NEXT_LINK_PREFIX
+from app.services.fhir_cache_service import fhir_cache, cache_key, read_key
+from app.services.single_flight import SingleFlight
+from app.services.digest_service import digest_store, digest_summary
+from app.services import metrics, tracing
+
+READ_BATCH_SIZE = 50
+
+# Patient summary sections: field -> (resource type, extra search params,
+# element holding the display text, `_elements` projection to request)
+SUMMARY_SECTIONS = {
+    'conditions': ('Condition', {}, 'code', 'code,subject'),
+    'medications': ('MedicationRequest', {}, 'medicationCodeableConcept', 'medicationCodeableConcept,subject'),
+    'allergies': ('AllergyIntolerance', {}, 'code', 'code,patient'),
+    'has_ecg': ('Observation', {'code': '131328'}, None, 'subject'),
+    'mri_reports_count': ('DiagnosticReport', {}, None, 'subject')
+}
+DEMOGRAPHIC_FIELDS = ('name', 'gender', 'birthDate')
+SUMMARY_FIELDS = DEMOGRAPHIC_FIELDS + tuple(SUMMARY_SECTIONS)
+SUMMARY_LIMIT = 10
+SUMMARY_BATCH_SIZE = 50
+SECTION_PAGE_SIZE = 100
+SECTION_MAX_PAGES = 20
+
+def url_resource_type(url: str) -> str:
+    """Resource type a FHIR URL addresses (`.../r4/Observation?code=...` -> Observation)"""
+    path = url.split('/r4/', 1)[-1]
+    return path.split('?', 1)[0].split('/', 1)[0] or 'unknown'
+
+def subject_id(resource: dict):
+    """Patient id a resource belongs to (subject or patient reference)"""
+    for field in ('subject', 'patient'):
+        reference = resource.get(field, {}).get('reference', '')
+        if reference.startswith('Patient/'):
+            return reference.split('/', 1)[1]
+    return None
+
+def empty_summary(patient_id: str) -> dict:
+    return {
+        'id': patient_id,
+        'name': 'Unknown',
+        'gender': 'Unknown',
+        'birthDate': 'Unknown',
+        'conditions': [],
+        'medications': [],
+        'allergies': [],
+        'has_ecg': False,
+        'mri_reports_count': 0
+    }
+
+def parse_summary_fields(fields) -> tuple:
+    """Field mask ('name,has_ecg' or a list) -> validated tuple; empty means everything"""
+    if not fields:
+        return SUMMARY_FIELDS
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = tuple(dict.fromkeys(f.strip() for f in fields if f.strip()))
+    unknown = [f for f in fields if f not in SUMMARY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown summary field(s): {', '.join(unknown)}. Valid: {', '.join(SUMMARY_FIELDS)}")
+    return fields or SUMMARY_FIELDS
+
+def apply_section(summary: dict, field: str, resources: list):
+    """Fill one summary field from the patient's resources of that section"""
+    _, _, element, _ = SUMMARY_SECTIONS[field]
+    if field == 'has_ecg':
+        summary[field] = bool(resources)
+    elif field == 'mri_reports_count':
+        summary[field] = len(resources[:SUMMARY_LIMIT])
+    else:
+        summary[field] = [r[element]['text'] for r in resources[:SUMMARY_LIMIT] if 'text' in r.get(element, {})]
+
+def patient_record(resource: dict) -> dict:
+    """id / display name / gender / birthDate of a Patient resource"""
+    name = 'Unknown'
+    if 'name' in resource and resource['name']:
+        name_obj = resource['name'][0]
+        given = ' '.join(name_obj.get('given', []))
+        family = name_obj.get('family', '')
+        name = f"{given} {family}".strip()
+    
+    return {
+        'id': resource['id'],
+        'name': name,
+        'gender': resource.get('gender', 'Unknown'),
+        'birthDate': resource.get('birthDate', 'Unknown')
+    }
 
 class HealthLakeService:
     def __init__(self):
@@ -15,105 +105,284 @@ class HealthLakeService:
             aws_session_token=settings.AWS_SESSION_TOKEN,
             region_name=self.region
         )
+        # Searches the replica can answer are served locally while it is fresh enough
+        self.replica = replica
+        self.max_staleness = settings.REPLICA_MAX_STALENESS_SECONDS
+        self.cache = fhir_cache
+        # Identical concurrent searches share one upstream request
+        self.flights = SingleFlight()
+        self.digests = digest_store
     
-    def search(self, resource_type: str, params: dict = None):
-        """Search HealthLake FHIR resources"""
+    def _request(self, url: str, headers: dict = None):
+        """Signed GET against the FHIR endpoint, returning the raw response"""
         credentials = self.session.get_credentials()
+        request = AWSRequest(method='GET', url=url, headers=headers or {})
+        SigV4Auth(credentials, 'healthlake', self.region).add_auth(request)
+        
+        resource_type = url_resource_type(url)
+        with tracing.span('healthlake.request', kind='client', **{'fhir.resource_type': resource_type}) as span:
+            start = time.perf_counter()
+            try:
+                response = requests.get(url, headers=dict(request.headers))
+            except Exception as e:
+                metrics.fhir_errors.inc(resource_type, type(e).__name__)
+                raise
+            finally:
+                metrics.fhir_latency.observe(time.perf_counter() - start, resource_type)
+            metrics.fhir_requests.inc(resource_type, str(response.status_code))
+            metrics.fhir_bytes.inc(resource_type, amount=len(response.content))
+            span.set('http.status_code', response.status_code)
+            span.set('http.response_content_length', len(response.content))
+            return response
+    
+    def _get(self, url: str):
+        """Signed GET against the FHIR endpoint"""
+        return self._request(url).json()
+    
+    def search(self, resource_type: str, params: dict = None, use_replica: bool = True, use_cache: bool = True):
+        """Search HealthLake FHIR resources"""
+        with tracing.span('healthlake.search', **{'fhir.resource_type': resource_type,
+                                                  'fhir.params': ','.join(sorted(params or {}))}) as span:
+            if use_replica and self.replica is not None:
+                local = self.replica.search(resource_type, params, self.max_staleness)
+                if local is not None:
+                    metrics.fhir_replica_hits.inc(resource_type)
+                    span.set('fhir.source', 'replica')
+                    return local
+            
+            key = cache_key(resource_type, params)
+            return self.flights.do(('search', key, use_cache), self._search_remote, resource_type, params, key, use_cache)
+    
+    async def search_async(self, resource_type: str, params: dict = None, use_replica: bool = True, use_cache: bool = True):
+        """`search` for coroutines: identical searches from tasks and threads share one upstream call"""
+        if use_replica and self.replica is not None:
+            loop = asyncio.get_running_loop()
+            local = await loop.run_in_executor(None, self.replica.search, resource_type, params, self.max_staleness)
+            if local is not None:
+                metrics.fhir_replica_hits.inc(resource_type)
+                return local
+        
+        key = cache_key(resource_type, params)
+        return await self.flights.do_async(('search', key, use_cache), tracing.wrap(self._search_remote),
+                                           resource_type, params, key, use_cache)
+    
+    def _search_remote(self, resource_type: str, params: dict, key: str, use_cache: bool):
         url = f"{self.endpoint}{resource_type}"
         
         if params:
-            url += "?" + "&".join([f"{k}={v}" for k, v in params.items()])
+            # List values repeat the parameter, e.g. date=ge...&date=le...
+            url += "?" + "&".join([
+                f"{k}={item}" for k, v in params.items() for item in (v if isinstance(v, list) else [v])
+            ])
         
-        request = AWSRequest(method='GET', url=url)
-        SigV4Auth(credentials, 'healthlake', self.region).add_auth(request)
+        if not use_cache or self.cache is None:
+            return self._get(url)
+        
+        cached = self.cache.get(key)
+        if cached is not None and self.cache.is_fresh(cached):
+            return cached['body']
+        
+        # Expired entries are revalidated; a 304 reuses the cached Bundle
+        response = self._request(url, self.cache.conditional_headers(cached))
+        if response.status_code == 304 and cached is not None:
+            return self.cache.revalidated(key, cached)['body']
+        
+        body = response.json()
+        if response.ok and body.get('resourceType') == 'Bundle':
+            self.cache.put(key, resource_type, body,
+                           etag=response.headers.get('ETag'),
+                           last_modified=response.headers.get('Last-Modified'),
+                           revalidating=cached is not None)
+        return body
+    
+    def read(self, resource_type: str, resource_id: str, use_cache: bool = True):
+        """Instance read (GET Type/id); returns the resource or None if it does not exist"""
+        with tracing.span('healthlake.read', **{'fhir.resource_type': resource_type}) as span:
+            if self.replica is not None:
+                local = self.replica.search(resource_type, {'_id': resource_id}, self.max_staleness)
+                if local is not None and local.get('entry'):
+                    metrics.fhir_replica_hits.inc(resource_type)
+                    span.set('fhir.source', 'replica')
+                    return local['entry'][0]['resource']
+            
+            key = read_key(resource_type, resource_id)
+            return self.flights.do(('read', key, use_cache), self._read_remote, resource_type, resource_id, key, use_cache)
+    
+    def _read_remote(self, resource_type: str, resource_id: str, key: str, use_cache: bool):
+        url = f"{self.endpoint}{resource_type}/{resource_id}"
+        cache = self.cache if use_cache else None
+        
+        cached = cache.get(key) if cache else None
+        if cached is not None and cache.is_fresh(cached):
+            return cached['body']
+        
+        # ETags on instance reads are the versionId, so an unchanged resource costs a 304
+        response = self._request(url, cache.conditional_headers(cached) if cache else None)
+        if response.status_code == 304 and cached is not None:
+            return cache.revalidated(key, cached)['body']
+        if response.status_code in (404, 410):
+            if cache:
+                cache.discard(key)
+            return None
+        if not response.ok:
+            raise RuntimeError(f"HealthLake read {resource_type}/{resource_id} failed: {response.status_code} {response.text[:200]}")
+        
+        resource = response.json()
+        if cache:
+            version = resource.get('meta', {}).get('versionId')
+            cache.put(key, resource_type, resource,
+                      etag=response.headers.get('ETag') or (f'W/"{version}"' if version else None),
+                      last_modified=response.headers.get('Last-Modified'),
+                      revalidating=cached is not None,
+                      version=version)
+        return resource
+    
+    def read_many(self, resource_type: str, resource_ids: list) -> dict:
+        """Batch instance read: fresh cache hits plus one `_id=a,b,...` search per 50 misses.
         
-        response = requests.get(url, headers=dict(request.headers))
-        return response.json()
+        Returns {id: resource}; ids that do not exist are absent.
+        """
+        found = {}
+        missing = []
+        for resource_id in dict.fromkeys(resource_ids):
+            cached = self.cache.get(read_key(resource_type, resource_id)) if self.cache else None
+            if cached is not None and self.cache.is_fresh(cached):
+                found[resource_id] = cached['body']
+            else:
+                missing.append(resource_id)
+        
+        def fetch(chunk):
+            resources = []
+            for bundle in self.search_pages(resource_type, {'_id': ','.join(chunk), '_count': str(len(chunk))},
+                                            use_cache=False):
+                resources.extend(entry['resource'] for entry in bundle.get('entry', []))
+            return resources
+        
+        chunks = [missing[i:i + READ_BATCH_SIZE] for i in range(0, len(missing), READ_BATCH_SIZE)]
+        if chunks:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), 8)) as executor:
+                for resources in executor.map(tracing.wrap(fetch), chunks):
+                    for resource in resources:
+                        found[resource['id']] = resource
+                        if self.cache:
+                            version = resource.get('meta', {}).get('versionId')
+                            self.cache.put(read_key(resource_type, resource['id']), resource_type, resource,
+                                           etag=f'W/"{version}"' if version else None, version=version)
+        return found
+    
+    def get_patient(self, patient_id: str):
+        """Patient record for one id, or None"""
+        resource = self.read('Patient', patient_id)
+        return patient_record(resource) if resource else None
+    
+    def next_page(self, bundle: dict):
+        """Fetch the Bundle behind a search result's `next` link, or None"""
+        next_url = next((link['url'] for link in bundle.get('link', []) if link.get('relation') == 'next'), None)
+        if next_url and next_url.startswith(NEXT_LINK_PREFIX):
+            return self.replica.next_page(next_url, self.max_staleness)
+        return self._get(next_url) if next_url else None
+    
+    def search_pages(self, resource_type: str, params: dict = None, max_pages: int = 10,
+                     use_replica: bool = True, use_cache: bool = True):
+        """Yield search result Bundles, following `next` links up to `max_pages`"""
+        bundle = self.search(resource_type, params, use_replica=use_replica, use_cache=use_cache)
+        pages = 1
+        while bundle is not None:
+            yield bundle
+            if pages >= max_pages:
+                return
+            bundle = self.next_page(bundle)
+            pages += 1
     
     def get_all_patients(self, count: int = 100):
         """Get all patients from HealthLake"""
         result = self.search('Patient', {'_count': str(count)})
-        patients = []
+        return [patient_record(entry['resource']) for entry in result.get('entry', [])]
+    
+    async def get_all_patients_async(self, count: int = 100):
+        """`get_all_patients` for coroutines"""
+        result = await self.search_async('Patient', {'_count': str(count)})
+        return [patient_record(entry['resource']) for entry in result.get('entry', [])]
+    
+    def get_patient_summary(self, patient_id: str, fields=None):
+        """Get comprehensive patient summary (or just the fields in the mask)"""
+        fields = parse_summary_fields(fields)
+        return self.flights.do(('summary', patient_id, fields), lambda: self._build_summaries([patient_id], fields)[patient_id])
+    
+    def iter_patient_summaries(self, patient_ids: list, fields=None, batch_size: int = SUMMARY_BATCH_SIZE):
+        """Yield summaries batch by batch, so callers can stream partial results"""
+        fields = parse_summary_fields(fields)
+        patient_ids = list(dict.fromkeys(patient_ids))
+        for i in range(0, len(patient_ids), batch_size):
+            batch = patient_ids[i:i + batch_size]
+            summaries = self._build_summaries(batch, fields)
+            for patient_id in batch:
+                yield summaries[patient_id]
+    
+    def _section_resources(self, field: str, patient_ids: list) -> dict:
+        """One multi-patient search for a summary section, grouped by subject -> [resources]"""
+        resource_type, extra_params, _, elements = SUMMARY_SECTIONS[field]
+        wanted = 1 if field == 'has_ecg' else SUMMARY_LIMIT
+        grouped = {patient_id: [] for patient_id in patient_ids}
         
-        if result.get('entry'):
-            for entry in result['entry']:
-                resource = entry['resource']
-                patient_id = resource['id']
-                name = 'Unknown'
-                
-                if 'name' in resource and resource['name']:
-                    name_obj = resource['name'][0]
-                    given = ' '.join(name_obj.get('given', []))
-                    family = name_obj.get('family', '')
-                    name = f"{given} {family}".strip()
-                
-                patients.append({
-                    'id': patient_id,
-                    'name': name,
-                    'gender': resource.get('gender', 'Unknown'),
-                    'birthDate': resource.get('birthDate', 'Unknown')
-                })
-        
-        return patients
-    
-    def get_patient_summary(self, patient_id: str):
-        """Get comprehensive patient summary"""
-        summary = {
-            'id': patient_id,
-            'name': 'Unknown',
-            'gender': 'Unknown',
-            'birthDate': 'Unknown',
-            'conditions': [],
-            'medications': [],
-            'allergies': [],
-            'has_ecg': False,
-            'mri_reports_count': 0
+        params = {
+            'patient': ','.join(patient_ids),
+            '_count': str(min(wanted * len(patient_ids), SECTION_PAGE_SIZE)),
+            '_elements': elements,
+            **extra_params
         }
+        for bundle in self.search_pages(resource_type, params, max_pages=SECTION_MAX_PAGES):
+            for entry in bundle.get('entry', []):
+                resource = entry['resource']
+                patient_id = subject_id(resource)
+                if patient_id in grouped and len(grouped[patient_id]) < wanted:
+                    grouped[patient_id].append(resource)
+            # A single busy patient can fill whole pages; stop once everyone is covered
+            if all(len(resources) >= wanted for resources in grouped.values()):
+                break
+        return grouped
+    
+    def _build_summaries(self, patient_ids: list, fields: tuple = SUMMARY_FIELDS) -> dict:
+        """Summaries for a batch, planning only the upstream requests the field mask needs:
+        one read_many for demographics plus one projected search per requested section.
+        With patient digests enabled this is one key lookup per batch instead.
+        """
+        if self.digests is not None:
+            digests = self.digests.get_or_build(patient_ids)
+            defaults = empty_summary('')
+            return {patient_id: digest_summary(digests[patient_id], fields) if patient_id in digests
+                    else {'id': patient_id, **{f: defaults[f] for f in fields}}
+                    for patient_id in patient_ids}
+        
+        defaults = empty_summary('')
+        summaries = {patient_id: {'id': patient_id, **{f: defaults[f] for f in fields}} for patient_id in patient_ids}
+        demographics = [f for f in fields if f in DEMOGRAPHIC_FIELDS]
+        section_fields = [f for f in fields if f in SUMMARY_SECTIONS]
+        
+        with ThreadPoolExecutor(max_workers=len(section_fields) + 1) as executor:
+            patients = executor.submit(tracing.wrap(self.read_many), 'Patient', patient_ids) if demographics else None
+            sections = {field: executor.submit(tracing.wrap(self._section_resources), field, patient_ids)
+                        for field in section_fields}
+            
+            for patient_id, resource in (patients.result() if patients else {}).items():
+                if patient_id in summaries:
+                    patient = patient_record(resource)
+                    summaries[patient_id].update({f: patient[f] for f in demographics})
+            
+            for field, future in sections.items():
+                for patient_id, resources in future.result().items():
+                    apply_section(summaries[patient_id], field, resources)
         
-        # Get patient demographics
-        patient_data = self.search('Patient', {'_id': patient_id})
-        if patient_data.get('entry'):
-            p = patient_data['entry'][0]['resource']
-            if 'name' in p and p['name']:
-                name_obj = p['name'][0]
-                given = ' '.join(name_obj.get('given', []))
-                family = name_obj.get('family', '')
-                summary['name'] = f"{given} {family}".strip()
-            summary['gender'] = p.get('gender', 'Unknown')
-            summary['birthDate'] = p.get('birthDate', 'Unknown')
-        
-        # Get conditions
-        conditions = self.search('Condition', {'patient': patient_id, '_count': '10'})
-        if conditions.get('entry'):
-            for entry in conditions['entry']:
-                c = entry['resource']
-                if 'code' in c and 'text' in c['code']:
-                    summary['conditions'].append(c['code']['text'])
-        
-        # Get medications
-        meds = self.search('MedicationRequest', {'patient': patient_id, '_count': '10'})
-        if meds.get('entry'):
-            for entry in meds['entry']:
-                m = entry['resource']
-                if 'medicationCodeableConcept' in m and 'text' in m['medicationCodeableConcept']:
-                    summary['medications'].append(m['medicationCodeableConcept']['text'])
-        
-        # Get allergies
-        allergies = self.search('AllergyIntolerance', {'patient': patient_id, '_count': '10'})
-        if allergies.get('entry'):
-            for entry in allergies['entry']:
-                a = entry['resource']
-                if 'code' in a and 'text' in a['code']:
-                    summary['allergies'].append(a['code']['text'])
-        
-        # Check for ECG
-        ecg_obs = self.search('Observation', {'patient': patient_id, 'code': '131328', '_count': '1'})
-        summary['has_ecg'] = bool(ecg_obs.get('entry'))
-        
-        # Get MRI reports count
-        reports = self.search('DiagnosticReport', {'patient': patient_id, '_count': '10'})
-        summary['mri_reports_count'] = len(reports.get('entry', []))
-        
-        return summary
+        return summaries
 
 healthlake_service = HealthLakeService()
+
+def _cache_metrics():
+    families = metrics.stats_families('fhir_cache', fhir_cache.stats() if fhir_cache else None,
+                                      ('hits', 'disk_hits', 'misses', 'revalidations', 'refreshes'),
+                                      ('entries', 'hit_rate'), 'FHIR response cache')
+    families += metrics.stats_families('fhir_single_flight', healthlake_service.flights.stats(),
+                                       ('leaders', 'shared'), ('in_flight',), 'Coalesced FHIR requests')
+    return families
+
+metrics.register_collector('fhir_cache', _cache_metrics)
@@ -0,0 +1,124 @@
+import io
+import json
+import math
+import threading
+from typing import Optional
+
+from PIL import Image
+from app.services.blob_layout import SIZE_PRESETS, render_thumbnail
+from app.services.blob_service import blob_store
+
+TILE_SIZE = 256
+LOCK_STRIPES = 64
+
+class ImageDerivativeService:
+    """Thumbnails and tile pyramids generated lazily and cached beside the source blob"""
+
+    def __init__(self, store=blob_store):
+        self.store = store
+        # Striped locks so concurrent first requests for a source render once
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        return self.locks[hash(key) % LOCK_STRIPES]
+
+    def _open(self, key: str) -> Image.Image:
+        image = Image.open(io.BytesIO(self.store.get(key)))
+        image.load()
+        return image
+
+    @staticmethod
+    def _encode(image: Image.Image) -> bytes:
+        buf = io.BytesIO()
+        image.save(buf, format='PNG', optimize=True)
+        return buf.getvalue()
+
+    def thumbnail(self, key: str, size: str) -> Optional[bytes]:
+        """PNG scaled so its longest edge fits a size preset"""
+        if size not in SIZE_PRESETS:
+            raise ValueError(f"Unknown size '{size}', expected one of {', '.join(SIZE_PRESETS)}")
+
+        cached = self.store.get_derivative(key, f"{size}.png")
+        if cached is not None:
+            return cached
+
+        with self._lock_for(key):
+            cached = self.store.get_derivative(key, f"{size}.png")
+            if cached is not None:
+                return cached
+
+            data = render_thumbnail(self.store.get(key), size)
+            self.store.put_derivative(key, f"{size}.png", data)
+            return data
+
+    def pyramid(self, key: str) -> dict:
+        """Describe the tile pyramid; level `max_level` is full resolution"""
+        cached = self.store.get_derivative(key, 'tiles.json')
+        if cached is not None:
+            return json.loads(cached)
+
+        width, height = self._open(key).size
+        max_level = max(0, math.ceil(math.log2(max(width, height) / TILE_SIZE)))
+        levels = []
+        for level in range(max_level + 1):
+            scale = 2 ** (level - max_level)
+            level_width = max(1, math.ceil(width * scale))
+            level_height = max(1, math.ceil(height * scale))
+            levels.append({
+                'level': level,
+                'width': level_width,
+                'height': level_height,
+                'columns': math.ceil(level_width / TILE_SIZE),
+                'rows': math.ceil(level_height / TILE_SIZE)
+            })
+
+        descriptor = {'width': width, 'height': height, 'tile_size': TILE_SIZE, 'levels': levels}
+        self.store.put_derivative(key, 'tiles.json', json.dumps(descriptor).encode('utf-8'))
+        return descriptor
+
+    def tile(self, key: str, level: int, x: int, y: int) -> Optional[bytes]:
+        """One PNG tile; the whole level is cut and cached on first access"""
+        variant = f"tile-{level}-{x}-{y}.png"
+        cached = self.store.get_derivative(key, variant)
+        if cached is not None:
+            return cached
+
+        descriptor = self.pyramid(key)
+        if not 0 <= level < len(descriptor['levels']):
+            return None
+        spec = descriptor['levels'][level]
+        if not (0 <= x < spec['columns'] and 0 <= y < spec['rows']):
+            return None
+
+        with self._lock_for(key):
+            cached = self.store.get_derivative(key, variant)
+            if cached is not None:
+                return cached
+
+            image = self._open(key)
+            if (spec['width'], spec['height']) != image.size:
+                image = image.resize((spec['width'], spec['height']), Image.LANCZOS)
+
+            result = None
+            for row in range(spec['rows']):
+                for col in range(spec['columns']):
+                    box = (
+                        col * TILE_SIZE,
+                        row * TILE_SIZE,
+                        min((col + 1) * TILE_SIZE, spec['width']),
+                        min((row + 1) * TILE_SIZE, spec['height'])
+                    )
+                    data = self._encode(image.crop(box))
+                    self.store.put_derivative(key, f"tile-{level}-{col}-{row}.png", data)
+                    if (col, row) == (x, y):
+                        result = data
+            return result
+
+    def generate_all(self, key: str):
+        """Eagerly build every preset and tile, e.g. right after ingest"""
+        for size in SIZE_PRESETS:
+            self.thumbnail(key, size)
+        for spec in self.pyramid(key)['levels']:
+            self.tile(key, spec['level'], 0, 0)
+
+image_derivative_service = ImageDerivativeService()
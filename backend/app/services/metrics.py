@@ -0,0 +1,261 @@
+import math
+import time
+import bisect
+import weakref
+import threading
+from typing import Callable, Iterable, Optional, Tuple
+
+# In-process metrics rendered in the Prometheus text format (GET /metrics).
+#
+# Counters and histograms are sharded per thread: the hot path only touches
+# the calling thread's own dict, so recording takes no lock. A scrape sums the
+# shards, folding those of finished threads into a retired total so per-call
+# executors do not accumulate shards. Gauges and cumulative counters owned by
+# other services (cache stats, queue depths) are read by collector callbacks
+# at scrape time.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+AGENT_LATENCY_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Sharded:
+    """Per-thread value dicts; only the owning thread writes to its shard"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.local = threading.local()
+        self.shards = []            # (weakref to thread, shard)
+        self.retired = {}
+        self.lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _shard(self) -> dict:
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+
+    def _snapshots(self) -> list:
+        """Copies of every shard; shards of dead threads are merged into `retired`"""
+        with self.lock:
+            live = []
+            for thread_ref, shard in self.shards:
+                thread = thread_ref()
+                if thread is None or not thread.is_alive():
+                    for key, value in shard.items():
+                        self.retired[key] = self._merge(self.retired.get(key), value)
+                else:
+                    live.append((thread_ref, shard))
+            self.shards = live
+            return [dict(self.retired)] + [shard.copy() for _, shard in live]
+
+    def _totals(self) -> dict:
+        totals = {}
+        for snapshot in self._snapshots():
+            for key, value in snapshot.items():
+                totals[key] = self._merge(totals.get(key), value)
+        return totals
+
+class Counter(_Sharded):
+    type = 'counter'
+
+    def inc(self, *labelvalues, amount: float = 1):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    @staticmethod
+    def _merge(total, value):
+        return (total or 0) + value
+
+    def samples(self):
+        for labelvalues, value in sorted(self._totals().items()):
+            yield self.name, _labels(self.labelnames, labelvalues), value
+
+class Histogram(_Sharded):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues):
+        shard = self._shard()
+        state = shard.get(labelvalues)
+        if state is None:
+            # [per-bucket counts (+Inf last), sum]
+            state = shard[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def time(self, *labelvalues) -> '_Timer':
+        return _Timer(self, labelvalues)
+
+    @staticmethod
+    def _merge(total, value):
+        if total is None:
+            return [list(value[0]), value[1]]
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1]]
+
+    def samples(self):
+        for labelvalues, (counts, total) in sorted(self._totals().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(self.labelnames, labelvalues, f'le="{_number(bound)}"'), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, labelvalues), total
+            yield f"{self.name}_count", _labels(self.labelnames, labelvalues), cumulative
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labelvalues: tuple):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def register(self, metric: _Sharded):
+        with self.lock:
+            self.metrics.append(metric)
+
+    def register_collector(self, name: str, fn: Callable[[], Iterable[Tuple[str, str, str, tuple, dict]]]):
+        """`fn()` yields (metric name, type, help, label names, {label values: value}) at scrape time"""
+        with self.lock:
+            self.collectors = [(n, f) for n, f in self.collectors if n != name] + [(name, fn)]
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            metrics, collectors = list(self.metrics), list(self.collectors)
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+
+        for collector_name, collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                lines.append(f"# collector {collector_name} failed: {_escape(e)}")
+                continue
+            for name, metric_type, documentation, labelnames, values in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labelvalues, value in values.items():
+                    if value is not None:
+                        lines.append(f"{name}{_labels(labelnames, labelvalues)} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# HTTP (recorded by MetricsMiddleware)
+http_requests = Counter('http_requests_total', 'HTTP requests by route template and status',
+                        ('method', 'route', 'status'))
+http_latency = Histogram('http_request_duration_seconds', 'HTTP request latency by route template',
+                         ('method', 'route'))
+
+# HealthLake FHIR client
+fhir_requests = Counter('healthlake_requests_total', 'Signed FHIR requests by resource type and status',
+                        ('resource_type', 'status'))
+fhir_latency = Histogram('healthlake_request_duration_seconds', 'FHIR request latency by resource type',
+                         ('resource_type',))
+fhir_bytes = Counter('healthlake_response_bytes_total', 'FHIR response body bytes by resource type',
+                     ('resource_type',))
+fhir_errors = Counter('healthlake_request_errors_total', 'FHIR requests that raised before a response',
+                      ('resource_type', 'error'))
+fhir_replica_hits = Counter('healthlake_replica_hits_total', 'Searches answered by the local replica',
+                            ('resource_type',))
+
+# Bedrock agents
+agent_invocations = Counter('bedrock_agent_invocations_total', 'Agent invocations by agent and outcome',
+                            ('agent', 'agent_id', 'status'))
+agent_latency = Histogram('bedrock_agent_duration_seconds', 'Agent invocation latency including streaming',
+                          ('agent', 'agent_id'), buckets=AGENT_LATENCY_BUCKETS)
+agent_bytes = Counter('bedrock_agent_response_bytes_total', 'Streamed completion bytes by agent',
+                      ('agent', 'agent_id'))
+agent_retries = Counter('bedrock_agent_retries_total', 'botocore retry attempts on agent invocations',
+                        ('agent', 'agent_id'))
+
+def render() -> str:
+    return REGISTRY.render()
+
+def register_collector(name: str, fn: Callable):
+    REGISTRY.register_collector(name, fn)
+
+def stats_families(prefix: str, stats: Optional[dict], counters: Iterable[str], gauges: Iterable[str],
+                   documentation: str) -> list:
+    """Families for a service's `stats()`/`status()` dict: cumulative counters and point-in-time gauges"""
+    if stats is None:
+        return []
+    families = [(f"{prefix}_{key}_total", 'counter', f"{documentation}: {key}", (), {(): stats.get(key)})
+                for key in counters]
+    families += [(f"{prefix}_{key}", 'gauge', f"{documentation}: {key}", (), {(): stats.get(key)})
+                 for key in gauges]
+    return families
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count and latency per route template.
+
+    Labels use the matched route's path template (`/api/patients/{patient_id}`),
+    not the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = {'status': 500, 'recorded': False}
+
+        def record():
+            # Once per request, when the body completes: background tasks run after that
+            if not state['recorded']:
+                state['recorded'] = True
+                route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+                method = scope.get('method', '')
+                http_latency.observe(time.perf_counter() - start, method, route)
+                http_requests.inc(method, route, str(state['status']))
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
@@ -0,0 +1,216 @@
+import sys
+import time
+import uuid
+import random
+import threading
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+from app.core.config import settings
+
+# Opt-in statistical profiling of requests. While any request is in flight a
+# sampler thread snapshots every thread's Python stack (`sys._current_frames`)
+# every PROFILING_INTERVAL_MS. Only stacks passing through backend code are
+# kept, which drops idle executor workers and the event loop's select().
+#
+# When a request finishes and was either sampled (PROFILING_SAMPLE_RATE) or
+# slower than PROFILING_SLOW_REQUEST_MS, the samples taken during it are folded
+# into collapsed stacks (`thread;frame;frame count`, flamegraph.pl /
+# speedscope input) and kept in a per-route ring buffer. Samples are wall-clock
+# and process-wide: concurrent requests share them, so each profile records
+# how many requests overlapped it.
+
+APP_ROOT = str(Path(__file__).resolve().parent.parent)
+MAX_BUFFERED_SAMPLES = 200_000
+MAX_STACK_DEPTH = 128
+
+class RequestProfiler:
+    def __init__(self, interval_ms: float, sample_rate: float, slow_request_ms: float, profiles_per_route: int):
+        self.interval = interval_ms / 1000
+        self.sample_rate = sample_rate
+        self.slow_request_ms = slow_request_ms
+        self.profiles_per_route = profiles_per_route
+        self.lock = threading.Lock()
+        self.active = {}                    # token -> (start, sampled)
+        self.samples = deque(maxlen=MAX_BUFFERED_SAMPLES)
+        self.profiles = {}                  # route -> deque of profiles, newest last
+        self.frame_names = {}               # code object -> frame label
+        self.counters = {'profiled': 0, 'slow': 0, 'sampled': 0, 'sampler_ticks': 0}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    # Sampling
+
+    def _frame_name(self, code) -> Optional[str]:
+        name = self.frame_names.get(code)
+        if name is None:
+            filename = code.co_filename
+            if filename.startswith(APP_ROOT):
+                module = filename[len(APP_ROOT) - len('app'):-len('.py')].replace('/', '.').replace('\\', '.')
+            else:
+                module = Path(filename).stem
+            name = self.frame_names[code] = f"{module}:{code.co_name}"
+        return name
+
+    def _collapse(self, frame, thread_name: str) -> Optional[str]:
+        names = []
+        in_app = False
+        while frame is not None and len(names) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            in_app = in_app or code.co_filename.startswith(APP_ROOT)
+            names.append(self._frame_name(code))
+            frame = frame.f_back
+        if not in_app:
+            return None
+        names.append(thread_name.replace(';', ':').replace(' ', '_'))
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            if not self.active:
+                if self.samples:
+                    with self.lock:
+                        self.samples.clear()
+                continue
+            now = time.perf_counter()
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    stack = self._collapse(frame, thread_names.get(thread_id, 'thread'))
+                    if stack:
+                        stacks.append(stack)
+            with self.lock:
+                self.samples.extend((now, stack) for stack in stacks)
+                # Drop samples older than every in-flight request
+                oldest = min((start for start, _ in self.active.values()), default=now)
+                while self.samples and self.samples[0][0] < oldest:
+                    self.samples.popleft()
+                self.counters['sampler_ticks'] += 1
+
+    # Requests
+
+    def begin(self) -> object:
+        token = object()
+        with self.lock:
+            self.active[token] = (time.perf_counter(), random.random() < self.sample_rate)
+        return token
+
+    def finish(self, token: object, method: str, route: str, status: int):
+        end = time.perf_counter()
+        with self.lock:
+            start, sampled = self.active.get(token, (end, False))
+            duration_ms = (end - start) * 1000
+            reason = 'slow' if duration_ms >= self.slow_request_ms else 'sampled' if sampled else None
+            buffered = list(self.samples) if reason else None
+            concurrent = len(self.active)
+            self.active.pop(token, None)
+        if reason is None:
+            return
+
+        stacks = Counter(stack for t, stack in buffered if start <= t <= end)
+
+        profile = {
+            'id': uuid.uuid4().hex,
+            'method': method,
+            'route': route,
+            'status': status,
+            'reason': reason,
+            'duration_ms': round(duration_ms, 1),
+            'started_at': (datetime.now(timezone.utc) - timedelta(milliseconds=duration_ms)).isoformat(),
+            'interval_ms': self.interval * 1000,
+            'samples': sum(stacks.values()),
+            'concurrent_requests': concurrent,
+            'collapsed': '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
+        }
+        with self.lock:
+            ring = self.profiles.setdefault(f"{method} {route}", deque(maxlen=self.profiles_per_route))
+            ring.append(profile)
+            self.counters['profiled'] += 1
+            self.counters[reason] += 1
+
+    # Admin
+
+    def list_profiles(self, route: Optional[str] = None) -> list:
+        with self.lock:
+            profiles = [p for key, ring in self.profiles.items() for p in ring
+                        if route is None or route in (key, key.split(' ', 1)[1])]
+        return sorted(({k: v for k, v in p.items() if k != 'collapsed'} for p in profiles),
+                      key=lambda p: p['started_at'], reverse=True)
+
+    def get_profile(self, profile_id: str) -> Optional[dict]:
+        with self.lock:
+            return next((p for ring in self.profiles.values() for p in ring if p['id'] == profile_id), None)
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                **self.counters,
+                'in_flight': len(self.active),
+                'buffered_samples': len(self.samples),
+                'routes': len(self.profiles),
+                'profiles': sum(len(ring) for ring in self.profiles.values()),
+                'interval_ms': self.interval * 1000,
+                'sample_rate': self.sample_rate,
+                'slow_request_ms': self.slow_request_ms
+            }
+
+class ProfilingMiddleware:
+    """ASGI middleware registering each HTTP request with the profiler.
+
+    The request ends when its response body completes (background tasks are
+    not attributed to it); the route template labels the profile.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        token = self.profiler.begin()
+        state = {'status': 500, 'finished': False}
+
+        def finish():
+            if not state['finished']:
+                state['finished'] = True
+                route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+                self.profiler.finish(token, scope.get('method', ''), route, state['status'])
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+
+profiler: Optional[RequestProfiler] = None
+if settings.PROFILING_ENABLED:
+    profiler = RequestProfiler(
+        interval_ms=settings.PROFILING_INTERVAL_MS,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        slow_request_ms=settings.PROFILING_SLOW_REQUEST_MS,
+        profiles_per_route=settings.PROFILING_PROFILES_PER_ROUTE
+    )
+    if not settings.PROFILING_ADMIN_TOKEN:
+        print("PROFILING_ENABLED without PROFILING_ADMIN_TOKEN: the /api/admin/profiles endpoints refuse every request")
@@ -0,0 +1,403 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+from app.core.config import settings
+
+# Read replica of the FHIR datastore in SQLite. Resources are stored as JSON
+# (queried with JSON1) next to a few extracted columns that carry the indexes
+# the app actually filters on: patient, code and clinical date.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    resource_type TEXT NOT NULL,
+    id TEXT NOT NULL,
+    version_id TEXT,
+    last_updated TEXT,
+    patient_id TEXT,
+    date TEXT,
+    resource TEXT NOT NULL,
+    PRIMARY KEY (resource_type, id)
+);
+CREATE INDEX IF NOT EXISTS idx_resources_patient ON resources (resource_type, patient_id, date);
+CREATE INDEX IF NOT EXISTS idx_resources_date ON resources (resource_type, date);
+CREATE INDEX IF NOT EXISTS idx_resources_updated ON resources (resource_type, last_updated);
+
+CREATE TABLE IF NOT EXISTS resource_codes (
+    resource_type TEXT NOT NULL,
+    id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    PRIMARY KEY (resource_type, id, code)
+);
+CREATE INDEX IF NOT EXISTS idx_codes_code ON resource_codes (resource_type, code);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource_type TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+REPLICATED_TYPES = [
+    'Patient', 'Condition', 'Observation', 'DiagnosticReport', 'Procedure',
+    'MedicationRequest', 'AllergyIntolerance', 'Encounter', 'ImagingStudy', 'Media'
+]
+
+# Element holding the clinical date, per resource type (first present wins)
+DATE_PATHS = {
+    'Patient': ['birthDate'],
+    'Condition': ['onsetDateTime', 'recordedDate'],
+    'Observation': ['effectiveDateTime', 'issued'],
+    'DiagnosticReport': ['effectiveDateTime', 'issued'],
+    'Procedure': ['performedDateTime', 'performedPeriod.start'],
+    'MedicationRequest': ['authoredOn'],
+    'AllergyIntolerance': ['recordedDate', 'onsetDateTime'],
+    'Encounter': ['period.start'],
+    'ImagingStudy': ['started'],
+    'Media': ['createdDateTime']
+}
+
+# Element holding the resource's codes, per resource type
+CODE_PATHS = {
+    'MedicationRequest': 'medicationCodeableConcept'
+}
+
+# Search parameters the replica can answer; anything else goes to HealthLake
+DATE_PARAMS = {'date', 'onset-date', 'authoredon', 'birthdate', 'started', 'created'}
+SUPPORTED_PARAMS = {'_id', 'patient', 'subject', 'code', '_count', '_sort', '_elements'} | DATE_PARAMS
+COMPARATORS = {'ge': '>=', 'le': '<=', 'gt': '>', 'lt': '<', 'eq': '='}
+# Against a partial-date bound's [start, end): ge/lt compare with start, gt/le with end
+PERIOD_COMPARATORS = {'ge': '>=', 'lt': '<', 'gt': '>=', 'le': '<'}
+
+# `next` links of replica Bundles point back at the replica, not HealthLake
+NEXT_LINK_PREFIX = 'replica:'
+
+SYNC_PAGE_SIZE = 100
+SYNC_MAX_PAGES = 1000
+
+def _path(resource: dict, path: str):
+    value = resource
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def _patient_id(resource: dict) -> Optional[str]:
+    if resource.get('resourceType') == 'Patient':
+        return resource.get('id')
+    for field in ('subject', 'patient'):
+        reference = resource.get(field, {}).get('reference', '')
+        if reference.startswith('Patient/'):
+            return reference.split('/', 1)[1]
+    return None
+
+def _clinical_date(resource: dict) -> Optional[str]:
+    for path in DATE_PATHS.get(resource.get('resourceType'), []):
+        value = _path(resource, path)
+        if value:
+            return value
+    return None
+
+def _date_range(value: str) -> tuple:
+    """FHIR date search value -> (start, end) strings comparable with stored dates.
+
+    A partial date (`2024`, `2024-01`, `2024-01-15`) covers the whole period:
+    `end` is the start of the next one, exclusive. A full dateTime has no extent
+    and `end` is None.
+    """
+    match = re.fullmatch(r'(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?', value)
+    if not match:
+        return value, None
+    year, month, day = match.groups()
+    if day:
+        return value, (date(int(year), int(month), int(day)) + timedelta(days=1)).isoformat()
+    if month:
+        return value, f"{int(year) + int(month) // 12:04d}-{int(month) % 12 + 1:02d}"
+    return value, f"{int(year) + 1:04d}"
+
+def _codes(resource: dict) -> set:
+    """Both `code` and `system|code` forms, matching FHIR token search"""
+    concept = resource.get(CODE_PATHS.get(resource.get('resourceType'), 'code'), {})
+    codes = set()
+    for coding in concept.get('coding', []) if isinstance(concept, dict) else []:
+        if coding.get('code'):
+            codes.add(coding['code'])
+            if coding.get('system'):
+                codes.add(f"{coding['system']}|{coding['code']}")
+    return codes
+
+class FHIRReplica:
+    """SQLite copy of the datastore, kept current with `_lastUpdated=gt` polls"""
+
+    def __init__(self, path: str, resource_types: Iterable[str] = REPLICATED_TYPES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.resource_types = list(resource_types)
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        self.sync_thread = None
+        self.stop_event = threading.Event()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run during a sync"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    # Writing
+
+    def upsert(self, resources: Iterable[dict]) -> int:
+        """Insert or replace resources, keeping the newest version; returns rows written"""
+        rows = []
+        codes = []
+        for resource in resources:
+            resource_type, resource_id = resource.get('resourceType'), resource.get('id')
+            if not resource_type or not resource_id:
+                continue
+            meta = resource.get('meta', {})
+            rows.append((
+                resource_type, resource_id, meta.get('versionId'), meta.get('lastUpdated'),
+                _patient_id(resource), _clinical_date(resource), json.dumps(resource)
+            ))
+            codes.extend((resource_type, resource_id, code) for code in _codes(resource))
+
+        if not rows:
+            return 0
+        with self.write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    """INSERT INTO resources (resource_type, id, version_id, last_updated, patient_id, date, resource)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (resource_type, id) DO UPDATE SET
+                           version_id = excluded.version_id, last_updated = excluded.last_updated,
+                           patient_id = excluded.patient_id, date = excluded.date, resource = excluded.resource
+                       WHERE resources.last_updated IS NULL OR excluded.last_updated >= resources.last_updated""",
+                    rows
+                )
+                conn.executemany("DELETE FROM resource_codes WHERE resource_type = ? AND id = ?",
+                                 [(row[0], row[1]) for row in rows])
+                conn.executemany("INSERT OR IGNORE INTO resource_codes VALUES (?, ?, ?)", codes)
+        return len(rows)
+
+    def delete(self, resource_type: str, resource_id: str):
+        with self.write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM resources WHERE resource_type = ? AND id = ?", (resource_type, resource_id))
+                conn.execute("DELETE FROM resource_codes WHERE resource_type = ? AND id = ?", (resource_type, resource_id))
+
+    def _mark_synced(self, resource_type: str, watermark: Optional[str]):
+        with self.write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    """INSERT INTO sync_state VALUES (?, ?, ?)
+                       ON CONFLICT (resource_type) DO UPDATE SET
+                           watermark = COALESCE(excluded.watermark, sync_state.watermark),
+                           synced_at = excluded.synced_at""",
+                    (resource_type, watermark, time.time())
+                )
+
+    def _max_last_updated(self, resource_type: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT MAX(last_updated) FROM resources WHERE resource_type = ?", (resource_type,)
+        ).fetchone()
+        return row[0]
+
+    # Bootstrap and delta sync
+
+    def bootstrap_ndjson(self, paths: Iterable[str], batch_size: int = 1000) -> dict:
+        """Load bulk export output (one resource per line); returns rows per file"""
+        loaded = {}
+        for path in paths:
+            count = 0
+            batch = []
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        batch.append(json.loads(line))
+                    if len(batch) >= batch_size:
+                        count += self.upsert(batch)
+                        batch = []
+            count += self.upsert(batch)
+            loaded[str(path)] = count
+
+        for resource_type in self.resource_types:
+            self._mark_synced(resource_type, self._max_last_updated(resource_type))
+        return loaded
+
+    def sync_type(self, resource_type: str, max_pages: int = SYNC_MAX_PAGES) -> int:
+        """Pull everything updated after the stored watermark (a full load when there is none)"""
+        from app.services.healthlake_service import healthlake_service
+
+        row = self._connection().execute(
+            "SELECT watermark FROM sync_state WHERE resource_type = ?", (resource_type,)
+        ).fetchone()
+        watermark = row[0] if row else None
+
+        params = {'_count': str(SYNC_PAGE_SIZE), '_sort': '_lastUpdated'}
+        if watermark:
+            params['_lastUpdated'] = f"gt{watermark}"
+
+        written = 0
+        for bundle in healthlake_service.search_pages(resource_type, params, max_pages=max_pages,
+                                                    use_replica=False, use_cache=False):
+            if bundle.get('resourceType') == 'OperationOutcome':
+                raise RuntimeError(f"Sync of {resource_type} failed: {json.dumps(bundle)[:200]}")
+            written += self.upsert(entry['resource'] for entry in bundle.get('entry', []))
+
+        self._mark_synced(resource_type, self._max_last_updated(resource_type))
+        return written
+
+    def sync(self) -> dict:
+        """One delta pass over every replicated type: rows written, or the exception for a type that failed"""
+        results = {}
+        for resource_type in self.resource_types:
+            try:
+                results[resource_type] = self.sync_type(resource_type)
+            except Exception as e:
+                # One failing type must not hold back the others; it is retried next pass
+                print(f"Replica sync of {resource_type} failed: {e}")
+                results[resource_type] = e
+        return results
+
+    def start_sync(self, interval_seconds: int):
+        """Poll for deltas in a daemon thread"""
+        if self.sync_thread and self.sync_thread.is_alive():
+            return
+
+        def loop():
+            while not self.stop_event.is_set():
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"Replica sync failed: {e}")
+                self.stop_event.wait(interval_seconds)
+
+        self.stop_event.clear()
+        self.sync_thread = threading.Thread(target=loop, name='fhir-replica-sync', daemon=True)
+        self.sync_thread.start()
+
+    def stop_sync(self):
+        self.stop_event.set()
+
+    # Reading
+
+    def staleness(self, resource_type: str) -> Optional[float]:
+        """Seconds since the type was last synced, or None if it never was"""
+        row = self._connection().execute(
+            "SELECT synced_at FROM sync_state WHERE resource_type = ?", (resource_type,)
+        ).fetchone()
+        return time.time() - row[0] if row else None
+
+    def status(self) -> dict:
+        conn = self._connection()
+        counts = dict(conn.execute("SELECT resource_type, COUNT(*) FROM resources GROUP BY resource_type"))
+        return {
+            resource_type: {
+                'count': counts.get(resource_type, 0),
+                'watermark': watermark,
+                'staleness_seconds': round(time.time() - synced_at, 1)
+            }
+            for resource_type, watermark, synced_at in conn.execute("SELECT * FROM sync_state")
+        }
+
+    def search(self, resource_type: str, params: Optional[dict], max_staleness: float) -> Optional[dict]:
+        """Answer a search locally as a searchset Bundle.
+
+        Returns None (so the caller goes to HealthLake) when the type is not
+        replicated, the replica is older than `max_staleness`, or the search
+        uses parameters the replica does not index.
+        """
+        if resource_type not in self.resource_types:
+            return None
+        staleness = self.staleness(resource_type)
+        if staleness is None or staleness > max_staleness:
+            return None
+
+        params = dict(params or {})
+        offset = int(params.pop('_offset', 0))
+        if any(key not in SUPPORTED_PARAMS for key in params):
+            return None
+
+        where = ["r.resource_type = ?"]
+        args = [resource_type]
+        for key, value in params.items():
+            values = value if isinstance(value, list) else [value]
+            if key == '_id':
+                ids = str(value).split(',')
+                where.append(f"r.id IN ({','.join('?' * len(ids))})")
+                args.extend(ids)
+            elif key in ('patient', 'subject'):
+                # `patient=a,b` (and `Patient/a`) is an OR over references
+                patient_ids = [ref.strip().split('/')[-1] for ref in str(value).split(',')]
+                where.append(f"r.patient_id IN ({','.join('?' * len(patient_ids))})")
+                args.extend(patient_ids)
+            elif key == 'code':
+                codes = str(value).split(',')
+                where.append(f"""EXISTS (SELECT 1 FROM resource_codes c WHERE c.resource_type = r.resource_type
+                                 AND c.id = r.id AND c.code IN ({','.join('?' * len(codes))}))""")
+                args.extend(codes)
+            elif key in DATE_PARAMS:
+                for item in values:
+                    prefix = item[:2] if item[:2] in COMPARATORS else 'eq'
+                    start, end = _date_range(item[2:] if item[:2] in COMPARATORS else item)
+                    if end is None:
+                        where.append("r.date LIKE ?" if prefix == 'eq' else f"r.date {COMPARATORS[prefix]} ?")
+                        args.append(f"{start}%" if prefix == 'eq' else start)
+                    elif prefix == 'eq':
+                        where.append("r.date >= ? AND r.date < ?")
+                        args.extend([start, end])
+                    else:
+                        # Bounds cover the whole period: `le2024-01-01` includes that day
+                        where.append(f"r.date {PERIOD_COMPARATORS[prefix]} ?")
+                        args.append(start if prefix in ('ge', 'lt') else end)
+
+        order = ""
+        sort = params.get('_sort')
+        if sort:
+            column = {'_lastUpdated': 'r.last_updated'}.get(sort.lstrip('-'))
+            if column is None and sort.lstrip('-') in DATE_PARAMS:
+                column = 'r.date'
+            if column is None:
+                return None
+            order = f" ORDER BY {column} {'DESC' if sort.startswith('-') else 'ASC'}, r.id"
+
+        limit = int(params.get('_count', 100))
+        rows = self._connection().execute(
+            f"SELECT r.resource FROM resources r WHERE {' AND '.join(where)}{order or ' ORDER BY r.id'} LIMIT ? OFFSET ?",
+            args + [limit + 1, offset]
+        ).fetchall()
+
+        resources = [json.loads(row[0]) for row in rows[:limit]]
+        if params.get('_elements'):
+            keep = set(params['_elements'].split(',')) | {'resourceType', 'id', 'meta'}
+            resources = [{k: v for k, v in resource.items() if k in keep} for resource in resources]
+
+        bundle = {
+            'resourceType': 'Bundle',
+            'type': 'searchset',
+            'entry': [{'resource': resource, 'search': {'mode': 'match'}} for resource in resources]
+        }
+        if len(rows) > limit:
+            next_params = {**params, '_offset': offset + limit}
+            bundle['link'] = [{'relation': 'next', 'url': f"{NEXT_LINK_PREFIX}{resource_type}:{json.dumps(next_params)}"}]
+        return bundle
+
+    def next_page(self, url: str, max_staleness: float) -> Optional[dict]:
+        resource_type, params = url[len(NEXT_LINK_PREFIX):].split(':', 1)
+        return self.search(resource_type, json.loads(params), max_staleness)
+
+replica = FHIRReplica(settings.REPLICA_PATH) if settings.REPLICA_ENABLED else None
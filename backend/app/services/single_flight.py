@@ -0,0 +1,76 @@
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Hashable
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesce identical in-flight calls: one caller runs, the rest share its outcome.
+
+    `do` is for threads (FastAPI sync routes, executor workers); `do_async` is
+    for coroutines and coalesces with both. Every waiter gets the leader's
+    result object or has the leader's exception raised, so results must be
+    treated as read-only.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.futures = {}
+        self.lock = threading.Lock()
+        self.counters = {'leaders': 0, 'shared': 0}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            self.counters['leaders' if leader else 'shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """`do` for coroutines: tasks on one loop share a future for the key, backed
+        by a single `do` in the default executor, so they also join threaded callers
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self.lock:
+            future = self.futures.get(flight_key)
+            if future is None:
+                future = self.futures[flight_key] = loop.run_in_executor(
+                    None, functools.partial(self.do, key, fn, *args, **kwargs))
+                future.add_done_callback(lambda _: self._forget(flight_key))
+            else:
+                # The executor call counts itself in `do`
+                self.counters['shared'] += 1
+        # Shielded so one waiter being cancelled does not cancel the shared call
+        return await asyncio.shield(future)
+
+    def _forget(self, flight_key):
+        with self.lock:
+            self.futures.pop(flight_key, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, 'in_flight': len(self.calls)}
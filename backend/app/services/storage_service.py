@@ -1,4 +1,5 @@
 import json
+import threading
 from datetime import datetime
 from typing import Optional
 
@@ -7,16 +8,19 @@ class StorageService:
     def __init__(self):
         self.reports = {}  # job_id -> report
         self.status = {}   # job_id -> status
+        # Handlers add reports while the change-feed poller marks them stale
+        self.lock = threading.Lock()
     
     def save_report(self, job_id: str, report: dict):
         """Save report to storage"""
-        self.reports[job_id] = report
-        self.status[job_id] = {
-            'job_id': job_id,
-            'status': 'completed',
-            'progress': 'Report generation complete',
-            'created_at': datetime.utcnow().isoformat()
-        }
+        with self.lock:
+            self.reports[job_id] = report
+            self.status[job_id] = {
+                'job_id': job_id,
+                'status': 'completed',
+                'progress': 'Report generation complete',
+                'created_at': datetime.utcnow().isoformat()
+            }
     
     def get_report(self, job_id: str) -> Optional[dict]:
         """Get report by job ID"""
@@ -40,8 +44,21 @@ class StorageService:
             if progress:
                 self.status[job_id]['progress'] = progress
     
+    def mark_stale(self, patient_ids) -> list:
+        """Flag completed reports of these patients as outdated; returns the newly flagged reports"""
+        patient_ids = set(patient_ids)
+        flagged = []
+        with self.lock:
+            for report in list(self.reports.values()):
+                if report.get('patient_id') in patient_ids and not report.get('stale'):
+                    report['stale'] = True
+                    report['stale_since'] = datetime.utcnow().isoformat()
+                    flagged.append(report)
+        return flagged
+    
     def get_patient_reports(self, patient_id: str) -> list:
         """Get all reports for a patient"""
-        return [r for r in self.reports.values() if r.get('patient_id') == patient_id]
+        with self.lock:
+            return [r for r in self.reports.values() if r.get('patient_id') == patient_id]
 
 storage_service = StorageService()
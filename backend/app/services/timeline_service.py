@@ -0,0 +1,151 @@
+import heapq
+import json
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Optional
+from app.services.healthlake_service import healthlake_service
+from app.services import tracing
+
+UNSORTED_PAGE_SIZE = 100
+
+def _coding_display(concept: dict) -> str:
+    if concept.get('text'):
+        return concept['text']
+    coding = concept.get('coding', [{}])
+    return coding[0].get('display', 'Unknown') if coding else 'Unknown'
+
+def _first_type(resource: dict) -> str:
+    types = resource.get('type', [])
+    return _coding_display(types[0]) if types else 'Encounter'
+
+# Per resource type: date search/sort parameter, how to read the event date,
+# and how to describe it. Conditions fall back to recordedDate, which the
+# onset-date parameter neither sorts nor filters, so they have no date_param:
+# a patient's Conditions are few and are fetched whole and ordered locally.
+TIMELINE_SOURCES = {
+    'Condition': {
+        'date_param': None,
+        'date': lambda r: r.get('onsetDateTime') or r.get('recordedDate'),
+        'title': lambda r: _coding_display(r.get('code', {})),
+        'status': lambda r: (r.get('clinicalStatus', {}).get('coding') or [{}])[0].get('code')
+    },
+    'Observation': {
+        'date_param': 'date',
+        'date': lambda r: r.get('effectiveDateTime') or r.get('issued'),
+        'title': lambda r: _coding_display(r.get('code', {})),
+        'status': lambda r: r.get('status')
+    },
+    'DiagnosticReport': {
+        'date_param': 'date',
+        'date': lambda r: r.get('effectiveDateTime') or r.get('issued'),
+        'title': lambda r: _coding_display(r.get('code', {})),
+        'status': lambda r: r.get('status')
+    },
+    'Procedure': {
+        'date_param': 'date',
+        'date': lambda r: r.get('performedDateTime') or r.get('performedPeriod', {}).get('start'),
+        'title': lambda r: _coding_display(r.get('code', {})),
+        'status': lambda r: r.get('status')
+    },
+    'MedicationRequest': {
+        'date_param': 'authoredon',
+        'date': lambda r: r.get('authoredOn'),
+        'title': lambda r: _coding_display(r.get('medicationCodeableConcept', {})),
+        'status': lambda r: r.get('status')
+    },
+    'Encounter': {
+        'date_param': 'date',
+        'date': lambda r: r.get('period', {}).get('start'),
+        'title': _first_type,
+        'status': lambda r: r.get('status')
+    }
+}
+
+def _normalize_date(value: str) -> str:
+    """Sortable UTC-ish key: date-only values become midnight"""
+    if not value:
+        return ''
+    value = value.replace('Z', '')
+    return value if 'T' in value else f"{value}T00:00:00"
+
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode('ascii'))))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+class TimelineService:
+    """Chronological (newest first) clinical events merged across resource types"""
+
+    def _stream(self, resource_type: str, first_page, before: Optional[tuple]):
+        """Lazily yield (sort_key, event) for one resource type, newest first.
+
+        The server orders pages by date only, so events sharing a date come in
+        any order and may straddle a page boundary. Each page is sorted by the
+        full key, and events at its oldest date are held back until the next
+        page shows whether more share that date.
+        """
+        source = TIMELINE_SOURCES[resource_type]
+        bundle = first_page.result()
+        held = []
+        while bundle is not None:
+            if bundle.get('resourceType') == 'OperationOutcome':
+                return
+            for entry in bundle.get('entry', []):
+                resource = entry['resource']
+                date = _normalize_date(source['date'](resource))
+                key = (date, resource_type, resource.get('id', ''))
+                if before is not None and key >= before:
+                    continue
+                held.append((key, {
+                    'date': source['date'](resource),
+                    'resourceType': resource_type,
+                    'id': resource.get('id'),
+                    'title': source['title'](resource),
+                    'status': source['status'](resource)
+                }))
+            held.sort(key=lambda item: item[0], reverse=True)
+
+            has_next = any(link.get('relation') == 'next' for link in bundle.get('link', []))
+            if has_next and source['date_param'] and held:
+                boundary = held[-1][0][0]
+                ready = [item for item in held if item[0][0] > boundary]
+                held = held[len(ready):]
+                yield from ready
+            # Later pages are fetched only if the merge actually reaches them
+            bundle = healthlake_service.next_page(bundle) if has_next else None
+        yield from held
+
+    def get_timeline(self, patient_id: str, limit: int = 50, cursor: Optional[str] = None,
+                     resource_types: Optional[list] = None) -> dict:
+        before = decode_cursor(cursor) if cursor else None
+        types = [t for t in (resource_types or TIMELINE_SOURCES) if t in TIMELINE_SOURCES]
+
+        with ThreadPoolExecutor(max_workers=len(types) or 1) as executor:
+            # Heads of every stream are requested concurrently
+            first_pages = {}
+            for resource_type in types:
+                date_param = TIMELINE_SOURCES[resource_type]['date_param']
+                params = {'patient': patient_id, '_count': str(limit if date_param else UNSORTED_PAGE_SIZE)}
+                if date_param:
+                    params['_sort'] = f"-{date_param}"
+                    if before is not None and before[0]:
+                        params[date_param] = f"le{before[0]}"
+                first_pages[resource_type] = executor.submit(tracing.wrap(healthlake_service.search), resource_type, params)
+
+            streams = [self._stream(t, first_pages[t], before) for t in types]
+            merged = heapq.merge(*streams, key=lambda item: item[0], reverse=True)
+            page = list(islice(merged, limit + 1))
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        return {
+            'events': [event for _, event in page],
+            'next_cursor': encode_cursor(page[-1][0]) if has_more else None
+        }
+
+timeline_service = TimelineService()
@@ -0,0 +1,255 @@
+import json
+import time
+import queue
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+from app.core.config import settings
+
+# Spans across request handling, FHIR calls and agent invocations, exported in
+# OTLP/JSON (`resourceSpans`) to a local NDJSON file and/or an OTLP/HTTP
+# collector (`.../v1/traces`, e.g. Jaeger or the OpenTelemetry Collector).
+#
+# The current span lives in a contextvar. Thread pools do not inherit it, so
+# work submitted to an executor goes through `wrap(fn)`, which carries the
+# submitting span over. Requests carrying a W3C `traceparent` header are
+# continued; the Step Functions / Lambda side reads the same format from its payload.
+
+SPAN_KINDS = {'internal': 1, 'server': 2, 'client': 3}
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL_SECONDS = 2.0
+MAX_QUEUED_SPANS = 10000
+
+_current = contextvars.ContextVar('current_span', default=None)
+
+def _hex_id(n_bytes: int) -> str:
+    return f"{random.getrandbits(n_bytes * 8):0{n_bytes * 2}x}"
+
+def parse_traceparent(value: Optional[str]) -> Optional[tuple]:
+    """`00-<trace id>-<parent span id>-<flags>` -> (trace_id, span_id, sampled)"""
+    parts = (value or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    if parts[1] == '0' * 32 or parts[2] == '0' * 16:
+        return None
+    return parts[1], parts[2], parts[3] == '01'
+
+def _attribute_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: str, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _hex_id(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': SPAN_KINDS.get(self.kind, 1),
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': k, 'value': _attribute_value(v)} for k, v in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+class _NoopSpan:
+    """Stands in when tracing is off or the trace is not sampled"""
+    trace_id = None
+    span_id = None
+
+    def set(self, key: str, value):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class SpanExporter:
+    """Batches finished spans on a daemon thread; drops (and counts) spans when the queue is full"""
+
+    def __init__(self, service_name: str, file_path: Optional[str] = None, otlp_endpoint: Optional[str] = None):
+        self.service_name = service_name
+        self.file_path = Path(file_path) if file_path else None
+        self.otlp_endpoint = otlp_endpoint
+        self.queue = queue.Queue(maxsize=MAX_QUEUED_SPANS)
+        self.counters = {'exported': 0, 'dropped': 0, 'export_errors': 0}
+        self.export_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._loop, name='span-exporter', daemon=True)
+        self.thread.start()
+
+    def submit(self, span: Span):
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.counters['dropped'] += 1
+
+    def _loop(self):
+        while True:
+            time.sleep(EXPORT_INTERVAL_SECONDS)
+            self.flush()
+
+    def flush(self):
+        """Export everything queued, in batches of EXPORT_BATCH_SIZE"""
+        with self.export_lock:
+            while True:
+                batch = []
+                while len(batch) < EXPORT_BATCH_SIZE:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                self.export(batch)
+
+    def payload(self, spans: list) -> dict:
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'healthlake-ai'}, 'spans': [s.to_otlp() for s in spans]}]
+        }]}
+
+    def export(self, spans: list):
+        body = json.dumps(self.payload(spans))
+        try:
+            if self.file_path:
+                self.file_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.file_path, 'a', encoding='utf-8') as f:
+                    f.write(body + '\n')
+            if self.otlp_endpoint:
+                import requests
+                requests.post(self.otlp_endpoint, data=body, headers={'Content-Type': 'application/json'}, timeout=5)
+            self.counters['exported'] += len(spans)
+        except Exception as e:
+            self.counters['export_errors'] += 1
+            print(f"Span export failed: {e}")
+
+class Tracer:
+    def __init__(self, exporter: SpanExporter, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def span(self, name: str, kind: str = 'internal', traceparent: Optional[str] = None, **attributes):
+        parent = _current.get()
+        remote = parse_traceparent(traceparent) if parent is None else None
+        if parent is NOOP_SPAN:
+            yield NOOP_SPAN
+            return
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        elif remote is not None and remote[2]:
+            span = Span(name, remote[0], remote[1], kind, attributes)
+        elif remote is None and random.random() < self.sample_rate:
+            span = Span(name, _hex_id(16), None, kind, attributes)
+        else:
+            # Unsampled trace: the no-op span keeps its children unsampled too
+            token = _current.set(NOOP_SPAN)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current.reset(token)
+            return
+
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            _current.reset(token)
+            # A server span may already have ended at response completion
+            span.end_ns = span.end_ns or time.time_ns()
+            self.exporter.submit(span)
+
+tracer: Optional[Tracer] = None
+if settings.TRACING_ENABLED:
+    tracer = Tracer(SpanExporter(settings.TRACING_SERVICE_NAME, settings.TRACING_EXPORT_PATH,
+                                 settings.TRACING_OTLP_ENDPOINT), settings.TRACING_SAMPLE_RATE)
+
+@contextmanager
+def span(name: str, kind: str = 'internal', traceparent: Optional[str] = None, **attributes):
+    """Child of the current span (or a new trace); yields a span with `.set(key, value)`"""
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    with tracer.span(name, kind, traceparent, **attributes) as current:
+        yield current
+
+def wrap(fn: Callable) -> Callable:
+    """Bind `fn` to the current span so it parents spans opened in executor threads"""
+    parent = _current.get()
+    if parent is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+def flush():
+    if tracer is not None:
+        tracer.exporter.flush()
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request, continuing an incoming `traceparent`.
+
+    The span ends when the response body completes; background tasks started by
+    the request still parent their spans to it. The trace id is returned in
+    `X-Trace-Id`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        incoming = headers.get(b'traceparent', b'').decode('latin-1') or None
+        method = scope.get('method', '')
+        with tracer.span(f"{method} {scope.get('path', '')}", kind='server', traceparent=incoming,
+                         **{'http.method': method, 'http.target': scope.get('path', '')}) as request_span:
+            async def send_wrapper(message):
+                if message['type'] == 'http.response.start':
+                    request_span.set('http.status_code', message['status'])
+                    if request_span.trace_id:
+                        message = {**message, 'headers': list(message.get('headers', [])) +
+                                   [(b'x-trace-id', request_span.trace_id.encode())]}
+                await send(message)
+                if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                    route = getattr(scope.get('route'), 'path', None)
+                    if route and isinstance(request_span, Span):
+                        request_span.name = f"{method} {route}"
+                        request_span.set('http.route', route)
+                        request_span.end_ns = time.time_ns()
+
+            await self.app(scope, receive, send_wrapper)
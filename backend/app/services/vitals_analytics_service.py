@@ -0,0 +1,152 @@
+import numpy as np
+from typing import List, Optional
+from app.services.vitals_service import vitals_service
+
+ROLLING_WINDOW = 7
+ANOMALY_Z = 3.0
+# A flat baseline has zero spread; floor it at 1% of the baseline mean (about one
+# unit of SpO2 or heart rate, 0.4 degC) so a jump off a constant run still scores
+MIN_STD_FRACTION = 0.01
+MIN_STD = 0.1
+MIN_SEGMENT = 3
+SECONDS_PER_WEEK = 7 * 86400
+
+# (measure, comparison, limit, label)
+THRESHOLDS = [
+    ('Heart Rate', '>', 100, 'tachycardia'),
+    ('Heart Rate', '<', 50, 'bradycardia'),
+    ('Oxygen Saturation', '<', 92, 'hypoxemia'),
+    ('Blood Pressure (Systolic)', '>=', 140, 'systolic hypertension'),
+    ('Blood Pressure (Diastolic)', '>=', 90, 'diastolic hypertension'),
+    ('Body Temperature', '>=', 38, 'fever'),
+    ('Respiratory Rate', '>', 20, 'tachypnea')
+]
+
+CARDIAC_MEASURES = ['Heart Rate', 'Blood Pressure (Systolic)', 'Blood Pressure (Diastolic)',
+                    'Oxygen Saturation', 'Respiratory Rate']
+METABOLIC_MEASURES = ['Body Temperature', 'Heart Rate', 'Blood Pressure (Systolic)',
+                      'Blood Pressure (Diastolic)']
+
+def rolling_zscores(values: np.ndarray, window: int = ROLLING_WINDOW) -> np.ndarray:
+    """z-score of each point against the `window` points before it (NaN until warmed up)"""
+    z = np.full(len(values), np.nan)
+    if len(values) <= window:
+        return z
+    trailing = np.lib.stride_tricks.sliding_window_view(values[:-1], window)
+    mean = trailing.mean(axis=1)
+    std = np.maximum(trailing.std(axis=1), np.maximum(np.abs(mean) * MIN_STD_FRACTION, MIN_STD))
+    z[window:] = (values[window:] - mean) / std
+    return z
+
+def least_squares_slope(times: np.ndarray, values: np.ndarray) -> Optional[float]:
+    """Slope in units per week"""
+    if len(values) < 2:
+        return None
+    x = (times - times[0]).astype(np.float64) / SECONDS_PER_WEEK
+    x_centered = x - x.mean()
+    denom = (x_centered ** 2).sum()
+    if denom == 0:
+        return None
+    return float((x_centered * (values - values.mean())).sum() / denom)
+
+def change_point(values: np.ndarray, min_segment: int = MIN_SEGMENT) -> Optional[dict]:
+    """Best single mean-shift split (minimum total SSE), computed from cumulative sums"""
+    n = len(values)
+    if n < 2 * min_segment:
+        return None
+
+    csum = np.cumsum(values)
+    csum_sq = np.cumsum(values ** 2)
+    k = np.arange(min_segment, n - min_segment + 1)
+
+    left_sum, left_sq = csum[k - 1], csum_sq[k - 1]
+    right_sum, right_sq = csum[-1] - left_sum, csum_sq[-1] - left_sq
+    sse = (left_sq - left_sum ** 2 / k) + (right_sq - right_sum ** 2 / (n - k))
+
+    best = int(np.argmin(sse))
+    split = int(k[best])
+    before, after = left_sum[best] / split, right_sum[best] / (n - split)
+    pooled_std = np.sqrt(sse[best] / max(n - 2, 1))
+
+    # Only report shifts that stand out from within-segment noise (a flat series has none)
+    if np.isclose(after, before) or abs(after - before) < 2 * pooled_std:
+        return None
+    return {'index': split, 'before': round(float(before), 1), 'after': round(float(after), 1)}
+
+def _date(value: np.datetime64) -> str:
+    return str(np.datetime_as_string(value, unit='D'))
+
+class VitalsAnalyticsService:
+    def analyze_series(self, name: str, times: np.ndarray, values: np.ndarray, unit: str) -> dict:
+        z = rolling_zscores(values)
+        anomalies = np.flatnonzero(np.abs(np.nan_to_num(z)) > ANOMALY_Z)
+
+        breaches = []
+        for measure, op, limit, label in THRESHOLDS:
+            if measure != name:
+                continue
+            hits = {'>': values > limit, '<': values < limit, '>=': values >= limit}[op]
+            count = int(hits.sum())
+            if count:
+                breaches.append({
+                    'label': label,
+                    'rule': f"{op} {limit}",
+                    'count': count,
+                    'last': _date(times[np.flatnonzero(hits)[-1]])
+                })
+
+        shift = change_point(values)
+        if shift:
+            shift['date'] = _date(times[shift.pop('index')])
+
+        slope = least_squares_slope(times, values)
+        return {
+            'unit': unit,
+            'n': int(len(values)),
+            'latest': round(float(values[-1]), 1),
+            'latest_date': _date(times[-1]),
+            'mean': round(float(values.mean()), 1),
+            'min': round(float(values.min()), 1),
+            'max': round(float(values.max()), 1),
+            'slope_per_week': round(slope, 2) if slope is not None else None,
+            'anomaly_count': int(len(anomalies)),
+            'anomalies': [{'date': _date(times[i]), 'value': round(float(values[i]), 1), 'z': round(float(z[i]), 1)}
+                          for i in anomalies[-3:]],
+            'breaches': breaches,
+            'change_point': shift
+        }
+
+    def digest(self, patient_id: str) -> dict:
+        """Numeric signals for every vital series of a patient"""
+        series = vitals_service.get_series(patient_id)
+        return {
+            name: self.analyze_series(name, data['time'], data['value'], data['unit'])
+            for name, data in series.items()
+            if len(data['value'])
+        }
+
+    def format_digest(self, digest: dict, measures: List[str]) -> str:
+        """Compact text block for specialist prompts (a few lines per measure)"""
+        lines = []
+        for name in measures:
+            d = digest.get(name)
+            if not d:
+                continue
+            unit = f" {d['unit']}" if d['unit'] else ''
+            parts = [
+                f"latest {d['latest']:g}{unit} ({d['latest_date']})",
+                f"mean {d['mean']:g}, range {d['min']:g}-{d['max']:g} over {d['n']} readings"
+            ]
+            if d['slope_per_week'] is not None:
+                parts.append(f"trend {d['slope_per_week']:+g}/week")
+            for b in d['breaches']:
+                parts.append(f"{b['count']} readings {b['rule']} ({b['label']}, last {b['last']})")
+            if d['anomalies']:
+                parts.append(f"{d['anomaly_count']} outlier(s), latest {d['anomalies'][-1]['value']:g} on {d['anomalies'][-1]['date']}")
+            if d['change_point']:
+                cp = d['change_point']
+                parts.append(f"level shift {cp['before']:.0f} -> {cp['after']:.0f} around {cp['date']}")
+            lines.append(f"- {name}: " + "; ".join(parts))
+        return "\n".join(lines) if lines else "- No vital signs on record"
+
+vitals_analytics_service = VitalsAnalyticsService()
@@ -0,0 +1,322 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from app.services.healthlake_service import healthlake_service
+from app.services import tracing
+
+VITAL_CODES = {
+    '85354-9': 'Blood Pressure',
+    '8867-4': 'Heart Rate',
+    '8310-5': 'Body Temperature',
+    '9279-1': 'Respiratory Rate',
+    '2708-6': 'Oxygen Saturation'
+}
+POINTS_PER_CODE = 20
+PAGE_SIZE = 100
+MAX_PAGES = 5
+HISTORY_MAX_PAGES = 50
+CACHE_RECHECK_SECONDS = 30
+MAX_CACHED_PATIENTS = 256
+
+AGGREGATES = ('min', 'max', 'mean', 'sum', 'count', 'first', 'last')
+BUCKET_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+EPOCH = np.datetime64(0, 's')
+
+def _vital_code(resource: dict) -> Optional[str]:
+    for coding in resource.get('code', {}).get('coding', []):
+        if coding.get('code') in VITAL_CODES:
+            return coding['code']
+    return None
+
+def _next_link(bundle: dict) -> Optional[str]:
+    return next((link['url'] for link in bundle.get('link', []) if link.get('relation') == 'next'), None)
+
+def parse_vital_point(resource: dict, name: str) -> Optional[dict]:
+    """Turn one vital-sign Observation into a chart data point"""
+    date = resource.get('effectiveDateTime', resource.get('issued', ''))
+
+    if 'valueQuantity' in resource:
+        val = resource['valueQuantity']
+        return {
+            'date': date,
+            'value': val.get('value'),
+            'unit': val.get('unit', '')
+        }
+
+    if 'component' in resource and name == 'Blood Pressure':
+        bp_data = {'date': date}
+        for comp in resource['component']:
+            comp_name = comp.get('code', {}).get('text', '')
+            if 'valueQuantity' in comp:
+                if 'Systolic' in comp_name:
+                    bp_data['systolic'] = comp['valueQuantity'].get('value')
+                elif 'Diastolic' in comp_name:
+                    bp_data['diastolic'] = comp['valueQuantity'].get('value')
+                bp_data['unit'] = comp['valueQuantity'].get('unit', 'mm[Hg]')
+        if 'systolic' in bp_data or 'diastolic' in bp_data:
+            return bp_data
+
+    return None
+
+def parse_bucket(bucket: str) -> np.timedelta64:
+    """'15m', '6h', '1d', '1w' -> timedelta64 in seconds"""
+    match = re.fullmatch(r'(\d+)([mhdw])', bucket or '')
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid bucket '{bucket}', expected e.g. 15m, 6h, 1d, 1w")
+    return np.timedelta64(int(match.group(1)) * BUCKET_UNITS[match.group(2)], 's')
+
+def to_datetime64(value: str, end_of_period: bool = False) -> np.datetime64:
+    """FHIR date/dateTime (with or without offset) -> UTC datetime64[s].
+
+    Partial dates (`2024`, `2024-01`, `2024-01-15`) map to the start of that
+    period, or to its last second with `end_of_period` (inclusive upper bounds).
+    """
+    partial = re.fullmatch(r'(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?', value)
+    if partial:
+        year, month, day = partial.groups()
+        start = datetime(int(year), int(month or 1), int(day or 1))
+        if not end_of_period:
+            return np.datetime64(start, 's')
+        if day:
+            following = start + timedelta(days=1)
+        elif month:
+            following = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+        else:
+            following = datetime(start.year + 1, 1, 1)
+        return np.datetime64(following - timedelta(seconds=1), 's')
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(parsed, 's')
+
+def aggregate_series(times: np.ndarray, values: np.ndarray, bucket: np.timedelta64, aggs: List[str],
+                     start: Optional[np.datetime64] = None, end: Optional[np.datetime64] = None) -> dict:
+    """Bucket a time-sorted series and reduce each bucket with numpy ufunc.reduceat"""
+    mask = np.ones(len(times), dtype=bool)
+    if start is not None:
+        mask &= times >= start
+    if end is not None:
+        mask &= times <= end
+    t, v = times[mask], values[mask]
+
+    result = {'start': []}
+    result.update({agg: [] for agg in aggs})
+    if not len(t):
+        return result
+
+    # Buckets align to the epoch so neighbouring windows line up across requests
+    first = start if start is not None else t[0]
+    origin = first - (first - EPOCH) % bucket
+    idx = ((t - origin) // bucket).astype(np.int64)
+
+    boundaries = np.flatnonzero(np.diff(idx)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.append(boundaries, len(idx))
+    counts = ends - starts
+
+    result['start'] = [f"{s}Z" for s in np.datetime_as_string(origin + idx[starts] * bucket, unit='s')]
+    for agg in aggs:
+        if agg == 'min':
+            column = np.minimum.reduceat(v, starts)
+        elif agg == 'max':
+            column = np.maximum.reduceat(v, starts)
+        elif agg == 'sum':
+            column = np.add.reduceat(v, starts)
+        elif agg == 'mean':
+            column = np.add.reduceat(v, starts) / counts
+        elif agg == 'count':
+            column = counts
+        elif agg == 'first':
+            column = v[starts]
+        else:
+            column = v[ends - 1]
+        result[agg] = np.round(column, 2).tolist()
+    return result
+
+class VitalsService:
+    def __init__(self):
+        # patient_id -> {'series', 'marker', 'checked_at'}, least recently used first
+        self.series_cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _fetch_code(self, patient_id: str, code: str, limit: int) -> list:
+        """Per-code search used when the combined search is capped or rejected"""
+        obs = healthlake_service.search('Observation', {
+            'patient': patient_id,
+            'code': code,
+            '_count': str(limit),
+            '_sort': '-date'
+        })
+        points = []
+        for entry in obs.get('entry', []):
+            point = parse_vital_point(entry['resource'], VITAL_CODES[code])
+            if point:
+                points.append(point)
+        return points
+
+    def get_vital_signs(self, patient_id: str, per_code: int = POINTS_PER_CODE) -> dict:
+        """Latest vitals grouped by name, fetched with one multi-code search.
+
+        Pages of the combined search are grouped by code in a single pass. If
+        the page budget runs out before every code is filled (one busy code can
+        crowd out the rest), the short codes are re-fetched concurrently.
+        """
+        points = {code: [] for code in VITAL_CODES}
+        combined_failed = False
+        truncated = False
+
+        pages = healthlake_service.search_pages('Observation', {
+            'patient': patient_id,
+            'code': ','.join(VITAL_CODES),
+            '_count': str(PAGE_SIZE),
+            '_sort': '-date'
+        }, max_pages=MAX_PAGES)
+
+        for bundle in pages:
+            if bundle.get('resourceType') == 'OperationOutcome':
+                combined_failed = True
+                break
+
+            for entry in bundle.get('entry', []):
+                resource = entry['resource']
+                code = _vital_code(resource)
+                if code and len(points[code]) < per_code:
+                    point = parse_vital_point(resource, VITAL_CODES[code])
+                    if point:
+                        points[code].append(point)
+
+            if all(len(p) >= per_code for p in points.values()):
+                break
+            truncated = _next_link(bundle) is not None
+
+        if combined_failed:
+            missing = list(VITAL_CODES)
+        elif truncated:
+            missing = [code for code, p in points.items() if len(p) < per_code]
+        else:
+            missing = []
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                for code, fetched in zip(missing, executor.map(tracing.wrap(lambda c: self._fetch_code(patient_id, c, per_code)), missing)):
+                    points[code] = fetched
+
+        return {VITAL_CODES[code]: p for code, p in points.items() if p}
+
+    def _latest_marker(self, patient_id: str):
+        """Id and lastUpdated of the patient's most recently written vital"""
+        latest = healthlake_service.search('Observation', {
+            'patient': patient_id,
+            'code': ','.join(VITAL_CODES),
+            '_sort': '-_lastUpdated',
+            '_count': '1',
+            '_elements': 'id,meta'
+        }, use_cache=False)
+        if not latest.get('entry'):
+            return None
+        resource = latest['entry'][0]['resource']
+        return resource.get('id'), resource.get('meta', {}).get('lastUpdated')
+
+    def _load_series(self, patient_id: str) -> dict:
+        """Full vitals history as time-sorted numpy arrays, one series per measure"""
+        times = {}
+        values = {}
+        units = {}
+
+        def add(name, when, value, unit):
+            if value is None or not when:
+                return
+            try:
+                when = to_datetime64(when)
+            except ValueError:
+                # Not a FHIR date/dateTime; the point cannot be placed on the axis
+                return
+            times.setdefault(name, []).append(when)
+            values.setdefault(name, []).append(value)
+            units.setdefault(name, unit)
+
+        pages = healthlake_service.search_pages('Observation', {
+            'patient': patient_id,
+            'code': ','.join(VITAL_CODES),
+            '_count': str(PAGE_SIZE)
+        }, max_pages=HISTORY_MAX_PAGES)
+
+        for bundle in pages:
+            for entry in bundle.get('entry', []):
+                resource = entry['resource']
+                code = _vital_code(resource)
+                point = parse_vital_point(resource, VITAL_CODES[code]) if code else None
+                if not point:
+                    continue
+                name = VITAL_CODES[code]
+                if name == 'Blood Pressure':
+                    add(f"{name} (Systolic)", point['date'], point.get('systolic'), point.get('unit'))
+                    add(f"{name} (Diastolic)", point['date'], point.get('diastolic'), point.get('unit'))
+                else:
+                    add(name, point['date'], point.get('value'), point.get('unit'))
+
+        series = {}
+        for name in times:
+            t = np.array(times[name], dtype='datetime64[s]')
+            v = np.array(values[name], dtype=np.float64)
+            order = np.argsort(t, kind='stable')
+            series[name] = {'time': t[order], 'value': v[order], 'unit': units[name]}
+        return series
+
+    def get_series(self, patient_id: str) -> dict:
+        """Cached vitals arrays, refreshed when a newer Observation appears"""
+        now = time.monotonic()
+        with self.lock:
+            cached = self.series_cache.get(patient_id)
+            if cached:
+                self.series_cache.move_to_end(patient_id)
+        if cached and now - cached['checked_at'] < CACHE_RECHECK_SECONDS:
+            return cached['series']
+
+        marker = self._latest_marker(patient_id)
+        if cached and cached['marker'] == marker:
+            cached['checked_at'] = now
+            return cached['series']
+
+        series = self._load_series(patient_id)
+        with self.lock:
+            self.series_cache[patient_id] = {'series': series, 'marker': marker, 'checked_at': now}
+            self.series_cache.move_to_end(patient_id)
+            while len(self.series_cache) > MAX_CACHED_PATIENTS:
+                self.series_cache.popitem(last=False)
+        return series
+
+    def invalidate(self, patient_id: str = None):
+        """Drop cached series for one patient (or all)"""
+        with self.lock:
+            if patient_id is None:
+                self.series_cache.clear()
+            else:
+                self.series_cache.pop(patient_id, None)
+
+    def aggregate_vitals(self, patient_id: str, bucket: str, aggs: List[str],
+                         date_from: Optional[str] = None, date_to: Optional[str] = None) -> dict:
+        """Bucketed min/max/mean/... per vital over an optional date range"""
+        unknown = [agg for agg in aggs if agg not in AGGREGATES]
+        if unknown:
+            raise ValueError(f"Unknown aggregate(s): {', '.join(unknown)}")
+        step = parse_bucket(bucket)
+        start = to_datetime64(date_from) if date_from else None
+        end = to_datetime64(date_to, end_of_period=True) if date_to else None
+
+        series = self.get_series(patient_id)
+        return {
+            'bucket': bucket,
+            'series': {
+                name: {'unit': data['unit'], **aggregate_series(data['time'], data['value'], step, aggs, start, end)}
+                for name, data in series.items()
+            }
+        }
+
+vitals_service = VitalsService()
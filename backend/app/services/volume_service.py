@@ -0,0 +1,103 @@
+import io
+import re
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+from app.core.config import settings
+
+VOLUME_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+AXES = ('axial', 'coronal', 'sagittal')
+MAX_OPEN_VOLUMES = 32
+
+# Volume format: `<id>.json` header plus `<id>.raw`, a little-endian C-order
+# (slices, rows, columns) array. Optional `<id>.coronal.raw` / `<id>.sagittal.raw`
+# hold the same voxels re-laid so those slices are contiguous reads too.
+# Volumes are written by add_mri_volume.py.
+
+def apply_window(pixels: np.ndarray, center: float, width: float) -> np.ndarray:
+    """Map raw intensities to 8-bit display values with window/level"""
+    width = max(float(width), 1.0)
+    low = center - width / 2
+    scaled = (pixels.astype(np.float32) - low) * (255.0 / width)
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+class VolumeService:
+    """Memory-mapped MRI volumes; a slice read touches only that slice's pages"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.open_volumes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def header(self, volume_id: str) -> Optional[dict]:
+        if not VOLUME_ID_PATTERN.match(volume_id):
+            return None
+        path = self.root / f"{volume_id}.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def _memmap(self, volume_id: str, header: dict, axis: str) -> np.memmap:
+        """Open (or reuse) the array whose leading dimension is `axis` slices"""
+        cache_key = (volume_id, axis)
+        with self.lock:
+            if cache_key in self.open_volumes:
+                self.open_volumes.move_to_end(cache_key)
+                return self.open_volumes[cache_key]
+
+        slices, rows, columns = header['shape']
+        if axis == 'axial':
+            path, shape = self.root / f"{volume_id}.raw", (slices, rows, columns)
+        elif axis == 'coronal':
+            path, shape = self.root / f"{volume_id}.coronal.raw", (rows, slices, columns)
+        else:
+            path, shape = self.root / f"{volume_id}.sagittal.raw", (columns, slices, rows)
+
+        array = np.memmap(path, dtype=np.dtype(header['dtype']), mode='r', shape=shape)
+        with self.lock:
+            self.open_volumes[cache_key] = array
+            while len(self.open_volumes) > MAX_OPEN_VOLUMES:
+                self.open_volumes.popitem(last=False)
+        return array
+
+    def get_slice(self, volume_id: str, axis: str, index: int) -> Optional[np.ndarray]:
+        """Raw 2D slice along `axis`, or None if out of range"""
+        header = self.header(volume_id)
+        if header is None or axis not in AXES:
+            return None
+
+        slices, rows, columns = header['shape']
+        limit = {'axial': slices, 'coronal': rows, 'sagittal': columns}[axis]
+        if not 0 <= index < limit:
+            return None
+
+        if axis in header.get('orientations', ['axial']):
+            return np.array(self._memmap(volume_id, header, axis)[index])
+
+        # No reoriented copy: fall back to a strided read of the axial stack
+        axial = self._memmap(volume_id, header, 'axial')
+        if axis == 'coronal':
+            return np.array(axial[:, index, :])
+        return np.array(axial[:, :, index])
+
+    def render_slice(self, volume_id: str, axis: str, index: int,
+                     center: Optional[float] = None, width: Optional[float] = None) -> Optional[bytes]:
+        """PNG of one slice with window/level applied server-side"""
+        pixels = self.get_slice(volume_id, axis, index)
+        if pixels is None:
+            return None
+
+        window = self.header(volume_id).get('window', {})
+        center = window.get('center', 0) if center is None else center
+        width = window.get('width', 1) if width is None else width
+
+        buf = io.BytesIO()
+        Image.fromarray(apply_window(pixels, center, width), mode='L').save(buf, format='PNG')
+        return buf.getvalue()
+
+volume_service = VolumeService(settings.VOLUME_STORE_PATH)
@@ -0,0 +1,33 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+from app.core.config import settings
+from app.services.cohort_service import CohortService
+
+# Build the columnar cohort store (backend/app/services/cohort_service.py) from a
+# local export, e.g. the output of cohort_generator.py or a HealthLake bulk export:
+#   python build_cohort_store.py --ndjson ../cohort/*/*.ndjson
+
+parser = argparse.ArgumentParser(description="Build the Parquet cohort analytics store")
+parser.add_argument('--ndjson', nargs='+', required=True, help="NDJSON files (Observation, Condition, MedicationRequest)")
+parser.add_argument('--path', default=settings.COHORT_STORE_PATH, help="Store directory")
+args = parser.parse_args()
+
+service = CohortService(args.path)
+print(f"Cohort store: {args.path}\n")
+
+start = time.time()
+try:
+    counts = service.build_from_ndjson(args.ndjson)
+except Exception as e:
+    print(f"  [ERROR] {e}")
+    sys.exit(1)
+
+for table, status in service.status().items():
+    print(f"  [OK] {table}: {counts[table]} rows in {status['files']} files")
+print(f"\nDone in {time.time() - start:.1f}s")
@@ -0,0 +1,49 @@
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+from app.core.config import settings
+from app.services.digest_service import DigestStore
+
+# Build materialized patient digests (backend/app/services/digest_service.py).
+#   python build_digests.py --ndjson export/*.ndjson   fold a bulk export / cohort into digests
+#   python build_digests.py --patients id1 id2         backfill from HealthLake
+
+parser = argparse.ArgumentParser(description="Build materialized patient digests")
+parser.add_argument('--ndjson', nargs='*', help="NDJSON files (every resource type of the patients)")
+parser.add_argument('--patients', nargs='*', help="Patient ids to (re)build from HealthLake")
+parser.add_argument('--path', default=settings.DIGEST_PATH, help="SQLite database path")
+parser.add_argument('--batch-size', type=int, default=5000)
+args = parser.parse_args()
+
+store = DigestStore(args.path)
+print(f"Digests: {args.path}\n")
+
+start = time.time()
+try:
+    for path in args.ndjson or []:
+        written = 0
+        batch = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= args.batch_size:
+                    written += store.apply(batch)
+                    batch = []
+        written += store.apply(batch)
+        print(f"  [OK] {path}: {written} digest updates")
+
+    if args.patients:
+        built = store.build(args.patients)
+        print(f"  [OK] Built {len(built)} digests from HealthLake")
+except Exception as e:
+    print(f"  [ERROR] {e}")
+    sys.exit(1)
+
+print(f"\nDone in {time.time() - start:.1f}s: {store.stats()['digests']} digests")
@@ -0,0 +1,91 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+from app.core.config import settings
+
+# Waterfall of exported spans (TRACING_EXPORT_PATH, OTLP/JSON lines). Lambda
+# spans can be appended from CloudWatch: lines starting with `TRACE_SPAN ` are accepted.
+#   python show_trace.py                   slowest traces
+#   python show_trace.py <trace id>        waterfall of one trace
+
+BAR_WIDTH = 40
+
+def load_spans(paths: list) -> list:
+    spans = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('TRACE_SPAN '):
+                    line = line[len('TRACE_SPAN '):]
+                if not line.startswith('{'):
+                    continue
+                for resource_spans in json.loads(line).get('resourceSpans', []):
+                    service = next((a['value'].get('stringValue') for a in resource_spans['resource']['attributes']
+                                    if a['key'] == 'service.name'), '')
+                    for scope_spans in resource_spans.get('scopeSpans', []):
+                        for span in scope_spans.get('spans', []):
+                            span['service'] = service
+                            span['start'] = int(span['startTimeUnixNano'])
+                            span['end'] = int(span['endTimeUnixNano'])
+                            spans.append(span)
+    return spans
+
+def label(span: dict) -> str:
+    attributes = {a['key']: next(iter(a['value'].values())) for a in span.get('attributes', [])}
+    detail = attributes.get('fhir.resource_type') or attributes.get('agent.type') or ''
+    error = ' !' if span.get('status', {}).get('code') == 2 else ''
+    return f"{span['name']} {detail}".strip() + error
+
+def print_waterfall(spans: list):
+    start = min(s['start'] for s in spans)
+    total = max(max(s['end'] for s in spans) - start, 1)
+    ids = {s['spanId'] for s in spans}
+    children = {}
+    for span in spans:
+        parent = span.get('parentSpanId') if span.get('parentSpanId') in ids else None
+        children.setdefault(parent, []).append(span)
+
+    def walk(parent, depth):
+        for span in sorted(children.get(parent, []), key=lambda s: s['start']):
+            offset = int((span['start'] - start) / total * BAR_WIDTH)
+            width = max(int((span['end'] - span['start']) / total * BAR_WIDTH), 1)
+            bar = ' ' * offset + '#' * width
+            print(f"  {bar:<{BAR_WIDTH}} {(span['end'] - span['start']) / 1e6:9.1f}ms  {'  ' * depth}{label(span)}")
+            walk(span['spanId'], depth + 1)
+
+    print(f"Trace {spans[0]['traceId']} ({total / 1e6:.1f}ms, {len(spans)} spans)\n")
+    walk(None, 0)
+
+parser = argparse.ArgumentParser(description="Print a waterfall of exported trace spans")
+parser.add_argument('trace_id', nargs='?', help="Trace to show (default: list slowest traces)")
+parser.add_argument('--file', nargs='+', default=[settings.TRACING_EXPORT_PATH], help="Span files (OTLP/JSON lines)")
+parser.add_argument('--top', type=int, default=10)
+args = parser.parse_args()
+
+try:
+    spans = load_spans(args.file)
+except OSError as e:
+    print(f"[ERROR] {e}")
+    sys.exit(1)
+
+traces = {}
+for span in spans:
+    traces.setdefault(span['traceId'], []).append(span)
+
+if args.trace_id:
+    if args.trace_id not in traces:
+        print(f"[ERROR] Trace {args.trace_id} not found")
+        sys.exit(1)
+    print_waterfall(traces[args.trace_id])
+else:
+    durations = sorted(((max(s['end'] for s in t) - min(s['start'] for s in t), trace_id, t)
+                        for trace_id, t in traces.items()), reverse=True)
+    for duration, trace_id, trace in durations[:args.top]:
+        root = min(trace, key=lambda s: s['start'])
+        print(f"  {trace_id}  {duration / 1e6:9.1f}ms  {len(trace):4d} spans  {label(root)}")
@@ -0,0 +1,43 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+from app.core.config import settings
+from app.services.replica_service import FHIRReplica
+
+# Bootstrap or refresh the local FHIR replica (backend/app/services/replica_service.py).
+#   python sync_replica.py --ndjson export/*.ndjson   load a HealthLake bulk export
+#   python sync_replica.py                            delta sync (full load on first run)
+
+parser = argparse.ArgumentParser(description="Sync the local SQLite FHIR replica")
+parser.add_argument('--ndjson', nargs='*', help="NDJSON files from a bulk $export")
+parser.add_argument('--path', default=settings.REPLICA_PATH, help="SQLite database path")
+args = parser.parse_args()
+
+replica = FHIRReplica(args.path)
+print(f"Replica: {args.path}\n")
+
+start = time.time()
+if args.ndjson:
+    for path, count in replica.bootstrap_ndjson(args.ndjson).items():
+        print(f"  [OK] {path}: {count} resources")
+    print("\nCatching up on changes since the export...")
+
+failed = False
+for resource_type, result in replica.sync().items():
+    if isinstance(result, Exception):
+        print(f"  [ERROR] {resource_type}: {result}")
+        failed = True
+    else:
+        print(f"  [OK] {resource_type}: {result} new or updated")
+
+print(f"\nDone in {time.time() - start:.1f}s")
+for resource_type, state in replica.status().items():
+    print(f"  {resource_type}: {state['count']} rows, watermark {state['watermark']}")
+
+if failed:
+    sys.exit(1)
@@ -0,0 +1,38 @@
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, '.')
+
+# Searches answered by the SQLite replica must match what HealthLake would
+# return, including the comma-separated patient lists the batch paths send.
+
+from app.services.replica_service import FHIRReplica
+
+def condition(id, patient):
+    return {'resourceType': 'Condition', 'id': id, 'subject': {'reference': f"Patient/{patient}"},
+            'meta': {'versionId': '1', 'lastUpdated': '2024-01-01T00:00:00Z'},
+            'code': {'text': f"Condition {id}"}, 'recordedDate': '2024-01-01'}
+
+replica = FHIRReplica(str(Path(tempfile.mkdtemp()) / 'replica.db'))
+replica.upsert([condition('c1', 'a'), condition('c2', 'b'), condition('c3', 'c')])
+replica._mark_synced('Condition', None)
+
+CASES = [
+    ({'patient': 'a'}, ['c1']),
+    ({'patient': 'Patient/b'}, ['c2']),
+    ({'patient': 'a,b'}, ['c1', 'c2']),
+    ({'subject': 'Patient/a,Patient/c'}, ['c1', 'c3']),
+    ({'patient': 'x,y'}, [])
+]
+
+failures = 0
+for params, expected in CASES:
+    bundle = replica.search('Condition', params, max_staleness=60)
+    ids = sorted(entry['resource']['id'] for entry in (bundle or {}).get('entry', []))
+    if bundle is None or ids != expected:
+        failures += 1
+        print(f"[ERROR] {params}: got {ids}, expected {expected}")
+
+if failures:
+    sys.exit(1)
+print(f"[OK] Replica patient searches match single and multiple patients ({len(CASES)} cases)")
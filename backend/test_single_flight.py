@@ -0,0 +1,55 @@
+import sys
+import time
+import asyncio
+import threading
+sys.path.insert(0, '.')
+
+# Identical concurrent calls, from asyncio tasks and threads at once, must
+# reach the underlying function once and all see its result or exception.
+
+from app.services.single_flight import SingleFlight
+
+calls = []
+
+def slow_search(query):
+    calls.append(query)
+    time.sleep(0.3)
+    if query == 'broken':
+        raise RuntimeError('upstream failed')
+    return {'query': query}
+
+async def main(flights):
+    thread_results = []
+    thread = threading.Thread(target=lambda: thread_results.append(flights.do('patients', slow_search, 'patients')))
+    tasks = [flights.do_async('patients', slow_search, 'patients') for _ in range(20)]
+    tasks += [flights.do_async('conditions', slow_search, 'conditions') for _ in range(5)]
+    thread.start()
+    results = await asyncio.gather(*tasks)
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    broken = await asyncio.gather(*[flights.do_async('broken', slow_search, 'broken') for _ in range(5)],
+                                  return_exceptions=True)
+    return results + thread_results, broken
+
+failures = 0
+flights = SingleFlight()
+results, broken = asyncio.run(main(flights))
+
+if sorted(calls) != ['broken', 'conditions', 'patients']:
+    failures += 1
+    print(f"[ERROR] Expected one call per distinct key, got {calls}")
+patients = [r for r in results if r['query'] == 'patients']
+if len(patients) != 21 or any(r is not patients[0] for r in patients):
+    failures += 1
+    print(f"[ERROR] Task and thread callers should share one result object ({len(patients)} results)")
+if not all(isinstance(e, RuntimeError) for e in broken):
+    failures += 1
+    print(f"[ERROR] Every waiter should see the leader's exception: {broken}")
+stats = flights.stats()
+if stats['leaders'] != 3 or stats['shared'] != 28 or stats['in_flight'] != 0:
+    failures += 1
+    print(f"[ERROR] Unexpected stats: {stats}")
+
+if failures:
+    sys.exit(1)
+print(f"[OK] Concurrent tasks and threads share one call per key ({stats['shared']} shared)")
@@ -0,0 +1,74 @@
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, '.')
+
+# Batch patient summaries served entirely from the SQLite replica. The section
+# searches send `patient=a,b,...`, so every patient in the batch must get their
+# own conditions, medications and ECG flag back, with no upstream requests.
+# Summaries list resolved conditions and finished medications too.
+
+from app.services.healthlake_service import healthlake_service
+from app.services.replica_service import FHIRReplica, REPLICATED_TYPES
+
+def meta():
+    return {'versionId': '1', 'lastUpdated': '2024-01-01T00:00:00Z'}
+
+def patient(id, family):
+    return {'resourceType': 'Patient', 'id': id, 'meta': meta(), 'gender': 'female',
+            'birthDate': '1970-01-01', 'name': [{'given': ['Test'], 'family': family}]}
+
+def condition(id, patient_id, text, status='active'):
+    return {'resourceType': 'Condition', 'id': id, 'meta': meta(), 'subject': {'reference': f"Patient/{patient_id}"},
+            'clinicalStatus': {'coding': [{'code': status}]}, 'code': {'text': text}, 'recordedDate': '2024-01-01'}
+
+def medication(id, patient_id, text, status='active'):
+    return {'resourceType': 'MedicationRequest', 'id': id, 'meta': meta(), 'status': status,
+            'subject': {'reference': f"Patient/{patient_id}"}, 'medicationCodeableConcept': {'text': text},
+            'authoredOn': '2024-01-01'}
+
+def ecg(id, patient_id):
+    return {'resourceType': 'Observation', 'id': id, 'meta': meta(), 'status': 'final',
+            'subject': {'reference': f"Patient/{patient_id}"},
+            'code': {'coding': [{'code': '131328'}]}, 'effectiveDateTime': '2024-01-01'}
+
+replica = FHIRReplica(str(Path(tempfile.mkdtemp()) / 'replica.db'))
+replica.upsert([
+    patient('a', 'Alpha'), patient('b', 'Beta'), patient('c', 'Gamma'),
+    condition('c1', 'a', 'Asthma'), condition('c2', 'b', 'Diabetes'), condition('c3', 'b', 'Hypertension'),
+    condition('c4', 'c', 'Fractured wrist', status='resolved'),
+    medication('m1', 'a', 'Albuterol'), medication('m2', 'c', 'Metformin'),
+    medication('m3', 'b', 'Amoxicillin', status='completed'),
+    ecg('o1', 'b')
+])
+for resource_type in REPLICATED_TYPES:
+    replica._mark_synced(resource_type, None)
+
+def no_upstream(*args, **kwargs):
+    raise AssertionError(f"unexpected upstream request: {args[:2]}")
+
+healthlake_service.replica = replica
+healthlake_service.cache = None
+healthlake_service.digests = None
+healthlake_service._request = no_upstream
+
+expected = {
+    'a': {'name': 'Test Alpha', 'conditions': ['Asthma'], 'medications': ['Albuterol'], 'has_ecg': False},
+    'b': {'name': 'Test Beta', 'conditions': ['Diabetes', 'Hypertension'], 'medications': ['Amoxicillin'],
+          'has_ecg': True},
+    'c': {'name': 'Test Gamma', 'conditions': ['Fractured wrist'], 'medications': ['Metformin'], 'has_ecg': False}
+}
+
+failures = 0
+summaries = {s['id']: s for s in healthlake_service.iter_patient_summaries(['a', 'b', 'c'])}
+for patient_id, fields in expected.items():
+    got = {f: summaries[patient_id][f] for f in fields}
+    if got.get('conditions') is not None:
+        got['conditions'] = sorted(got['conditions'])
+    if got != fields:
+        failures += 1
+        print(f"[ERROR] {patient_id}: got {got}, expected {fields}")
+
+if failures:
+    sys.exit(1)
+print(f"[OK] Batch summaries from the replica cover every patient ({len(expected)} patients)")
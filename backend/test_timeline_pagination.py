@@ -0,0 +1,87 @@
+import sys
+import random
+sys.path.insert(0, '.')
+
+# Timeline paging against a fake FHIR server that sorts by date only and
+# returns events sharing a date in arbitrary order. Every event must come back
+# exactly once, newest first, whatever the page size.
+
+from app.services.healthlake_service import healthlake_service
+from app.services.timeline_service import timeline_service
+
+def observation(id, date):
+    return {'resourceType': 'Observation', 'id': id, 'effectiveDateTime': date, 'status': 'final',
+            'code': {'text': f"Observation {id}"}}
+
+def condition(id, onset=None, recorded=None):
+    resource = {'resourceType': 'Condition', 'id': id, 'code': {'text': f"Condition {id}"},
+                'clinicalStatus': {'coding': []}}
+    if onset:
+        resource['onsetDateTime'] = onset
+    if recorded:
+        resource['recordedDate'] = recorded
+    return resource
+
+DATA = {
+    'Observation': [
+        observation('a', '2024-03-01T09:00:00Z'),
+        observation('b', '2024-03-01T09:00:00Z'),
+        observation('c', '2024-03-01T09:00:00Z'),
+        observation('d', '2024-02-01T09:00:00Z'),
+        observation('e', '2024-02-01T09:00:00Z')
+    ],
+    'Condition': [
+        condition('x', onset='2024-03-01T09:00:00Z'),
+        condition('y', recorded='2024-02-15'),
+        condition('z', onset='2024-01-01')
+    ]
+}
+DATE_FIELD = {'Observation': 'effectiveDateTime'}
+
+def fake_search(resource_type, params=None, **kwargs):
+    resources = DATA.get(resource_type, [])
+    field = DATE_FIELD.get(resource_type)
+    if field:
+        for name, value in params.items():
+            if name == 'date' and value.startswith('le'):
+                resources = [r for r in resources if r[field].replace('Z', '') <= value[2:]]
+        # Sorted by date only; ties in whatever order the server likes
+        resources = sorted(random.sample(resources, len(resources)), key=lambda r: r[field], reverse=True)
+    return page(resources, int(params.get('_count', 100)), 0)
+
+def page(resources, count, offset):
+    bundle = {'resourceType': 'Bundle', 'entry': [{'resource': r} for r in resources[offset:offset + count]]}
+    if offset + count < len(resources):
+        bundle['link'] = [{'relation': 'next', 'url': (resources, count, offset + count)}]
+    return bundle
+
+def fake_next_page(bundle):
+    next_url = next((link['url'] for link in bundle.get('link', []) if link['relation'] == 'next'), None)
+    return page(*next_url) if next_url else None
+
+healthlake_service.search = fake_search
+healthlake_service.next_page = fake_next_page
+
+expected = ['Observation/c', 'Observation/b', 'Observation/a', 'Condition/x', 'Condition/y',
+            'Observation/e', 'Observation/d', 'Condition/z']
+
+failures = 0
+for limit in (1, 2, 3, 50):
+    for seed in range(20):
+        random.seed(seed)
+        seen = []
+        cursor = None
+        while True:
+            result = timeline_service.get_timeline('p1', limit=limit, cursor=cursor,
+                                                   resource_types=['Observation', 'Condition'])
+            seen += [f"{e['resourceType']}/{e['id']}" for e in result['events']]
+            cursor = result['next_cursor']
+            if not cursor:
+                break
+        if seen != expected:
+            failures += 1
+            print(f"[ERROR] limit={limit} seed={seed}: {seen}")
+
+if failures:
+    sys.exit(1)
+print(f"[OK] Timeline pages return every event once, newest first ({len(expected)} events)")
@@ -0,0 +1,33 @@
+import sys
+import numpy as np
+sys.path.insert(0, '.')
+
+# Rolling z-scores against a trailing window. A spike off a perfectly flat
+# baseline must still score as an outlier; small wobble around it must not.
+
+from app.services.vitals_analytics_service import rolling_zscores, ANOMALY_Z
+
+failures = 0
+
+def check(label, values, window, expect_anomaly):
+    global failures
+    z = rolling_zscores(np.array(values, dtype=np.float64), window=window)
+    flagged = bool(abs(z[-1]) > ANOMALY_Z)
+    if flagged != expect_anomaly:
+        failures += 1
+        print(f"[ERROR] {label}: z={z[-1]:.2f}, expected anomaly={expect_anomaly}")
+
+check('SpO2 drop after flat baseline', [98, 98, 98, 98, 85], 4, True)
+check('SpO2 wobble after flat baseline', [98, 98, 98, 98, 97], 4, False)
+check('Heart rate spike after flat baseline', [70] * 7 + [120], 7, True)
+check('Fever after flat temperature', [37.0] * 7 + [38.6], 7, True)
+check('Noisy heart rate', [70, 74, 68, 72, 71, 69, 73, 72], 7, False)
+
+z = rolling_zscores(np.array([98, 98, 98, 98, 85], dtype=np.float64), window=4)
+if not np.all(np.isnan(z[:4])):
+    failures += 1
+    print(f"[ERROR] Expected NaN until the window warms up: {z}")
+
+if failures:
+    sys.exit(1)
+print("[OK] Rolling z-scores flag spikes off flat baselines")
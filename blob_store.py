@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+from pathlib import Path
+
+import boto3
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Key layout, hashing and thumbnail rendering are shared with the backend's
+# blob store (backend/app/services/blob_layout.py) so both sides read each other's blobs
+sys.path.append(str(Path(__file__).parent / 'backend' / 'app' / 'services'))
+from blob_layout import (
+    S3_PREFIX, blob_info, key_from_url, local_path, local_derivative_path,
+    render_thumbnail, write_atomic
+)
+
+REGION = 'us-west-2'
+BLOB_STORE_BACKEND = os.getenv('BLOB_STORE_BACKEND', 'local')
+BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', str(Path(__file__).parent / 'blob_store'))
+BLOB_STORE_BUCKET = os.getenv('BLOB_STORE_BUCKET')
+BLOB_STORE_ENDPOINT_URL = os.getenv('BLOB_STORE_ENDPOINT_URL')
+
+def put_blob(data, content_type='application/octet-stream'):
+    """Store bytes by SHA-256 and return FHIR Attachment fields (url, size, hash)"""
+    info = blob_info(data, content_type)
+    key = info['key']
+
+    if BLOB_STORE_BACKEND == 's3':
+        s3 = boto3.client('s3', region_name=REGION, endpoint_url=BLOB_STORE_ENDPOINT_URL)
+        s3.put_object(Bucket=BLOB_STORE_BUCKET, Key=f"{S3_PREFIX}{key}", Body=data, ContentType=content_type)
+    else:
+        path = local_path(BLOB_STORE_PATH, key)
+        if not path.exists():
+            write_atomic(path, data)
+            path.with_suffix('.json').write_text(json.dumps({'content_type': content_type}))
+
+    return {
+        'contentType': content_type,
+        'url': info['url'],
+        'size': info['size'],
+        'hash': info['hash']
+    }
+
+def get_blob(url):
+    """Read blob bytes back from a Media `content.url`"""
+    key = key_from_url(url)
+    if key is None:
+        return None
+
+    if BLOB_STORE_BACKEND == 's3':
+        s3 = boto3.client('s3', region_name=REGION, endpoint_url=BLOB_STORE_ENDPOINT_URL)
+        return s3.get_object(Bucket=BLOB_STORE_BUCKET, Key=f"{S3_PREFIX}{key}")['Body'].read()
+
+    path = local_path(BLOB_STORE_PATH, key)
+    return path.read_bytes() if path.exists() else None
+
+def get_blob_thumbnail(url, size='small'):
+    """Downscaled PNG for an image blob, cached beside the source like the backend does"""
+    key = key_from_url(url)
+    if key is None:
+        return None
+
+    if BLOB_STORE_BACKEND == 'local':
+        derived_path = local_derivative_path(BLOB_STORE_PATH, key, f"{size}.png")
+        if derived_path.exists():
+            return derived_path.read_bytes()
+
+    source = get_blob(url)
+    if source is None:
+        return None
+    data = render_thumbnail(source, size)
+
+    if BLOB_STORE_BACKEND == 'local':
+        write_atomic(derived_path, data)
+    return data
@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import random
+import argparse
+import numpy as np
+from multiprocessing import Pool
+from datetime import datetime, timedelta
+from fhir_ingest import stable_id
+from add_multiple_cardiac_patients import PATIENTS as CARDIAC_TEMPLATES
+from add_mri_patients import mri_patients as MRI_TEMPLATES
+from add_ecg_waveform_data import ecg_waveform_observation, twelve_lead_ecg_observation
+
+# Seeded, reproducible synthetic cohort for load tests and local replicas.
+#
+#   python cohort_generator.py --patients 100000 --seed 7 --out cohort/
+#   python backend/sync_replica.py --ndjson cohort/*/*.ndjson
+#
+# Patient i is generated from its own RNG seeded with (seed, i), so the output
+# is identical whatever the process count or shard size.
+
+COHORT_TAG_SYSTEM = 'urn:healthlake-ai:cohort'
+FMT = "%Y-%m-%dT%H:%M:%SZ"
+
+AGE_BANDS = [((18, 34), 0.22), ((35, 49), 0.24), ((50, 64), 0.26), ((65, 79), 0.20), ((80, 95), 0.08)]
+
+GIVEN_NAMES = {
+    'female': ['Sarah', 'Maria', 'Jennifer', 'Patricia', 'Linda', 'Elizabeth', 'Susan', 'Karen',
+               'Nancy', 'Lisa', 'Emily', 'Aisha', 'Mei', 'Priya', 'Sofia', 'Grace'],
+    'male': ['Robert', 'David', 'Michael', 'James', 'John', 'William', 'Richard', 'Thomas',
+             'Daniel', 'Carlos', 'Wei', 'Arjun', 'Omar', 'Kenji', 'Samuel', 'Lucas'],
+}
+FAMILY_NAMES = ['Johnson', 'Williams', 'Garcia', 'Chen', 'Brown', 'Anderson', 'Martinez', 'Thompson',
+                'Davis', 'Wilson', 'Smith', 'Lee', 'Patel', 'Nguyen', 'Kim', 'Lopez', 'Clark', 'Walker']
+CITIES = [("Seattle", "WA"), ("Portland", "OR"), ("San Francisco", "CA"), ("Los Angeles", "CA"), ("Spokane", "WA")]
+
+# name, SNOMED code (None = text only, as in add_mri_patients.py), base prevalence at age 55,
+# age exponent, medications (RxNorm ingredient code, display)
+CHRONIC_CONDITIONS = [
+    ("Hypertension", "38341003", 0.30, 1.5, [("29046", "Lisinopril")]),
+    ("Hyperlipidemia", "55822004", 0.25, 1.2, [("83367", "Atorvastatin")]),
+    ("Type 2 diabetes mellitus", "44054006", 0.11, 1.2, [("6809", "Metformin")]),
+]
+CARDIAC_PREVALENCE = {
+    "Atrial fibrillation": (0.03, 3.0, [("1364430", "Apixaban"), ("6918", "Metoprolol")], "afib"),
+    "Myocardial infarction": (0.02, 2.0, [("1191", "Aspirin"), ("32968", "Clopidogrel"), ("6918", "Metoprolol")], "mi"),
+    "Heart failure": (0.02, 2.5, [("4603", "Furosemide"), ("6918", "Metoprolol")], "normal"),
+    "Ventricular tachycardia": (0.005, 1.0, [("703", "Amiodarone")], "vtach"),
+    "Coronary artery disease": (0.06, 2.0, [("1191", "Aspirin"), ("83367", "Atorvastatin")], "normal"),
+}
+MRI_PREVALENCE = {
+    "Brain tumor (glioblastoma)": (0.0005, 1.5, [("37776", "Temozolomide")]),
+    "Multiple sclerosis": (0.003, 0.0, []),
+    "Lumbar disc herniation": (0.02, 0.5, [("5640", "Ibuprofen")]),
+    "Meniscal tear": (0.015, 0.0, [("5640", "Ibuprofen")]),
+    "Stroke (ischemic)": (0.01, 3.0, [("1191", "Aspirin")]),
+}
+SCREENING_ECG_RATE = 0.05
+PRESCRIBED_RATE = 0.85
+
+def _tag(resource, seed, as_of):
+    resource['meta'] = {
+        'versionId': '1',
+        'lastUpdated': as_of.strftime(FMT),
+        'tag': [{'system': COHORT_TAG_SYSTEM, 'code': f"seed-{seed}"}]
+    }
+    return resource
+
+class PatientBuilder:
+    """All resources for cohort patient `index`, drawn from an RNG private to that patient"""
+
+    def __init__(self, seed, index, as_of, twelve_lead=False, max_visits=24):
+        self.seed = seed
+        self.index = index
+        self.as_of = as_of
+        self.twelve_lead = twelve_lead
+        self.max_visits = max_visits
+        self.rng = random.Random(f"{seed}:{index}")
+        self.resources = []
+        self.counter = 0
+
+    def _id(self, kind):
+        self.counter += 1
+        return stable_id('cohort', self.seed, self.index, kind, self.counter)
+
+    def _add(self, resource, kind):
+        resource = {'resourceType': resource['resourceType'], 'id': self._id(kind), **resource}
+        self.resources.append(_tag(resource, self.seed, self.as_of))
+        return resource
+
+    def _when(self, max_days_ago):
+        return (self.as_of - timedelta(days=self.rng.uniform(0, max_days_ago))).strftime(FMT)
+
+    def _has(self, prevalence, power):
+        return self.rng.random() < min(0.95, prevalence * (self.age / 55) ** power)
+
+    def build(self):
+        rng = self.rng
+        (low, high), = rng.choices([band for band, _ in AGE_BANDS], weights=[w for _, w in AGE_BANDS])
+        self.age = rng.randint(low, high)
+        gender = rng.choice(['female', 'male'])
+        given = rng.choice(GIVEN_NAMES[gender])
+        family = rng.choice(FAMILY_NAMES)
+        city, state = rng.choice(CITIES)
+        birth = self.as_of - timedelta(days=self.age * 365.25 + rng.randint(0, 364))
+        self.display = f"{given} {family}"
+
+        patient = self._add({
+            "resourceType": "Patient",
+            "name": [{"use": "official", "family": family, "given": [given]}],
+            "gender": gender,
+            "birthDate": birth.strftime("%Y-%m-%d"),
+            "address": [{
+                "line": [f"{rng.randint(100, 9999)} {rng.choice(['Main', 'Oak', 'Maple', 'Cedar'])} St"],
+                "city": city,
+                "state": state,
+                "postalCode": f"{rng.randint(90000, 99999)}",
+                "country": "US"
+            }]
+        }, 'patient')
+        self.patient_id = patient['id']
+        self.subject = {"reference": f"Patient/{self.patient_id}", "display": self.display}
+
+        diagnoses = []
+        for name, snomed, prevalence, power, meds in CHRONIC_CONDITIONS:
+            if self._has(prevalence, power):
+                diagnoses.append(self._condition(name, snomed, meds))
+
+        cardiac = [t for t in CARDIAC_TEMPLATES if self._has(*CARDIAC_PREVALENCE[t["condition"]][:2])]
+        for template in cardiac:
+            meds = CARDIAC_PREVALENCE[template["condition"]][2]
+            diagnoses.append(self._condition(template["condition"], template["snomed"], meds))
+            self._ecg(template, CARDIAC_PREVALENCE[template["condition"]][3])
+        if not cardiac and rng.random() < SCREENING_ECG_RATE:
+            self._ecg(None, "normal")
+
+        for template in MRI_TEMPLATES:
+            prevalence, power, meds = MRI_PREVALENCE[template["condition"]]
+            if self._has(prevalence, power):
+                diagnoses.append(self._condition(template["condition"], None, meds))
+                self._imaging(template)
+
+        self._vitals(len(diagnoses), hypertensive=any(d == "Hypertension" for d in diagnoses),
+                     afib=any(t["condition"] == "Atrial fibrillation" for t in cardiac))
+        return self.resources
+
+    def _condition(self, name, snomed, meds):
+        code = {"text": name}
+        if snomed:
+            code["coding"] = [{"system": "http://snomed.info/sct", "code": snomed, "display": name}]
+        onset = self._when(365 * 5)
+        condition = self._add({
+            "resourceType": "Condition",
+            "clinicalStatus": {"coding": [{"system": "http://terminology.hl7.org/CodeSystem/condition-clinical", "code": "active"}]},
+            "verificationStatus": {"coding": [{"system": "http://terminology.hl7.org/CodeSystem/condition-ver-status", "code": "confirmed"}]},
+            "code": code,
+            "subject": self.subject,
+            "onsetDateTime": onset,
+            "recordedDate": onset
+        }, 'condition')
+
+        for rxnorm, display in meds:
+            if self.rng.random() < PRESCRIBED_RATE:
+                self._add({
+                    "resourceType": "MedicationRequest",
+                    "status": "active",
+                    "intent": "order",
+                    "medicationCodeableConcept": {
+                        "coding": [{"system": "http://www.nlm.nih.gov/research/umls/rxnorm", "code": rxnorm, "display": display}],
+                        "text": display
+                    },
+                    "subject": self.subject,
+                    "authoredOn": onset,
+                    "reasonReference": [{"reference": f"Condition/{condition['id']}"}]
+                }, 'medication')
+        return name
+
+    def _ecg(self, template, waveform_type):
+        """ECG interval Observation + report (add_multiple_cardiac_patients.py) + waveform (add_ecg_waveform_data.py)"""
+        rng = self.rng
+        template = template or {"condition": "Normal sinus rhythm", "hr": 72, "pr": 160, "qrs": 90, "qt": 400}
+        effective = self._when(365)
+        intervals = [("8867-4", "Heart rate", "hr", "beats/minute", "/min")]
+        if template["pr"] > 0:
+            intervals.append(("8625-6", "PR interval", "pr", "ms", "ms"))
+        intervals += [("8633-0", "QRS duration", "qrs", "ms", "ms"), ("8634-8", "QT interval", "qt", "ms", "ms")]
+
+        observation = self._add({
+            "resourceType": "Observation",
+            "status": "final",
+            "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "procedure", "display": "Procedure"}]}],
+            "code": {"coding": [{"system": "http://loinc.org", "code": "11524-6", "display": "EKG study"}], "text": "12-Lead ECG"},
+            "subject": self.subject,
+            "effectiveDateTime": effective,
+            "issued": effective,
+            "valueString": f"ECG findings consistent with {template['condition']}",
+            "component": [{
+                "code": {"coding": [{"system": "http://loinc.org", "code": loinc, "display": display}]},
+                "valueQuantity": {"value": round(template[field] * rng.gauss(1, 0.06)), "unit": unit,
+                                  "system": "http://unitsofmeasure.org", "code": ucum}
+            } for loinc, display, field, unit, ucum in intervals]
+        }, 'ecg')
+
+        # Waveform noise comes from numpy's global RNG; reseed it from this patient's stream
+        np.random.seed(rng.getrandbits(32))
+        build = twelve_lead_ecg_observation if self.twelve_lead else ecg_waveform_observation
+        waveform = self._add(build(self.patient_id, self.display, waveform_type, effective=effective), 'waveform')
+
+        self._add({
+            "resourceType": "DiagnosticReport",
+            "status": "final",
+            "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/v2-0074", "code": "CG", "display": "Cardiology"}]}],
+            "code": {"coding": [{"system": "http://loinc.org", "code": "11524-6", "display": "EKG study"}], "text": "12-Lead Electrocardiogram"},
+            "subject": self.subject,
+            "effectiveDateTime": effective,
+            "issued": effective,
+            "result": [{"reference": f"Observation/{observation['id']}"}, {"reference": f"Observation/{waveform['id']}"}],
+            "conclusion": f"ECG consistent with {template['condition']}."
+        }, 'ecg-report')
+
+    def _imaging(self, template):
+        """MRI DiagnosticReport as in add_mri_patients.py"""
+        effective = self._when(365 * 2)
+        self._add({
+            "resourceType": "DiagnosticReport",
+            "status": "final",
+            "code": {"coding": [{"system": "http://loinc.org", "code": "24627-2", "display": "MRI Study"}], "text": template["mri_type"]},
+            "subject": self.subject,
+            "effectiveDateTime": effective,
+            "issued": effective,
+            "conclusion": template["findings"],
+            "presentedForm": [{"contentType": "text/plain", "data": template["findings"], "title": f"{template['mri_type']} Report"}]
+        }, 'mri-report')
+
+    def _vitals(self, n_diagnoses, hypertensive, afib):
+        """A visit series of heart rate, blood pressure, SpO2, temperature and respiratory rate"""
+        rng = self.rng
+        visits = min(self.max_visits, rng.randint(1, 4) + 2 * n_diagnoses)
+        base_hr = rng.gauss(88 if afib else 72, 8)
+        base_sys = rng.gauss(148 if hypertensive else 122, 10)
+        category = [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "vital-signs", "display": "Vital Signs"}]}]
+
+        for when in sorted(self._when(365 * 3) for _ in range(visits)):
+            def vital(code, display, value, unit, ucum):
+                self._add({
+                    "resourceType": "Observation",
+                    "status": "final",
+                    "category": category,
+                    "code": {"coding": [{"system": "http://loinc.org", "code": code, "display": display}], "text": display},
+                    "subject": self.subject,
+                    "effectiveDateTime": when,
+                    "valueQuantity": {"value": value, "unit": unit, "system": "http://unitsofmeasure.org", "code": ucum}
+                }, 'vital')
+
+            vital("8867-4", "Heart rate", round(base_hr + rng.gauss(0, 18 if afib else 5)), "beats/minute", "/min")
+            vital("2708-6", "Oxygen saturation", min(100, round(rng.gauss(97, 1.2))), "%", "%")
+            vital("8310-5", "Body temperature", round(rng.gauss(36.8, 0.3), 1), "Cel", "Cel")
+            vital("9279-1", "Respiratory rate", round(rng.gauss(16, 2)), "breaths/minute", "/min")
+
+            systolic = round(base_sys + rng.gauss(0, 8))
+            self._add({
+                "resourceType": "Observation",
+                "status": "final",
+                "category": category,
+                "code": {"coding": [{"system": "http://loinc.org", "code": "85354-9", "display": "Blood pressure panel"}], "text": "Blood Pressure"},
+                "subject": self.subject,
+                "effectiveDateTime": when,
+                "component": [
+                    {"code": {"coding": [{"system": "http://loinc.org", "code": "8480-6"}], "text": "Systolic blood pressure"},
+                     "valueQuantity": {"value": systolic, "unit": "mm[Hg]", "system": "http://unitsofmeasure.org", "code": "mm[Hg]"}},
+                    {"code": {"coding": [{"system": "http://loinc.org", "code": "8462-4"}], "text": "Diastolic blood pressure"},
+                     "valueQuantity": {"value": round(systolic * rng.uniform(0.58, 0.68)), "unit": "mm[Hg]", "system": "http://unitsofmeasure.org", "code": "mm[Hg]"}}
+                ]
+            }, 'vital')
+
+def generate_shard(args):
+    """Write patients [start, stop) to <out>/<ResourceType>/part-<shard>.ndjson; returns counts"""
+    shard, start, stop, options = args
+    as_of = datetime.strptime(options['as_of'], "%Y-%m-%d")
+    files, counts = {}, {}
+    try:
+        for index in range(start, stop):
+            builder = PatientBuilder(options['seed'], index, as_of, options['twelve_lead'], options['max_visits'])
+            for resource in builder.build():
+                resource_type = resource['resourceType']
+                if resource_type not in files:
+                    directory = os.path.join(options['out'], resource_type)
+                    os.makedirs(directory, exist_ok=True)
+                    files[resource_type] = open(os.path.join(directory, f"part-{shard:05d}.ndjson"), 'w', encoding='utf-8')
+                files[resource_type].write(json.dumps(resource, separators=(',', ':')) + '\n')
+                counts[resource_type] = counts.get(resource_type, 0) + 1
+    finally:
+        for f in files.values():
+            f.close()
+    return shard, counts
+
+def generate_cohort(patients, seed, out, processes=None, shard_size=1000, as_of='2025-01-01',
+                    twelve_lead=False, max_visits=24, progress=True):
+    """Generate the cohort across a process pool; returns the manifest"""
+    options = {'seed': seed, 'out': out, 'as_of': as_of, 'twelve_lead': twelve_lead, 'max_visits': max_visits}
+    shards = [(n, start, min(start + shard_size, patients), options)
+              for n, start in enumerate(range(0, patients, shard_size))]
+    os.makedirs(out, exist_ok=True)
+
+    totals = {}
+    start_time = time.time()
+    with Pool(processes=processes) as pool:
+        for done, (shard, counts) in enumerate(pool.imap_unordered(generate_shard, shards), 1):
+            for resource_type, count in counts.items():
+                totals[resource_type] = totals.get(resource_type, 0) + count
+            if progress:
+                print(f"  [{done}/{len(shards)}] shards written", end='\r')
+    if progress:
+        print()
+
+    manifest = {
+        'seed': seed,
+        'patients': patients,
+        'as_of': as_of,
+        'shard_size': shard_size,
+        'shards': len(shards),
+        'twelve_lead': twelve_lead,
+        'max_visits': max_visits,
+        'tag': f"{COHORT_TAG_SYSTEM}|seed-{seed}",
+        'resources': dict(sorted(totals.items())),
+        'seconds': round(time.time() - start_time, 1)
+    }
+    with open(os.path.join(out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic FHIR cohort as partitioned NDJSON")
+    parser.add_argument('--patients', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='cohort')
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--shard-size', type=int, default=1000, help="Patients per NDJSON partition")
+    parser.add_argument('--as-of', default='2025-01-01', help="Reference date all clinical dates are drawn back from")
+    parser.add_argument('--twelve-lead', action='store_true', help="Store 12-lead waveforms instead of Lead II only")
+    parser.add_argument('--max-visits', type=int, default=24)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"GENERATING SYNTHETIC COHORT: {args.patients} patients, seed {args.seed}")
+    print("=" * 70)
+
+    manifest = generate_cohort(args.patients, args.seed, args.out, args.processes, args.shard_size,
+                               args.as_of, args.twelve_lead, args.max_visits)
+    total = sum(manifest['resources'].values())
+    print(f"[OK] {total} resources in {manifest['shards']} shards, {manifest['seconds']}s -> {args.out}/")
+    for resource_type, count in manifest['resources'].items():
+        print(f"  {resource_type}: {count}")
@@ -0,0 +1,213 @@
+import io
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.image as mpimg
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+DEFAULT_FIGSIZE = (12, 4)
+DEFAULT_DPI = 100
+MAX_CACHE_ENTRIES = 256
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+FIGURES_PER_SIZE = 4
+
+class PlotCache:
+    """LRU cache of rendered PNG bytes, bounded by entry count and total size"""
+
+    def __init__(self, max_entries=MAX_CACHE_ENTRIES, max_bytes=MAX_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            png = self.entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self.entries[key] = png
+            self.total_bytes += len(png)
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+class _PooledFigure:
+    """Preallocated ECG figure whose artists are updated in place"""
+
+    def __init__(self, figsize, dpi):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        self.line, = self.ax.plot([], [], 'b-', linewidth=1)
+        self.ax.set_xlabel('Time (seconds)', fontsize=11)
+        self.ax.set_ylabel('Amplitude (mV)', fontsize=11)
+        self.ax.grid(True, alpha=0.3, linestyle='--')
+        self.ax.axhline(y=0, color='r', linestyle='-', linewidth=0.5, alpha=0.5)
+        self.title = self.ax.set_title('', fontsize=14, fontweight='bold')
+        self.title_lines = 1
+        self.figure.tight_layout()
+
+    def render(self, time, amplitude, title, linewidth):
+        self.line.set_data(time, amplitude)
+        self.line.set_linewidth(linewidth)
+        self.title.set_text(title)
+        if title.count('\n') + 1 != self.title_lines:
+            # Multi-line titles need the margins recomputed
+            self.title_lines = title.count('\n') + 1
+            self.figure.tight_layout()
+
+        if len(time):
+            self.ax.set_xlim(float(time[0]), float(time[-1]))
+            low, high = float(np.min(amplitude)), float(np.max(amplitude))
+            pad = (high - low) * 0.05 or 0.1
+            self.ax.set_ylim(low - pad, high + pad)
+
+        buf = io.BytesIO()
+        self.figure.savefig(buf, format='png')
+        return buf.getvalue()
+
+class FigurePool:
+    """Pool of reusable figures, one free-list per (figsize, dpi)"""
+
+    def __init__(self, figures_per_size=FIGURES_PER_SIZE):
+        self.figures_per_size = figures_per_size
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def _pool_for(self, figsize, dpi):
+        key = (tuple(figsize), dpi)
+        with self.lock:
+            if key not in self.pools:
+                pool = queue.LifoQueue()
+                for _ in range(self.figures_per_size):
+                    pool.put(None)  # Figures are built lazily on first use
+                self.pools[key] = pool
+            return self.pools[key]
+
+    def render(self, figsize, dpi, time, amplitude, title, linewidth):
+        pool = self._pool_for(figsize, dpi)
+        pooled = pool.get()
+        try:
+            if pooled is None:
+                pooled = _PooledFigure(figsize, dpi)
+            return pooled.render(time, amplitude, title, linewidth)
+        finally:
+            pool.put(pooled)
+
+class ECGPlotService:
+    def __init__(self, cache=None, pool=None):
+        self.cache = cache or PlotCache()
+        self.pool = pool or FigurePool()
+
+    def cache_key(self, waveform, title, figsize, dpi, linewidth):
+        """Key on observation id/version, falling back to a digest of the samples"""
+        if waveform.get('id'):
+            source = (waveform['id'], waveform.get('version'))
+        else:
+            amplitude = np.ascontiguousarray(waveform['amplitude'], dtype=np.float64)
+            source = (hashlib.sha1(amplitude.tobytes()).hexdigest(),)
+        return source + (title, tuple(figsize), dpi, linewidth)
+
+    def render(self, waveform, title=None, figsize=DEFAULT_FIGSIZE, dpi=DEFAULT_DPI, linewidth=1):
+        """Return PNG bytes for an ECG waveform, rendering only on cache miss"""
+        if title is None:
+            title = f"ECG Lead II - {waveform.get('patient', 'Unknown')}"
+
+        key = self.cache_key(waveform, title, figsize, dpi, linewidth)
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+
+        png = self.pool.render(figsize, dpi, waveform['time'], waveform['amplitude'], title, linewidth)
+        self.cache.put(key, png)
+        return png
+
+    def render_batch(self, waveforms, titles=None, figsize=DEFAULT_FIGSIZE, dpi=DEFAULT_DPI,
+                     linewidth=1, max_workers=None):
+        """Render many waveforms, farming cache misses out to a process pool"""
+        titles = titles or [f"ECG Lead II - {w.get('patient', 'Unknown')}" for w in waveforms]
+        results = [None] * len(waveforms)
+        pending = []
+
+        for idx, (waveform, title) in enumerate(zip(waveforms, titles)):
+            key = self.cache_key(waveform, title, figsize, dpi, linewidth)
+            png = self.cache.get(key)
+            if png is not None:
+                results[idx] = png
+            else:
+                pending.append((idx, key, waveform, title))
+
+        if len(pending) == 1:
+            idx, key, waveform, title = pending[0]
+            results[idx] = self.render(waveform, title, figsize, dpi, linewidth)
+        elif pending:
+            jobs = [
+                (np.asarray(w['time']), np.asarray(w['amplitude']), title, tuple(figsize), dpi, linewidth)
+                for _, _, w, title in pending
+            ]
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for (idx, key, _, _), png in zip(pending, executor.map(_render_job, jobs)):
+                    self.cache.put(key, png)
+                    results[idx] = png
+
+        return results
+
+    def render_grid(self, waveforms, titles=None, figsize=DEFAULT_FIGSIZE, dpi=DEFAULT_DPI,
+                    linewidth=1, max_workers=None):
+        """Render waveforms as vertically stacked panels and return one PNG"""
+        panels = self.render_batch(waveforms, titles, figsize, dpi, linewidth, max_workers)
+        if not panels:
+            return None
+
+        stacked = np.vstack([mpimg.imread(io.BytesIO(png), format='png') for png in panels])
+        buf = io.BytesIO()
+        mpimg.imsave(buf, stacked, format='png')
+        return buf.getvalue()
+
+_worker_pool = None
+
+def _render_job(job):
+    """Process-pool entry point; each worker keeps its own figure pool"""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = FigurePool(figures_per_size=1)
+    time, amplitude, title, figsize, dpi, linewidth = job
+    return _worker_pool.render(figsize, dpi, time, amplitude, title, linewidth)
+
+ecg_plot_service = ECGPlotService()
@@ -0,0 +1,169 @@
+import json
+import time
+import uuid
+import threading
+import boto3
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REGION = 'us-west-2'
+DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
+
+# Identifier system stamped on seeded resources so re-runs can use conditional create
+INGEST_IDENTIFIER_SYSTEM = 'urn:healthlake-ai:ingest'
+INGEST_NAMESPACE = uuid.UUID('0d9d4c1e-4f53-4d0c-9a4b-6a3c1b7f2e10')
+
+MAX_BUNDLE_ENTRIES = 100
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def stable_id(*parts):
+    """Deterministic identifier value for a seeded resource (same inputs -> same value)"""
+    return str(uuid.uuid5(INGEST_NAMESPACE, '|'.join(str(p) for p in parts)))
+
+def reference_from_location(location):
+    """'Type/id' from a response location, relative or absolute (`https://.../r4/Type/id/_history/n`)"""
+    parts = [p for p in (location or '').split('?')[0].split('/') if p]
+    if '_history' in parts:
+        parts = parts[:parts.index('_history')]
+    return '/'.join(parts[-2:]) if len(parts) >= 2 else None
+
+class Transaction:
+    """One atomic unit of work: resources that reference each other by urn:uuid.
+
+    tx = Transaction()
+    patient = tx.add(patient_resource, key=('patient', 'Sarah Johnson'))
+    tx.add({..., "subject": {"reference": patient}})
+    """
+
+    def __init__(self, label=None):
+        self.label = label
+        self.entries = []
+
+    def add(self, resource, key=None):
+        """Queue a create and return its `urn:uuid:` reference.
+
+        With `key`, the resource gets a stable ingest identifier and is created
+        with `ifNoneExist`, so retrying or re-running the load never duplicates it.
+        """
+        full_url = f"urn:uuid:{uuid.uuid4()}"
+        request = {'method': 'POST', 'url': resource['resourceType']}
+
+        if key is not None:
+            value = stable_id(resource['resourceType'], *(key if isinstance(key, (list, tuple)) else [key]))
+            identifiers = [i for i in resource.get('identifier', []) if i.get('system') != INGEST_IDENTIFIER_SYSTEM]
+            resource = {**resource, 'identifier': identifiers + [{'system': INGEST_IDENTIFIER_SYSTEM, 'value': value}]}
+            request['ifNoneExist'] = f"identifier={INGEST_IDENTIFIER_SYSTEM}|{value}"
+
+        self.entries.append({'fullUrl': full_url, 'resource': resource, 'request': request})
+        return full_url
+
+    def __len__(self):
+        return len(self.entries)
+
+def pack(transactions, max_entries=MAX_BUNDLE_ENTRIES):
+    """Group small transactions into Bundles of at most `max_entries` entries.
+
+    A transaction is never split, so each patient graph stays all-or-nothing.
+    """
+    bundle, labels = [], []
+    for tx in transactions:
+        if bundle and len(bundle) + len(tx) > max_entries:
+            yield bundle, labels
+            bundle, labels = [], []
+        bundle.extend(tx.entries)
+        labels.append(tx.label)
+    if bundle:
+        yield bundle, labels
+
+class IngestEngine:
+    """Submits transaction Bundles to HealthLake through a bounded worker pool"""
+
+    def __init__(self, workers=8, max_entries=MAX_BUNDLE_ENTRIES, max_retries=4,
+                 region=REGION, datastore_id=DATASTORE_ID):
+        self.endpoint = f"https://healthlake.{region}.amazonaws.com/datastore/{datastore_id}/r4/"
+        self.region = region
+        self.workers = workers
+        self.max_entries = max_entries
+        self.max_retries = max_retries
+        # One credential provider and connection pool for every request
+        self.credentials = boto3.Session(region_name=region).get_credentials()
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.http.mount('https://', adapter)
+        self.lock = threading.Lock()
+        self.stats = {'bundles': 0, 'resources': 0, 'failed_bundles': 0, 'retries': 0, 'seconds': 0.0}
+
+    def _post_bundle(self, entries):
+        data = json.dumps({'resourceType': 'Bundle', 'type': 'transaction', 'entry': entries})
+        for attempt in range(self.max_retries + 1):
+            request = AWSRequest(method='POST', url=self.endpoint, data=data,
+                                 headers={'Content-Type': 'application/fhir+json'})
+            SigV4Auth(self.credentials, 'healthlake', self.region).add_auth(request)
+            response = self.http.post(self.endpoint, data=data, headers=dict(request.headers))
+
+            # Safe to resend: keyed entries are conditional creates
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                with self.lock:
+                    self.stats['retries'] += 1
+                time.sleep(min(2 ** attempt * 0.5, 8))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def _submit(self, entries):
+        """POST one Bundle; returns {urn:uuid -> 'Type/id'} for its entries"""
+        result = self._post_bundle(entries)
+        locations = {}
+        for entry, outcome in zip(entries, result.get('entry', [])):
+            locations[entry['fullUrl']] = reference_from_location(outcome.get('response', {}).get('location'))
+        return locations
+
+    def run(self, transactions, progress=True):
+        """Pack and submit transactions; returns {label: {urn:uuid -> 'Type/id'}} plus failures"""
+        bundles = list(pack(transactions, self.max_entries))
+        results, failures = {}, []
+        start = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._submit, entries): (entries, labels) for entries, labels in bundles}
+            for done, future in enumerate(as_completed(futures), 1):
+                entries, labels = futures[future]
+                try:
+                    locations = future.result()
+                    with self.lock:
+                        self.stats['bundles'] += 1
+                        self.stats['resources'] += len(entries)
+                    for label in labels:
+                        results.setdefault(label, {}).update(locations)
+                except Exception as e:
+                    with self.lock:
+                        self.stats['failed_bundles'] += 1
+                    failures.append({'labels': labels, 'error': str(e)[:300]})
+                if progress:
+                    print(f"  [{done}/{len(bundles)}] bundles submitted", end='\r')
+
+        self.stats['seconds'] += time.time() - start
+        if progress:
+            print()
+        return {'results': results, 'failures': failures}
+
+    def report(self):
+        seconds = self.stats['seconds'] or 1e-9
+        return (f"{self.stats['resources']} resources in {self.stats['bundles']} bundles, "
+                f"{self.stats['seconds']:.1f}s ({self.stats['resources'] / seconds:.0f} resources/s), "
+                f"{self.stats['retries']} retries, {self.stats['failed_bundles']} failed bundles")
+
+def ingest(transactions, workers=8, max_entries=MAX_BUNDLE_ENTRIES):
+    """Submit transactions and print the throughput report"""
+    engine = IngestEngine(workers=workers, max_entries=max_entries)
+    outcome = engine.run(transactions)
+    print(f"[OK] {engine.report()}")
+    for failure in outcome['failures']:
+        print(f"[ERROR] {', '.join(str(label) for label in failure['labels'])}: {failure['error']}")
+    return outcome
@@ -1,11 +1,25 @@
 import React, { useEffect, useState } from 'react';
-import { Box, Typography, CircularProgress, Alert } from '@mui/material';
+import { Box, Typography, CircularProgress, Alert, Dialog, DialogTitle, DialogContent } from '@mui/material';
 import axios from 'axios';
+import api from '../services/api';
+
+// Blob URLs are absolute paths on the API host (e.g. /api/blobs/<sha256>)
+const apiOrigin = new URL(api.defaults.baseURL).origin;
+
+const imageSrc = (img) => (
+  img.url ? `${apiOrigin}${img.url}` : `data:${img.contentType};base64,${img.data}`
+);
+
+// Gallery shows server-side thumbnails; full resolution loads only when opened
+const thumbnailSrc = (img) => (
+  img.thumbnailUrl ? `${apiOrigin}${img.thumbnailUrl}` : imageSrc(img)
+);
 
 const MRIImages = ({ patientId }) => {
   const [images, setImages] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [selected, setSelected] = useState(null);
 
   useEffect(() => {
     let mounted = true;
@@ -56,25 +70,45 @@ const MRIImages = ({ patientId }) => {
 
   return (
     <Box>
-      {images.map((img, index) => (
-        <Box key={index} sx={{ mb: 3 }}>
-          <Typography variant="subtitle1" fontWeight={600} gutterBottom>
-            {img.title}
-          </Typography>
-          <Box
-            component="img"
-            src={`data:${img.contentType};base64,${img.data}`}
-            alt={img.title}
-            sx={{
-              width: '100%',
-              maxWidth: 600,
-              height: 'auto',
-              borderRadius: 1,
-              border: '1px solid #ddd'
-            }}
-          />
-        </Box>
-      ))}
+      <Box sx={{ display: 'grid', gridTemplateColumns: 'repeat(auto-fill, minmax(200px, 1fr))', gap: 2 }}>
+        {images.map((img, index) => (
+          <Box key={img.id || index}>
+            <Box
+              component="img"
+              src={thumbnailSrc(img)}
+              loading="lazy"
+              alt={img.title}
+              onClick={() => setSelected(img)}
+              sx={{
+                width: '100%',
+                height: 'auto',
+                borderRadius: 1,
+                border: '1px solid #ddd',
+                cursor: 'zoom-in'
+              }}
+            />
+            <Typography variant="body2" fontWeight={600}>
+              {img.title}
+            </Typography>
+          </Box>
+        ))}
+      </Box>
+
+      <Dialog open={Boolean(selected)} onClose={() => setSelected(null)} maxWidth="md">
+        {selected && (
+          <>
+            <DialogTitle>{selected.title}</DialogTitle>
+            <DialogContent>
+              <Box
+                component="img"
+                src={imageSrc(selected)}
+                alt={selected.title}
+                sx={{ width: '100%', maxWidth: 600, height: 'auto' }}
+              />
+            </DialogContent>
+          </>
+        )}
+      </Dialog>
     </Box>
   );
 };
@@ -11,8 +11,19 @@ export const patientService = {
     return response.data;
   },
 
-  getSummary: async (id) => {
-    const response = await api.get(`/patients/${id}/summary`);
+  getSummary: async (id, fields) => {
+    const params = fields ? { fields: fields.join(',') } : undefined;
+    const response = await api.get(`/patients/${id}/summary`, { params });
+    return response.data;
+  },
+
+  getSummaries: async (ids, fields) => {
+    const response = await api.post('/patients/summaries', { ids, fields });
+    return response.data;
+  },
+
+  getDigest: async (patientId) => {
+    const response = await api.get(`/patients/${patientId}/digest`);
     return response.data;
   },
 };
@@ -1,3 +1,4 @@
+import os
 import json
 import boto3
 import urllib.request
@@ -6,6 +7,8 @@ from botocore.awsrequest import AWSRequest
 
 DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
 REGION = 'us-west-2'
+# Backend base URL serving the columnar cohort store (POST /api/cohort/query)
+COHORT_API_URL = os.environ.get('COHORT_API_URL', '')
 
 def search_healthlake(resource_type, params=None):
     """Search HealthLake FHIR resources"""
@@ -38,6 +41,26 @@ def search_healthlake(resource_type, params=None):
         print(f"Error: {str(e)}")
         return {'entry': [], 'total': 0}
 
+def query_cohort(query):
+    """Run a cohort analytics query (JSON spec) against the backend's columnar store"""
+    if not COHORT_API_URL:
+        return {'error': 'COHORT_API_URL is not configured'}
+    
+    request = urllib.request.Request(
+        f"{COHORT_API_URL.rstrip('/')}/api/cohort/query",
+        data=json.dumps(query).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=25) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return {'error': f"{e.code}: {e.read()[:500].decode('utf-8', 'replace')}"}
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return {'error': str(e)}
+
 def lambda_handler(event, context):
     """Lambda handler for Bedrock Agent"""
     print(f"Event: {json.dumps(event)}")
@@ -269,6 +292,15 @@ def lambda_handler(event, context):
         
         result = {'patients': matching_patients, 'count': len(matching_patients)}
     
+    elif api_path == '/cohort-query':
+        try:
+            query = json.loads(params.get('query', '{}'))
+        except ValueError as e:
+            query = None
+            result = {'error': f"query must be a JSON object: {e}"}
+        if query is not None:
+            result = query_cohort(query)
+    
     return {
         'messageVersion': '1.0',
         'response': {
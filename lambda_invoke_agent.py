@@ -1,16 +1,65 @@
+import os
 import json
+import time
+import random
+import urllib.request
 import boto3
 
+# Optional OTLP/HTTP collector (e.g. http://collector:4318/v1/traces); spans are
+# always printed to the CloudWatch log as `TRACE_SPAN {...}` OTLP/JSON lines.
+OTLP_ENDPOINT = os.environ.get('OTLP_ENDPOINT')
+
+def parse_traceparent(value):
+    """`00-<trace id>-<parent span id>-<flags>` -> (trace_id, parent_span_id), or None"""
+    parts = (value or '').split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+def export_span(span):
+    """Write one span as OTLP/JSON to the log and, if configured, the collector"""
+    payload = {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'invoke-bedrock-agent-lambda'}}]},
+        'scopeSpans': [{'scope': {'name': 'healthlake-ai'}, 'spans': [span]}]
+    }]}
+    print(f"TRACE_SPAN {json.dumps(payload)}")
+    if OTLP_ENDPOINT:
+        try:
+            request = urllib.request.Request(OTLP_ENDPOINT, data=json.dumps(payload).encode('utf-8'),
+                                             headers={'Content-Type': 'application/json'}, method='POST')
+            urllib.request.urlopen(request, timeout=3).close()
+        except Exception as e:
+            print(f"Span export failed: {e}")
+
 def lambda_handler(event, context):
     """Lambda function to invoke Bedrock agents"""
-    
+
     agent_id = event['agentId']
     alias_id = event['aliasId']
     session_id = event['sessionId']
     input_text = event['inputText']
-    
+
+    # Continue the caller's trace when the payload carries a W3C traceparent
+    parent = parse_traceparent(event.get('traceparent'))
+    trace_id = parent[0] if parent else f"{random.getrandbits(128):032x}"
+    span_id = f"{random.getrandbits(64):016x}"
+    span = {
+        'traceId': trace_id,
+        'spanId': span_id,
+        'name': 'bedrock.invoke_agent',
+        'kind': 3,
+        'startTimeUnixNano': str(time.time_ns()),
+        'attributes': [
+            {'key': 'agent.id', 'value': {'stringValue': agent_id}},
+            {'key': 'agent.session_id', 'value': {'stringValue': session_id}}
+        ]
+    }
+    if parent:
+        span['parentSpanId'] = parent[1]
+    traceparent = f"00-{trace_id}-{span_id}-01"
+
     runtime = boto3.client('bedrock-agent-runtime', region_name='us-west-2')
-    
+
     try:
         response = runtime.invoke_agent(
             agentId=agent_id,
@@ -18,26 +67,34 @@ def lambda_handler(event, context):
             sessionId=session_id,
             inputText=input_text
         )
-        
+
         completion = ""
         for event in response.get('completion', []):
             if 'chunk' in event:
                 chunk = event['chunk']
                 if 'bytes' in chunk:
                     completion += chunk['bytes'].decode('utf-8')
-        
+
+        span['status'] = {'code': 1}
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'completion': completion,
-                'agentId': agent_id
+                'agentId': agent_id,
+                'traceparent': traceparent
             })
         }
-        
+
     except Exception as e:
+        span['status'] = {'code': 2, 'message': str(e)[:500]}
         return {
             'statusCode': 500,
             'body': json.dumps({
-                'error': str(e)
+                'error': str(e),
+                'traceparent': traceparent
             })
         }
+
+    finally:
+        span['endTimeUnixNano'] = str(time.time_ns())
+        export_span(span)
@@ -0,0 +1,61 @@
+import boto3
+import json
+import base64
+import requests
+from dotenv import load_dotenv
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from blob_store import put_blob
+
+load_dotenv()
+
+REGION = 'us-west-2'
+DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
+ENDPOINT = f"https://healthlake.{REGION}.amazonaws.com/datastore/{DATASTORE_ID}/r4/"
+
+def signed_request(method, url, data=None):
+    session = boto3.Session(region_name=REGION)
+    credentials = session.get_credentials()
+    headers = {'Content-Type': 'application/fhir+json'} if data else {}
+
+    request = AWSRequest(method=method, url=url, data=data, headers=headers)
+    SigV4Auth(credentials, 'healthlake', REGION).add_auth(request)
+
+    return requests.request(method, url, data=data, headers=dict(request.headers))
+
+def main():
+    """Move inline base64 Media pixel data into the blob store"""
+    print("Migrating inline MRI images to blob storage...\n")
+
+    url = f"{ENDPOINT}Media?_count=50"
+    migrated = 0
+    saved_bytes = 0
+
+    while url:
+        bundle = signed_request('GET', url).json()
+
+        for entry in bundle.get('entry', []):
+            media = entry['resource']
+            content = media.get('content', {})
+            if 'data' not in content:
+                continue
+
+            image_data = base64.b64decode(content['data'])
+            attachment = put_blob(image_data, content.get('contentType', 'image/png'))
+
+            media['content'] = {**attachment, 'title': content.get('title', 'MRI Image')}
+            response = signed_request('PUT', f"{ENDPOINT}Media/{media['id']}", json.dumps(media))
+
+            if response.status_code in [200, 201]:
+                migrated += 1
+                saved_bytes += len(content['data'])
+                print(f"  [OK] Media/{media['id']} -> {attachment['url']}")
+            else:
+                print(f"  [ERROR] Media/{media['id']}: {response.status_code} - {response.text[:200]}")
+
+        url = next((link['url'] for link in bundle.get('link', []) if link.get('relation') == 'next'), None)
+
+    print(f"\n[OK] Migrated {migrated} Media resources ({saved_bytes / 1024:.0f} KB removed from FHIR payloads)")
+
+if __name__ == "__main__":
+    main()
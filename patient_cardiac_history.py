@@ -1,12 +1,12 @@
 import boto3
 import requests
 import json
-import matplotlib.pyplot as plt
 import numpy as np
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 from datetime import datetime
 from dotenv import load_dotenv
+from ecg_plot_service import ecg_plot_service
 
 load_dotenv()
 
@@ -111,7 +111,13 @@ def get_patient_cardiac_history(patient_id):
             waveform = [float(x) for x in data_string.split()]
             time = np.arange(len(waveform)) * period_ms / 1000
             
-            waveform_data = {'time': time, 'amplitude': waveform, 'patient': full_name}
+            waveform_data = {
+                'id': obs.get('id'),
+                'version': obs.get('meta', {}).get('versionId'),
+                'time': time,
+                'amplitude': waveform,
+                'patient': full_name
+            }
             print(f"  Waveform available: {len(waveform)} samples over {max(time):.1f} seconds")
         else:
             print("  No waveform data found")
@@ -153,24 +159,13 @@ def visualize_patient_ecg(history_data):
     
     waveform = history_data['waveform']
     
-    fig, ax = plt.subplots(figsize=(14, 6))
+    title = f"ECG Lead II - {waveform['patient']}\nConditions: {', '.join(history_data['conditions'])}"
+    png = ecg_plot_service.render(waveform, title=title, figsize=(14, 6), dpi=150, linewidth=1.2)
     
-    ax.plot(waveform['time'], waveform['amplitude'], 'b-', linewidth=1.2)
-    ax.set_title(f"ECG Lead II - {waveform['patient']}\nConditions: {', '.join(history_data['conditions'])}", 
-                 fontsize=14, fontweight='bold')
-    ax.set_xlabel('Time (seconds)', fontsize=12)
-    ax.set_ylabel('Amplitude (mV)', fontsize=12)
-    ax.grid(True, alpha=0.3, linestyle='--')
-    ax.set_xlim([0, max(waveform['time'])])
-    
-    # Add annotations
-    ax.axhline(y=0, color='r', linestyle='-', linewidth=0.5, alpha=0.5)
-    
-    plt.tight_layout()
     filename = f"patient_{history_data['patient_id']}_ecg.png"
-    plt.savefig(filename, dpi=150, bbox_inches='tight')
+    with open(filename, 'wb') as f:
+        f.write(png)
     print(f"\n[OK] ECG visualization saved to: {filename}")
-    plt.show()
 
 if __name__ == "__main__":
     # Example: Use one of the cardiac patient IDs
@@ -1,33 +1,14 @@
 import boto3
 import json
-import zipfile
 import os
+import time
+from synthea_pipeline import SyntheaPipeline, start_import_job
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def extract_synthea_data(zip_path='synthea_sample.zip', extract_to='synthea_data'):
-    """Extract SYNTHEA zip file"""
-    print(f"Extracting {zip_path}...")
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_to)
-    print(f"Extracted to: {extract_to}")
-    
-    # List FHIR files
-    fhir_files = []
-    for root, dirs, files in os.walk(extract_to):
-        for file in files:
-            if file.endswith('.json'):
-                fhir_files.append(os.path.join(root, file))
-    
-    print(f"Found {len(fhir_files)} FHIR JSON files")
-    return fhir_files
-
-def upload_to_s3(fhir_files, bucket_name, prefix='fhir-import/'):
-    """Upload FHIR files to S3"""
-    s3 = boto3.client('s3')
-    
-    # Create bucket if needed
+def ensure_bucket(s3, bucket_name):
+    """Create the import bucket if needed"""
     try:
         s3.head_bucket(Bucket=bucket_name)
         print(f"Using existing bucket: {bucket_name}")
@@ -37,16 +18,6 @@ def upload_to_s3(fhir_files, bucket_name, prefix='fhir-import/'):
             Bucket=bucket_name,
             CreateBucketConfiguration={'LocationConstraint': os.getenv('AWS_REGION', 'us-west-2')}
         )
-    
-    # Upload files
-    uploaded = []
-    for i, file_path in enumerate(fhir_files[:10], 1):  # Upload first 10 files
-        key = prefix + os.path.basename(file_path)
-        print(f"Uploading {i}/{min(10, len(fhir_files))}: {os.path.basename(file_path)}")
-        s3.upload_file(file_path, bucket_name, key)
-        uploaded.append(f"s3://{bucket_name}/{key}")
-    
-    return uploaded
 
 def create_import_role():
     """Create IAM role for HealthLake import"""
@@ -93,36 +64,23 @@ def create_import_role():
 
 def start_import(datastore_id, s3_uri, role_arn):
     """Start HealthLake import job"""
-    client = boto3.client('healthlake', region_name='us-west-2')
-    
-    response = client.start_fhir_import_job(
-        DatastoreId=datastore_id,
-        InputDataConfig={'S3Uri': s3_uri},
-        JobOutputDataConfig={
-            'S3Configuration': {
-                'S3Uri': s3_uri.rsplit('/', 1)[0] + '/output/',
-                'KmsKeyId': 'AWS_OWNED_KMS_KEY'
-            }
-        },
-        DataAccessRoleArn=role_arn
-    )
-    
-    return response
+    return start_import_job(s3_uri, s3_uri.rstrip('/').rsplit('/', 1)[0] + '/output/', role_arn, datastore_id=datastore_id)
 
 if __name__ == "__main__":
     print("=" * 60)
     print("IMPORTING SYNTHEA DATA TO HEALTHLAKE")
     print("=" * 60)
     
-    # Step 1: Extract
-    print("\nStep 1: Extracting SYNTHEA data...")
-    fhir_files = extract_synthea_data()
-    
-    # Step 2: Upload to S3
-    print("\nStep 2: Uploading to S3...")
+    # Step 1: Bucket
+    print("\nStep 1: Preparing S3 bucket...")
     bucket_name = f"healthlake-import-{boto3.client('sts').get_caller_identity()['Account']}"
-    uploaded = upload_to_s3(fhir_files, bucket_name)
-    print(f"Uploaded {len(uploaded)} files")
+    pipeline = SyntheaPipeline(bucket_name, f"synthea/{time.strftime('%Y%m%d-%H%M%S')}/input")
+    ensure_bucket(pipeline.s3, bucket_name)
+    
+    # Step 2: Stream zip -> per-type NDJSON on S3 (nothing is extracted to disk)
+    print("\nStep 2: Streaming SYNTHEA data to S3...")
+    s3_uri = pipeline.run('synthea_sample.zip')
+    print(f"Uploaded {pipeline.report()}")
     
     # Step 3: Create role
     print("\nStep 3: Creating IAM role...")
@@ -130,7 +88,6 @@ if __name__ == "__main__":
     
     # Step 4: Start import
     print("\nStep 4: Starting import job...")
-    s3_uri = f"s3://{bucket_name}/fhir-import/"
     result = start_import('b1f04342d94dcc96c47f9528f039f5a8', s3_uri, role_arn)
     
     print(f"\nImport job started!")
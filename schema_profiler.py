@@ -0,0 +1,356 @@
+import json
+import math
+import time
+import base64
+import hashlib
+import argparse
+import threading
+import boto3
+import requests
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
+REGION = 'us-west-2'
+
+# Streaming schema profiler: walks every resource (all HealthLake pages or
+# NDJSON exports) and keeps, per resource type and JSON path, how many
+# resources contain the path, a histogram of JSON types seen there and a
+# HyperLogLog sketch of distinct scalar values. Memory is bounded by the
+# number of distinct paths, never by the number of resources, and reports
+# from separate runs merge exactly (counts add, sketches take register max).
+#
+#   python schema_profiler.py                                  # whole datastore
+#   python schema_profiler.py --ndjson cohort/*/*.ndjson       # local export
+#   python schema_profiler.py --merge a.json b.json --out all.json
+
+RESOURCE_TYPES = [
+    'Patient', 'Observation', 'Condition', 'MedicationRequest',
+    'Encounter', 'Procedure', 'AllergyIntolerance', 'Immunization',
+    'DiagnosticReport', 'CarePlan', 'Media', 'DocumentReference'
+]
+PAGE_SIZE = 100
+HLL_PRECISION = 12          # 4 KiB per path, ~1.6% standard error
+MAX_PATHS = 2000            # per resource type; beyond this paths are only counted as overflow
+REPORT_VERSION = 1
+
+class HyperLogLog:
+    """Fixed-size distinct-count sketch; merging two sketches is a register-wise max"""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = registers if registers is not None else bytearray(self.size)
+
+    def add(self, value: str):
+        x = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = x >> (64 - self.precision)
+        rest = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.size
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)   # small-range correction
+        return round(estimate)
+
+    def to_str(self) -> str:
+        return base64.b64encode(bytes(self.registers)).decode('ascii')
+
+    @classmethod
+    def from_str(cls, data: str, precision=HLL_PRECISION):
+        return cls(precision, bytearray(base64.b64decode(data)))
+
+def _json_type(value):
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return 'array'
+    if isinstance(value, dict):
+        return 'object'
+    return 'null'
+
+class PathStats:
+    def __init__(self):
+        self.present = 0
+        self.types = {}
+        self.sketch = None
+
+class ResourceProfile:
+    """Path statistics for one resource type"""
+
+    def __init__(self, resource_type, max_paths=MAX_PATHS, sketches=True):
+        self.resource_type = resource_type
+        self.max_paths = max_paths
+        self.sketches = sketches
+        self.resources = 0
+        self.overflow = 0
+        self.paths = {}
+
+    def _stats(self, path):
+        stats = self.paths.get(path)
+        if stats is None and len(self.paths) < self.max_paths:
+            stats = self.paths[path] = PathStats()
+        return stats
+
+    def _walk(self, value, path, seen):
+        kind = _json_type(value)
+        stats = self._stats(path)
+        if stats is None:
+            self.overflow += 1
+            return
+        stats.types[kind] = stats.types.get(kind, 0) + 1
+        seen.add(path)
+
+        if kind == 'object':
+            for key, child in value.items():
+                self._walk(child, f"{path}.{key}" if path else key, seen)
+        elif kind == 'array':
+            for child in value:
+                self._walk(child, f"{path}[]", seen)
+        elif self.sketches:
+            if stats.sketch is None:
+                stats.sketch = HyperLogLog()
+            stats.sketch.add(value if kind == 'string' else json.dumps(value))
+
+    def add(self, resource):
+        self.resources += 1
+        seen = set()
+        for key, value in resource.items():
+            self._walk(value, key, seen)
+        for path in seen:
+            self.paths[path].present += 1
+
+    def merge(self, other):
+        self.resources += other.resources
+        self.overflow += other.overflow
+        for path, theirs in other.paths.items():
+            ours = self._stats(path)
+            if ours is None:
+                self.overflow += theirs.present
+                continue
+            ours.present += theirs.present
+            for kind, count in theirs.types.items():
+                ours.types[kind] = ours.types.get(kind, 0) + count
+            if theirs.sketch is not None:
+                if ours.sketch is None:
+                    ours.sketch = HyperLogLog(theirs.sketch.precision, bytearray(theirs.sketch.registers))
+                else:
+                    ours.sketch.merge(theirs.sketch)
+
+    def to_dict(self):
+        paths = {}
+        for path in sorted(self.paths):
+            stats = self.paths[path]
+            entry = {
+                'present': stats.present,
+                'frequency': round(stats.present / self.resources, 4) if self.resources else 0,
+                'types': stats.types
+            }
+            if stats.sketch is not None:
+                entry['distinct'] = stats.sketch.count()
+                entry['sketch'] = stats.sketch.to_str()
+            paths[path] = entry
+        return {'resources': self.resources, 'overflow': self.overflow, 'paths': paths}
+
+    @classmethod
+    def from_dict(cls, resource_type, data, max_paths=MAX_PATHS):
+        profile = cls(resource_type, max_paths)
+        profile.resources = data.get('resources', 0)
+        profile.overflow = data.get('overflow', 0)
+        for path, entry in data.get('paths', {}).items():
+            stats = profile.paths[path] = PathStats()
+            stats.present = entry['present']
+            stats.types = dict(entry.get('types', {}))
+            if entry.get('sketch'):
+                stats.sketch = HyperLogLog.from_str(entry['sketch'])
+        return profile
+
+class SchemaProfile:
+    """Per-resource-type profiles; to_dict()/from_dict() round-trip through the JSON report"""
+
+    def __init__(self, max_paths=MAX_PATHS, sketches=True):
+        self.max_paths = max_paths
+        self.sketches = sketches
+        self.types = {}
+        self.sources = []
+
+    def profile(self, resource_type):
+        if resource_type not in self.types:
+            self.types[resource_type] = ResourceProfile(resource_type, self.max_paths, self.sketches)
+        return self.types[resource_type]
+
+    def add(self, resource):
+        self.profile(resource.get('resourceType', 'Unknown')).add(resource)
+
+    def merge(self, other):
+        for resource_type, profile in other.types.items():
+            self.profile(resource_type).merge(profile)
+        self.sources.extend(other.sources)
+        return self
+
+    def to_dict(self):
+        return {
+            'version': REPORT_VERSION,
+            'hll_precision': HLL_PRECISION,
+            'sources': self.sources,
+            'resource_types': {t: p.to_dict() for t, p in sorted(self.types.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data, max_paths=MAX_PATHS):
+        if data.get('version') != REPORT_VERSION:
+            raise ValueError(f"Unsupported profile report version: {data.get('version')}")
+        profile = cls(max_paths)
+        profile.sources = list(data.get('sources', []))
+        for resource_type, entry in data.get('resource_types', {}).items():
+            profile.types[resource_type] = ResourceProfile.from_dict(resource_type, entry, max_paths)
+        return profile
+
+def merge_reports(reports):
+    """Merge report dicts (e.g. from separate shards or runs) into one report dict"""
+    merged = SchemaProfile()
+    for report in reports:
+        merged.merge(SchemaProfile.from_dict(report))
+    return merged.to_dict()
+
+# --- sources -----------------------------------------------------------------
+
+class HealthLakeReader:
+    """Pages through every resource of a type, one page in memory at a time"""
+
+    def __init__(self, region=REGION, datastore_id=DATASTORE_ID):
+        self.endpoint = f"https://healthlake.{region}.amazonaws.com/datastore/{datastore_id}/r4/"
+        self.region = region
+        self.credentials = boto3.Session(region_name=region).get_credentials()
+        self.local = threading.local()
+
+    def _get(self, url):
+        if not hasattr(self.local, 'http'):
+            self.local.http = requests.Session()
+        request = AWSRequest(method='GET', url=url)
+        SigV4Auth(self.credentials, 'healthlake', self.region).add_auth(request)
+        response = self.local.http.get(url, headers=dict(request.headers))
+        response.raise_for_status()
+        return response.json()
+
+    def iter_resources(self, resource_type, page_size=PAGE_SIZE):
+        url = f"{self.endpoint}{resource_type}?_count={page_size}"
+        while url:
+            bundle = self._get(url)
+            for entry in bundle.get('entry', []):
+                if 'resource' in entry:
+                    yield entry['resource']
+            url = next((link['url'] for link in bundle.get('link', []) if link.get('relation') == 'next'), None)
+
+def profile_healthlake(resource_types=RESOURCE_TYPES, workers=4, sketches=True, progress=True):
+    """Profile every page of each type, types walked in parallel"""
+    reader = HealthLakeReader()
+
+    def profile_type(resource_type):
+        profile = SchemaProfile(sketches=sketches)
+        for resource in reader.iter_resources(resource_type):
+            profile.add(resource)
+        profile.sources.append(f"healthlake:{resource_type}")
+        return profile
+
+    merged = SchemaProfile(sketches=sketches)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {resource_type: executor.submit(profile_type, resource_type) for resource_type in resource_types}
+        for resource_type, future in futures.items():
+            try:
+                merged.merge(future.result())
+                if progress:
+                    count = merged.types[resource_type].resources if resource_type in merged.types else 0
+                    print(f"  [OK] {resource_type}: {count} resources")
+            except Exception as e:
+                print(f"  [ERROR] {resource_type}: {e}")
+    return merged
+
+def _profile_ndjson_file(args):
+    path, sketches = args
+    profile = SchemaProfile(sketches=sketches)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                profile.add(json.loads(line))
+    profile.sources.append(path)
+    return profile.to_dict()
+
+def profile_ndjson(paths, processes=None, sketches=True, progress=True):
+    """Profile NDJSON files across a process pool (one file per task) and merge"""
+    merged = SchemaProfile(sketches=sketches)
+    with Pool(processes=processes) as pool:
+        tasks = [(path, sketches) for path in paths]
+        for done, report in enumerate(pool.imap_unordered(_profile_ndjson_file, tasks), 1):
+            merged.merge(SchemaProfile.from_dict(report))
+            if progress:
+                print(f"  [{done}/{len(paths)}] files profiled", end='\r')
+    if progress:
+        print()
+    return merged
+
+def print_summary(report, top=15):
+    for resource_type, entry in report['resource_types'].items():
+        resources = entry['resources']
+        print(f"\n{'=' * 80}")
+        print(f"{resource_type}: {resources} resources, {len(entry['paths'])} paths"
+              + (f", {entry['overflow']} values past the path cap" if entry['overflow'] else ""))
+        print('=' * 80)
+        fields = [(p, e) for p, e in entry['paths'].items() if '.' not in p and '[' not in p]
+        for path, stats in sorted(fields, key=lambda item: -item[1]['present'])[:top]:
+            distinct = f"  ~{stats['distinct']} distinct" if 'distinct' in stats else ''
+            print(f"  {path:<32} {stats['frequency'] * 100:6.1f}%  {', '.join(stats['types'])}{distinct}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile FHIR schema across every resource")
+    parser.add_argument('--ndjson', nargs='*', help="Profile local NDJSON files instead of HealthLake")
+    parser.add_argument('--merge', nargs='*', help="Merge existing profile reports")
+    parser.add_argument('--types', nargs='*', default=RESOURCE_TYPES)
+    parser.add_argument('--workers', type=int, default=None, help="Threads (HealthLake) or processes (NDJSON)")
+    parser.add_argument('--no-sketches', action='store_true', help="Skip distinct-value sketches (faster, smaller)")
+    parser.add_argument('--out', default='schema_profile.json')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("HEALTHLAKE FHIR SCHEMA PROFILE")
+    print("=" * 80)
+
+    start = time.time()
+    if args.merge:
+        reports = []
+        for path in args.merge:
+            with open(path) as f:
+                reports.append(json.load(f))
+        report = merge_reports(reports)
+    elif args.ndjson:
+        report = profile_ndjson(args.ndjson, args.workers, sketches=not args.no_sketches).to_dict()
+    else:
+        report = profile_healthlake(args.types, args.workers or 4, sketches=not args.no_sketches).to_dict()
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f)
+
+    print_summary(report)
+    total = sum(entry['resources'] for entry in report['resource_types'].values())
+    print(f"\n[OK] Profiled {total} resources in {time.time() - start:.1f}s -> {args.out}")
@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import time
+import uuid
+import zipfile
+import argparse
+import threading
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REGION = 'us-west-2'
+DATASTORE_ID = 'b1f04342d94dcc96c47f9528f039f5a8'
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')   # e.g. a local MinIO/moto server for testing
+
+# S3 parts must be >= 5 MiB (except the last). Peak memory is roughly
+# (resource types with a partial buffer + parts in flight) x PART_SIZE,
+# plus the largest single bundle in the archive.
+PART_SIZE = 8 * 1024 * 1024
+MAX_IN_FLIGHT_PARTS = 8
+MAX_OBJECT_BYTES = 1024 * 1024 * 1024   # roll over to a new NDJSON object per type
+UPLOAD_WORKERS = 8
+
+CONDITIONAL_REFERENCE = re.compile(r'^(\w+)\?identifier=(.+)$')
+SHARED_BUNDLE_PREFIXES = ('hospitalInformation', 'practitionerInformation')
+
+def bundle_members(archive):
+    """Bundle JSON members of the zip, shared organisation/practitioner bundles first"""
+    members = [m for m in archive.infolist() if m.filename.endswith('.json') and not m.is_dir()]
+    shared = [m for m in members if os.path.basename(m.filename).startswith(SHARED_BUNDLE_PREFIXES)]
+    return shared + [m for m in members if m not in shared]
+
+def _rewrite_references(node, urn_map, identifier_map):
+    """urn:uuid and Type?identifier=system|value references -> Type/id (in place)"""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == 'reference' and isinstance(value, str):
+                if value.startswith('urn:uuid:'):
+                    node[key] = urn_map.get(value, value)
+                else:
+                    match = CONDITIONAL_REFERENCE.match(value)
+                    if match:
+                        node[key] = identifier_map.get((match.group(1), match.group(2)), value)
+            else:
+                _rewrite_references(value, urn_map, identifier_map)
+    elif isinstance(node, list):
+        for item in node:
+            _rewrite_references(item, urn_map, identifier_map)
+
+def iter_resources(zip_path):
+    """Stream resources out of a Synthea zip one bundle at a time, references resolved.
+
+    Conditional references (`Organization?identifier=...`) only ever point at the
+    shared organisation/practitioner/location bundles, so only their identifiers
+    are kept; memory stays bounded by those, not by the archive.
+    """
+    identifier_map = {}
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in bundle_members(archive):
+            with archive.open(member) as f:
+                bundle = json.load(f)
+            if bundle.get('resourceType') != 'Bundle':
+                continue
+
+            shared = os.path.basename(member.filename).startswith(SHARED_BUNDLE_PREFIXES)
+            entries = bundle.get('entry', [])
+            urn_map = {}
+            for entry in entries:
+                resource = entry.get('resource', {})
+                resource.setdefault('id', (entry.get('fullUrl') or '').replace('urn:uuid:', '') or str(uuid.uuid4()))
+                reference = f"{resource['resourceType']}/{resource['id']}"
+                if entry.get('fullUrl'):
+                    urn_map[entry['fullUrl']] = reference
+                for identifier in resource.get('identifier', []) if shared else []:
+                    if identifier.get('system') and identifier.get('value'):
+                        identifier_map[(resource['resourceType'], f"{identifier['system']}|{identifier['value']}")] = reference
+
+            for entry in entries:
+                resource = entry.get('resource')
+                if resource:
+                    _rewrite_references(resource, urn_map, identifier_map)
+                    yield resource
+
+class MultipartObject:
+    """One S3 object assembled from parts uploaded concurrently"""
+
+    def __init__(self, pipeline, key):
+        self.pipeline = pipeline
+        self.key = key
+        self.upload_id = None
+        self.futures = []
+        self.size = 0
+
+    def add_part(self, data: bytes):
+        s3, bucket = self.pipeline.s3, self.pipeline.bucket
+        if self.upload_id is None:
+            self.upload_id = s3.create_multipart_upload(Bucket=bucket, Key=self.key,
+                                                        ContentType='application/fhir+ndjson')['UploadId']
+        part_number = len(self.futures) + 1
+        self.size += len(data)
+        self.pipeline.in_flight.acquire()   # backpressure: bounded parts held in memory
+
+        def upload():
+            try:
+                response = s3.upload_part(Bucket=bucket, Key=self.key, UploadId=self.upload_id,
+                                          PartNumber=part_number, Body=data)
+                return {'PartNumber': part_number, 'ETag': response['ETag']}
+            finally:
+                self.pipeline.in_flight.release()
+
+        self.futures.append(self.pipeline.pool.submit(upload))
+
+    def close(self, tail: bytes):
+        """Upload the remainder and finish the object (single PUT if it never filled a part)"""
+        s3, bucket = self.pipeline.s3, self.pipeline.bucket
+        if self.upload_id is None:
+            if tail:
+                s3.put_object(Bucket=bucket, Key=self.key, Body=tail, ContentType='application/fhir+ndjson')
+                self.size += len(tail)
+            return
+        if tail:
+            self.add_part(tail)
+        try:
+            parts = [future.result() for future in self.futures]
+        except Exception:
+            s3.abort_multipart_upload(Bucket=bucket, Key=self.key, UploadId=self.upload_id)
+            raise
+        s3.complete_multipart_upload(Bucket=bucket, Key=self.key, UploadId=self.upload_id,
+                                     MultipartUpload={'Parts': parts})
+
+class SyntheaPipeline:
+    """Synthea zip -> per-resource-type NDJSON on S3 -> HealthLake import job, without touching disk"""
+
+    def __init__(self, bucket, prefix, part_size=PART_SIZE, workers=UPLOAD_WORKERS,
+                 max_in_flight=MAX_IN_FLIGHT_PARTS, endpoint_url=S3_ENDPOINT_URL, region=REGION):
+        self.s3 = boto3.client('s3', region_name=region, endpoint_url=endpoint_url)
+        self.region = region
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+        self.part_size = part_size
+        self.workers = workers
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.pool = None
+        self.buffers = {}      # resource type -> bytearray of pending NDJSON lines
+        self.objects = {}      # resource type -> current MultipartObject
+        self.sequence = {}     # resource type -> object counter
+        self.finished = []
+        self.stats = {'resources': 0, 'bytes': 0, 'objects': 0, 'seconds': 0.0, 'by_type': {}}
+
+    def _object(self, resource_type):
+        if resource_type not in self.objects:
+            self.sequence[resource_type] = self.sequence.get(resource_type, 0) + 1
+            key = f"{self.prefix}{resource_type}-{self.sequence[resource_type]:04d}.ndjson"
+            self.objects[resource_type] = MultipartObject(self, key)
+        return self.objects[resource_type]
+
+    def _write(self, resource):
+        resource_type = resource['resourceType']
+        line = (json.dumps(resource, separators=(',', ':')) + '\n').encode('utf-8')
+        buffer = self.buffers.setdefault(resource_type, bytearray())
+        buffer += line
+
+        self.stats['resources'] += 1
+        self.stats['bytes'] += len(line)
+        self.stats['by_type'][resource_type] = self.stats['by_type'].get(resource_type, 0) + 1
+
+        if len(buffer) >= self.part_size:
+            obj = self._object(resource_type)
+            obj.add_part(bytes(buffer))
+            buffer.clear()
+            if obj.size >= MAX_OBJECT_BYTES:
+                self._close(resource_type)
+
+    def _close(self, resource_type):
+        tail = bytes(self.buffers.pop(resource_type, b''))
+        if resource_type not in self.objects and not tail:
+            return
+        obj = self._object(resource_type)
+        del self.objects[resource_type]
+        obj.close(tail)
+        self.finished.append(f"s3://{self.bucket}/{obj.key}")
+        self.stats['objects'] += 1
+
+    def _abort(self):
+        """Drop unfinished multipart uploads so failed runs leave no orphaned parts"""
+        for obj in self.objects.values():
+            if obj.upload_id is not None:
+                try:
+                    self.s3.abort_multipart_upload(Bucket=self.bucket, Key=obj.key, UploadId=obj.upload_id)
+                except Exception as e:
+                    print(f"[ERROR] Could not abort upload of {obj.key}: {e}")
+        self.objects.clear()
+
+    def run(self, zip_path, progress=True):
+        """Stream the archive to S3; returns the S3 prefix URI holding the NDJSON files"""
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self.pool = pool
+            try:
+                for resource in iter_resources(zip_path):
+                    self._write(resource)
+                    if progress and self.stats['resources'] % 10000 == 0:
+                        print(f"  {self.stats['resources']} resources, {self.stats['bytes'] / 1e6:.0f} MB", end='\r')
+                for resource_type in list(set(self.buffers) | set(self.objects)):
+                    self._close(resource_type)
+            except Exception:
+                self._abort()
+                raise
+        self.stats['seconds'] = time.time() - start
+        if progress:
+            print()
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def report(self):
+        seconds = self.stats['seconds'] or 1e-9
+        return (f"{self.stats['resources']} resources, {self.stats['bytes'] / 1e6:.1f} MB in "
+                f"{self.stats['objects']} NDJSON objects, {self.stats['seconds']:.1f}s "
+                f"({self.stats['bytes'] / 1e6 / seconds:.1f} MB/s)")
+
+def start_import_job(input_uri, output_uri, role_arn, datastore_id=DATASTORE_ID, region=REGION):
+    """Start the HealthLake import of the NDJSON prefix"""
+    client = boto3.client('healthlake', region_name=region)
+    return client.start_fhir_import_job(
+        DatastoreId=datastore_id,
+        InputDataConfig={'S3Uri': input_uri},
+        JobOutputDataConfig={
+            'S3Configuration': {
+                'S3Uri': output_uri,
+                'KmsKeyId': 'AWS_OWNED_KMS_KEY'
+            }
+        },
+        DataAccessRoleArn=role_arn
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a Synthea zip into HealthLake via S3 NDJSON")
+    parser.add_argument('zip_path', nargs='?', default='synthea_sample.zip')
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--prefix', default=f"synthea/{time.strftime('%Y%m%d-%H%M%S')}")
+    parser.add_argument('--role-arn', help="HealthLake data access role (omit to only upload)")
+    parser.add_argument('--endpoint-url', default=S3_ENDPOINT_URL, help="S3 endpoint, e.g. http://localhost:9000")
+    parser.add_argument('--workers', type=int, default=UPLOAD_WORKERS)
+    parser.add_argument('--part-size-mb', type=int, default=PART_SIZE // (1024 * 1024))
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("STREAMING SYNTHEA DATA TO HEALTHLAKE")
+    print("=" * 60)
+
+    pipeline = SyntheaPipeline(args.bucket, f"{args.prefix}/input", part_size=args.part_size_mb * 1024 * 1024,
+                               workers=args.workers, endpoint_url=args.endpoint_url)
+    print(f"\nStreaming {args.zip_path} -> s3://{args.bucket}/{args.prefix}/input/")
+    input_uri = pipeline.run(args.zip_path)
+    print(f"[OK] {pipeline.report()}")
+    for resource_type, count in sorted(pipeline.stats['by_type'].items(), key=lambda item: -item[1]):
+        print(f"  {resource_type}: {count}")
+
+    if args.role_arn:
+        result = start_import_job(input_uri, f"s3://{args.bucket}/{args.prefix}/output/", args.role_arn)
+        print(f"\n[OK] Import job started: {result['JobId']} ({result['JobStatus']})")
+    else:
+        print("\nNo --role-arn given; skipped the HealthLake import job")
@@ -27,11 +27,14 @@ def test_step_function():
     execution_input = {
         "patientId": "6df562fc-25a7-4e72-8753-9583e3259572",
         "patientName": "Sarah Johnson",
-        "sessionId": str(uuid.uuid4())
+        "sessionId": str(uuid.uuid4()),
+        # Each agent Lambda continues this trace (W3C traceparent)
+        "traceparent": f"00-{uuid.uuid4().hex}-{uuid.uuid4().hex[:16]}-01"
     }
     
     print(f"\nStarting execution for patient: {execution_input['patientName']}")
     print(f"Session ID: {execution_input['sessionId']}")
+    print(f"Trace ID: {execution_input['traceparent'].split('-')[1]}")
     
     # Start execution
     response = sfn.start_execution(
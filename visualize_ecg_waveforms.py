@@ -1,11 +1,11 @@
 import boto3
 import requests
 import json
-import matplotlib.pyplot as plt
 import numpy as np
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 from dotenv import load_dotenv
+from ecg_plot_service import ecg_plot_service
 
 load_dotenv()
 
@@ -38,13 +38,8 @@ def plot_ecg_waveforms():
         print("No ECG waveform data found")
         return
     
-    # Create subplots
-    num_ecgs = min(len(observations['entry']), 5)
-    fig, axes = plt.subplots(num_ecgs, 1, figsize=(12, 3*num_ecgs))
-    if num_ecgs == 1:
-        axes = [axes]
-    
-    for idx, entry in enumerate(observations['entry'][:5]):
+    waveforms = []
+    for entry in observations['entry'][:5]:
         obs = entry['resource']
         
         # Extract waveform data
@@ -54,24 +49,26 @@ def plot_ecg_waveforms():
             period_ms = sampled_data['period']
             
             # Parse waveform
-            waveform = [float(x) for x in data_string.split()]
+            waveform = np.array(data_string.split(), dtype=float)
             time = np.arange(len(waveform)) * period_ms / 1000  # Convert to seconds
             
-            # Get patient info
-            patient_ref = obs.get('subject', {}).get('display', 'Unknown Patient')
-            
-            # Plot
-            axes[idx].plot(time, waveform, 'b-', linewidth=0.8)
-            axes[idx].set_title(f'ECG Lead II - {patient_ref}', fontsize=12, fontweight='bold')
-            axes[idx].set_xlabel('Time (seconds)')
-            axes[idx].set_ylabel('Amplitude (mV)')
-            axes[idx].grid(True, alpha=0.3)
-            axes[idx].set_xlim([0, max(time)])
+            waveforms.append({
+                'id': obs.get('id'),
+                'version': obs.get('meta', {}).get('versionId'),
+                'time': time,
+                'amplitude': waveform,
+                'patient': obs.get('subject', {}).get('display', 'Unknown Patient')
+            })
+    
+    # Render panels in parallel and stack them into one grid image
+    png = ecg_plot_service.render_grid(waveforms, figsize=(12, 3), dpi=150, linewidth=0.8)
+    if png is None:
+        print("No ECG waveform data found")
+        return
     
-    plt.tight_layout()
-    plt.savefig('ecg_waveforms.png', dpi=150, bbox_inches='tight')
+    with open('ecg_waveforms.png', 'wb') as f:
+        f.write(png)
     print(f"Saved ECG waveforms to: ecg_waveforms.png")
-    plt.show()
 
 if __name__ == "__main__":
     print("Retrieving and visualizing ECG waveforms...")